@@ -1,4 +1,5 @@
 import os
+import sys
 import redis
 import json
 import time
@@ -7,48 +8,71 @@ import requests
 from fastapi import FastAPI
 from threading import Thread
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.prompts import PromptBuilder, prompt_stats, token_budget
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, routed_models
+from shared.semantic_cache import SemanticCache
 
 load_dotenv()
 
 AGENT_ID = "action_item_agent_v1"
-LISTEN_TO_CHANNEL = "summary.created" # Listens for the summary
+STAGE = load_pipeline().stage("action_items")
+LISTEN_TO_CHANNEL = STAGE.inputs[0] # Listens for the summary
+OUTPUT_CHANNEL = STAGE.outputs[0]
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL_NAME = "google/gemini-flash-1.5"
+# The model for each call is picked per prompt from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+PROMPT_TOKEN_BUDGET = token_budget(AGENT_ID, 1500)
+# Near-duplicate prompts are answered from a semantic cache (SEMANTIC_CACHE_<AGENT_ID>=false turns it off).
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 1000))
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
+semantic_cache = SemanticCache(AGENT_ID, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE)
 
 def publish_event(channel, data, trace_id):
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data,
-        "trace_id": trace_id
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
 def generate_action_items(context: str) -> list:
     if not OPENROUTER_API_KEY or "..." in OPENROUTER_API_KEY:
         return ["Mock Action: API Key not configured."]
+    cached = semantic_cache.get("actions", context)
+    if cached is not None:
+        return cached
     try:
         # A new prompt focused on future actions
-        prompt = f"""
+        prompt = PromptBuilder(AGENT_ID, PROMPT_TOKEN_BUDGET).instruction("""
         You are a proactive sales assistant. Based on the summary of a sales call, generate 2-3 concrete next steps or action items for the sales representative.
         Examples: 'Schedule a follow-up meeting to discuss pricing.', 'Send the case study on Project Titan.', 'Connect with their CTO on LinkedIn.'
         Return ONLY a valid JSON object with a single key "actions" which is a list of strings.
-        Context: {context}
-        """
+        """).section("Context", context).build()
         headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-        payload = {"model": MODEL_NAME, "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}}
+        with router.route(prompt) as model:
+            payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}}
         
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
+            response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
+            response.raise_for_status()
         
-        actions = json.loads(response.json()["choices"][0]["message"]["content"]).get("actions", [])
+            actions = json.loads(response.json()["choices"][0]["message"]["content"]).get("actions", [])
+        semantic_cache.put("actions", context, actions)
         return actions
     except Exception as e:
         print(f"[{AGENT_ID}] LLM call failed: {e}")
@@ -56,23 +80,32 @@ def generate_action_items(context: str) -> list:
 
 def process_event(message):
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         trace_id = data.get("trace_id")
-        summary = data.get("payload", {}).get("summary")
+        payload = resolve(redis_client, data.get("payload", {}))
+        summary = payload.get("summary")
+        # Rolling summaries arrive every few blocks mid-call; only the final one is acted on.
+        if payload.get("final") is False:
+            return
         
         if summary and trace_id:
             action_items = generate_action_items(summary)
-            publish_event("action_items.created", {"actions": action_items}, trace_id)
+            publish_event(OUTPUT_CHANNEL, {"actions": action_items}, trace_id)
     except Exception as e:
         print(f"[{AGENT_ID}] Error: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -82,3 +115,27 @@ async def startup_event():
         Thread(target=listen_for_events, daemon=True).start()
     except Exception as e:
         print(f"[{AGENT_ID}] Startup failed: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
+@app.get("/semantic_cache")
+def semantic_cache_stats():
+    return semantic_cache.stats()
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/prompts")
+def prompt_metrics():
+    return prompt_stats(AGENT_ID)
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
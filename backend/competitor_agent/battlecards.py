@@ -0,0 +1,153 @@
+"""
+Precomputed competitor battlecards for the Competitor Agent.
+
+`build_battlecards.py` generates a card (strengths, weaknesses, counter
+strategy) for every known competitor offline and saves them as one versioned
+JSON file under the store directory; `LATEST` names the current version. The
+agent loads that version into memory at startup and answers mentions from it.
+
+Mentions are resolved through an alias index: canonical names, aliases,
+tickers and listed misspellings map straight to a competitor, and the
+single-character deletions of keys of six or more characters are indexed too,
+so most unlisted one-letter typos still resolve. A typo must keep the first
+two letters: "stork" or "start" is not "Stark".
+"""
+
+import json
+import os
+import re
+import time
+from threading import Lock
+
+DEFAULT_COMPETITORS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "competitors.json")
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "battlecards")
+LATEST_FILE = "LATEST"
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_LEGAL_SUFFIXES = ("inc", "corp", "corporation", "ltd", "llc", "plc", "co")
+# Deletion variants of short keys would match too many unrelated words.
+_MIN_FUZZY_LENGTH = 6
+_FUZZY_PREFIX = 2
+
+
+def normalize(name: str) -> str:
+    words = _NON_WORD.sub(" ", name.lower()).split()
+    while len(words) > 1 and words[-1] in _LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _deletions(key: str):
+    """Single-character deletions that keep the key's first letters."""
+    return {key[:i] + key[i + 1:] for i in range(_FUZZY_PREFIX, len(key))}
+
+
+class AliasIndex:
+    """Maps competitor mentions (names, tickers, typos) to canonical names."""
+
+    def __init__(self, competitors: list):
+        self.names = [competitor["name"] for competitor in competitors]
+        self._exact = {}
+        self._fuzzy = {}
+        for competitor in competitors:
+            name = competitor["name"]
+            keys = [name, *competitor.get("aliases", ()), *competitor.get("tickers", ()),
+                    *competitor.get("misspellings", ())]
+            for key in filter(None, map(normalize, keys)):
+                self._exact.setdefault(key, name)
+        for key, name in self._exact.items():
+            if len(key) >= _MIN_FUZZY_LENGTH:
+                for variant in _deletions(key):
+                    # A variant claimed by two competitors is ambiguous; drop it.
+                    if self._fuzzy.get(variant, name) != name:
+                        self._fuzzy[variant] = None
+                    else:
+                        self._fuzzy[variant] = name
+
+    def resolve(self, mention: str):
+        """The canonical competitor name for a mention, or None."""
+        key = normalize(mention)
+        if not key:
+            return None
+        name = self._exact.get(key)
+        if name or len(key) < _MIN_FUZZY_LENGTH - 1:
+            return name
+        # Typo with a missing letter, an extra letter, or one substituted letter.
+        name = self._fuzzy.get(key)
+        if name:
+            return name
+        for variant in _deletions(key):
+            name = (len(variant) >= _MIN_FUZZY_LENGTH and self._exact.get(variant)) or self._fuzzy.get(variant)
+            if name:
+                return name
+        return None
+
+
+class BattlecardStore:
+    """The current battlecard version, held in memory, plus cards generated on a miss."""
+
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self.version = None
+        self._cards = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Loads the version named in LATEST; an empty store is not an error."""
+        try:
+            with open(os.path.join(self.store_dir, LATEST_FILE), encoding="utf-8") as f:
+                version = f.read().strip()
+            with open(os.path.join(self.store_dir, f"{version}.json"), encoding="utf-8") as f:
+                document = json.load(f)
+        except FileNotFoundError:
+            return self
+        with self._lock:
+            self.version = document["version"]
+            self._cards = document["cards"]
+        return self
+
+    def get(self, name: str):
+        with self._lock:
+            card = self._cards.get(name)
+            if card is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return card
+
+    def put(self, name: str, card: dict):
+        """Keeps a card generated on a miss until the next version is loaded."""
+        with self._lock:
+            self._cards[name] = card
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"version": self.version, "cards": len(self._cards),
+                    "hits": self.hits, "misses": self.misses}
+
+
+def save_version(store_dir: str, cards: dict, keep: int = 5) -> str:
+    """Writes `cards` as a new version, points LATEST at it and prunes old versions."""
+    os.makedirs(store_dir, exist_ok=True)
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    document = {"version": version, "generated_at": time.time(), "cards": cards}
+    path = os.path.join(store_dir, f"{version}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+    latest = os.path.join(store_dir, LATEST_FILE)
+    with open(latest + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(latest + ".tmp", latest)
+
+    versions = sorted(name for name in os.listdir(store_dir) if name.endswith(".json"))
+    for old in versions[:-keep]:
+        os.remove(os.path.join(store_dir, old))
+    return version
+
+
+def load_competitors(path: str = DEFAULT_COMPETITORS_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,54 @@
+"""
+Offline batch job: precomputes battlecards for every known competitor.
+
+Cards are generated in parallel and saved as a new version in the
+battlecard store; the Competitor Agent picks it up on its next start or on
+POST /battlecards/reload. A competitor whose generation fails keeps its card
+from the previous version.
+
+Usage: python build_battlecards.py [--workers 8] [--store DIR] [--competitors FILE]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from battlecards import (DEFAULT_COMPETITORS_PATH, DEFAULT_STORE_DIR, BattlecardStore,
+                         load_competitors, save_version)
+from main import AGENT_ID, get_competitive_analysis
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--competitors", default=DEFAULT_COMPETITORS_PATH)
+    args = parser.parse_args()
+
+    names = [competitor["name"] for competitor in load_competitors(args.competitors)]
+    previous = BattlecardStore(args.store).load()
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        generated = dict(zip(names, pool.map(get_competitive_analysis, names)))
+
+    cards, failed = {}, []
+    for name, card in generated.items():
+        if "error" in card:
+            failed.append(name)
+            card = previous.get(name)
+            if card is None:
+                continue
+        cards[name] = {**card, "competitor": name}
+
+    if not cards:
+        print(f"[{AGENT_ID}] No battlecards generated ({len(failed)} failed); store left unchanged.")
+        return
+    version = save_version(args.store, cards)
+    print(f"[{AGENT_ID}] Saved battlecard version {version}: {len(cards)} cards in "
+          f"{time.time() - started:.1f}s.")
+    if failed:
+        print(f"[{AGENT_ID}] Generation failed for {', '.join(failed)}; kept their previous cards where available.")
+
+
+if __name__ == "__main__":
+    main()
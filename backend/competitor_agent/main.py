@@ -1,4 +1,5 @@
 import os
+import sys
 import redis
 import json
 import time
@@ -7,32 +8,52 @@ import requests
 from fastapi import FastAPI
 from threading import Thread
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in
+from shared.prompts import PromptBuilder, prompt_stats, token_budget
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, routed_models
+from battlecards import (DEFAULT_COMPETITORS_PATH, DEFAULT_STORE_DIR, AliasIndex, BattlecardStore,
+                         load_competitors)
 
 # Load environment variables from the .env file
 load_dotenv()
 
 # --- Configuration ---
 AGENT_ID = "competitor_agent_v1"
-LISTEN_TO_CHANNEL = "entity.found" # Listens for the initial entity
-# For the demo, we have a hardcoded list of known competitors
-KNOWN_COMPETITORS = ["acme", "omnicorp", "stark industries"]
+STAGE = load_pipeline().stage("competitor")
+LISTEN_TO_CHANNEL = STAGE.inputs[0] # Listens for the initial entity
+OUTPUT_CHANNEL = STAGE.outputs[0]
+# Known competitors with their aliases, tickers and common misspellings
+COMPETITORS_PATH = os.getenv("COMPETITORS_PATH", DEFAULT_COMPETITORS_PATH)
+# Versioned battlecards written by build_battlecards.py
+BATTLECARD_STORE_DIR = os.getenv("BATTLECARD_STORE_DIR", DEFAULT_STORE_DIR)
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL_NAME = "google/gemini-flash-1.5"
+# The model for each call is picked per prompt from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+PROMPT_TOKEN_BUDGET = token_budget(AGENT_ID, 500)
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
+alias_index = AliasIndex(load_competitors(COMPETITORS_PATH))
+battlecards = BattlecardStore(BATTLECARD_STORE_DIR).load()
 
 def publish_event(channel, data, trace_id):
     """A helper function to publish a structured event to a Redis channel."""
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data,
-        "trace_id": trace_id
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
 def get_competitive_analysis(competitor_name: str) -> dict:
@@ -40,18 +61,19 @@ def get_competitive_analysis(competitor_name: str) -> dict:
     if not OPENROUTER_API_KEY or "sk-or-..." in OPENROUTER_API_KEY:
         return {"error": "API Key not configured."}
     try:
-        prompt = f"""
+        prompt = PromptBuilder(AGENT_ID, PROMPT_TOKEN_BUDGET).instruction(f"""
         You are a competitive intelligence analyst. The user mentioned the competitor '{competitor_name}'.
         Provide a brief, actionable analysis. Return ONLY a valid JSON object with three keys:
         "strengths" (list of strings), "weaknesses" (list of strings), and "counter_strategy" (a short paragraph).
-        """
+        """).build()
         headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-        payload = {"model": MODEL_NAME, "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}}
+        with router.route(prompt) as model:
+            payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}}
         
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
+            response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
+            response.raise_for_status()
         
-        return json.loads(response.json()["choices"][0]["message"]["content"])
+            return json.loads(response.json()["choices"][0]["message"]["content"])
     except Exception as e:
         print(f"[{AGENT_ID}] LLM call failed: {e}")
         return {"error": "API call failed."}
@@ -59,26 +81,48 @@ def get_competitive_analysis(competitor_name: str) -> dict:
 def process_event(message):
     """Processes an event, checking for known competitor names."""
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         trace_id = data.get("trace_id")
-        entity = data.get("payload", {}).get("entity", "").lower()
+        payload = data.get("payload", {})
+        entity = payload.get("entity", "")
+        entity_type = payload.get("entity_type")
+        # Typed entities were already matched against the competitor gazetteer
+        if entity_type and entity_type != "competitor":
+            return
+        competitor = alias_index.resolve(entity)
+        if entity_type == "competitor" and not competitor:
+            competitor = entity
         
-        if entity and trace_id and entity in KNOWN_COMPETITORS:
-            print(f"[{AGENT_ID}] Known competitor '{entity}' detected. Generating analysis...")
-            analysis_data = get_competitive_analysis(entity)
-            publish_event("competitor.analysis.generated", analysis_data, trace_id)
+        if competitor and trace_id:
+            analysis_data = battlecards.get(competitor)
+            if analysis_data is not None:
+                print(f"[{AGENT_ID}] Competitor '{competitor}' detected. Serving battlecard.")
+                analysis_data = {**analysis_data, "source": "battlecard", "battlecard_version": battlecards.version}
+            else:
+                print(f"[{AGENT_ID}] No battlecard for '{competitor}'. Generating analysis...")
+                analysis_data = get_competitive_analysis(competitor)
+                if "error" not in analysis_data:
+                    battlecards.put(competitor, analysis_data)
+                analysis_data = {**analysis_data, "source": "llm"}
+            analysis_data["competitor"] = competitor.lower()
+            publish_event(OUTPUT_CHANNEL, analysis_data, trace_id)
 
     except Exception as e:
         print(f"[{AGENT_ID}] Error processing event: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     """Connects to Redis and enters a loop to listen for messages."""
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -91,3 +135,33 @@ async def startup_event():
         Thread(target=listen_for_events, daemon=True).start()
     except Exception as e:
         print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
+@app.get("/battlecards")
+def battlecard_stats():
+    return battlecards.stats()
+
+@app.post("/battlecards/reload")
+def reload_battlecards():
+    """Swaps in the latest version written by build_battlecards.py."""
+    battlecards.load()
+    return battlecards.stats()
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/prompts")
+def prompt_metrics():
+    return prompt_stats(AGENT_ID)
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -1,49 +1,80 @@
 import os
+import sys
 import redis
-import json
 import time
 import uuid
 from fastapi import FastAPI
 from threading import Thread
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from pii import scan_payload
 
 # --- Configuration ---
 AGENT_ID = "compliance_agent_v1"
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+POLICY_ID = "pii-policy-v3"
+# Channels that always get a compliance verdict, even when they come back clean
+ALWAYS_REPORT_CHANNELS = {"person.enriched"}
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
 
-def publish_event(channel, data):
+def publish_event(channel, data, trace_id=None):
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
 def process_event(message):
     try:
-        data = json.loads(message["data"])
-        channel = data.get("channel")
+        try:
+            data = decode(message["data"])
+        except ValueError:
+            return # Not a JSON object; nothing to scan
+        if data.get("agent_id") == AGENT_ID:
+            return
+        channel = data.get("channel") or message.get("channel")
+        # Some agents publish bare payloads instead of envelopes; scan those whole.
+        payload = resolve(redis_client, data["payload"]) if "payload" in data else data.to_dict()
         
-        # Mock logic: check for events that might contain PII
-        if channel == "person.enriched":
-            print(f"[{AGENT_ID}] Detected PII in '{channel}'. Running compliance check...")
-            time.sleep(0.5) # Simulate check
-            publish_event("compliance.checked", {"status": "PASSED", "policy_id": "pii-policy-v2"})
+        redacted_payload, findings = scan_payload(payload)
+        if findings or channel in ALWAYS_REPORT_CHANNELS:
+            result = {
+                "status": "REDACTED" if findings else "PASSED",
+                "policy_id": POLICY_ID,
+                "source_channel": channel,
+                "source_event_id": data.get("event_id"),
+                "findings": findings,
+            }
+            if findings:
+                print(f"[{AGENT_ID}] Found {len(findings)} PII item(s) in '{channel}'. Publishing redacted copy...")
+                result["redacted_payload"] = redacted_payload
+            publish_event("compliance.checked", result, data.get("trace_id"))
 
     except Exception as e:
         print(f"[{AGENT_ID}] Error: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.psubscribe("*") # Subscribes to ALL channels
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to all channels for compliance monitoring.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -57,6 +88,18 @@ async def startup_event():
     except redis.exceptions.ConnectionError as e:
         print(f"[{AGENT_ID}] Redis connection failed: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,163 @@
+"""
+PII scanning for the Compliance Agent.
+
+The detectors are alternatives of one compiled regex, so each string in a
+payload is scanned in a single pass. Card numbers must pass the Luhn check and
+Aadhaar numbers the Verhoeff check before they count as findings.
+
+`scan_payload` walks decoded JSON (dicts, lists, strings) in place. Only the
+containers that actually hold PII are copied for the redacted version;
+everything else is shared with the original.
+"""
+
+import re
+from functools import lru_cache
+
+_DETECTORS = [
+    ("email", r"(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}"),
+    ("linkedin_url", r"(?i:(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/(?:in|pub)/[\w%-]+/?)"),
+    ("us_ssn", r"\b\d{3}-\d{2}-\d{4}\b"),
+    ("card_number", r"\b(?:\d[ -]?){12,18}\d\b"),
+    ("aadhaar", r"\b[2-9]\d{3}[ -]?\d{4}[ -]?\d{4}\b"),
+    ("pan", r"\b[A-Z]{5}\d{4}[A-Z]\b"),
+    ("phone", r"(?<![\w+])\+?\(?\d{1,4}\)?(?:[ .-]?\(?\d{2,5}\)?){2,4}(?!\w)"),
+]
+# Dates and times are matched first and then dropped, so their digits can't
+# be read as a phone number ("2026-10-18 12:30" has ten of them).
+_DATETIME = (r"\b\d{4}-\d{2}-\d{2}(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?![\d:])"
+             r"|\b\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?![\d:])")
+_NUMERIC = ("us_ssn", "card_number", "aadhaar", "pan", "phone")
+
+# Python's regex engine tries every alternative at every position, so each
+# detector family is only compiled in when a cheap hint says it could match.
+_LINKEDIN_HINT = re.compile("linkedin", re.IGNORECASE)
+_DIGIT_HINT = re.compile(r"\d")
+
+
+@lru_cache(maxsize=None)
+def _scanner(email: bool, linkedin: bool, numeric: bool):
+    patterns = dict(_DETECTORS)
+    parts = []
+    if email:
+        parts.append(f"(?P<email>{patterns['email']})")
+    if linkedin:
+        parts.append(f"(?P<linkedin_url>{patterns['linkedin_url']})")
+    if numeric:
+        numeric_parts = "|".join([f"(?P<datetime>{_DATETIME})"] +
+                                 [f"(?P<{name}>{patterns[name]})" for name in _NUMERIC])
+        # Every numeric detector starts with a digit, '+', '(' or a PAN prefix.
+        parts.append(rf"(?=[\d+(]|[A-Z]{{5}}\d)(?:{numeric_parts})")
+    return re.compile("|".join(parts)) if parts else None
+
+# Identifiers we generate ourselves; UUIDs would otherwise trip the digit detectors.
+SKIP_KEYS = frozenset({"event_id", "source_event_id", "trace_id", "job_id", "policy_id"})
+
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6], [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8], [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2], [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4], [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2], [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0], [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5], [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+
+def _digits(text):
+    return [ord(ch) - 48 for ch in text if "0" <= ch <= "9"]
+
+
+def luhn_valid(text: str) -> bool:
+    digits = _digits(text)
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+def verhoeff_valid(text: str) -> bool:
+    check = 0
+    for i, d in enumerate(reversed(_digits(text))):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[i % 8][d]]
+    return check == 0
+
+
+_VALIDATORS = {
+    "card_number": luhn_valid,
+    "aadhaar": verhoeff_valid,
+    "phone": lambda text: 10 <= len(_digits(text)) <= 15,
+}
+
+
+def scan_text(text: str):
+    """Returns (redacted_text, [(pii_type, start, end), ...]) for one string."""
+    scanner = _scanner("@" in text, bool(_LINKEDIN_HINT.search(text)), bool(_DIGIT_HINT.search(text)))
+    if scanner is None:
+        return text, []
+    hits = []
+    for match in scanner.finditer(text):
+        kind = match.lastgroup
+        if kind == "datetime":
+            continue
+        validator = _VALIDATORS.get(kind)
+        if validator and not validator(match.group()):
+            continue
+        hits.append((kind, match.start(), match.end()))
+    if not hits:
+        return text, hits
+    parts, cursor = [], 0
+    for kind, start, end in hits:
+        parts.append(text[cursor:start])
+        parts.append(f"[REDACTED:{kind.upper()}]")
+        cursor = end
+    parts.append(text[cursor:])
+    return "".join(parts), hits
+
+
+def scan_payload(value, path: str = "payload"):
+    """
+    Scans a decoded JSON value. Returns (redacted_value, findings), where
+    findings list the PII type and JSON path of every hit (never the raw value).
+    """
+    findings = []
+    redacted = _walk(value, path, findings)
+    return redacted, findings
+
+
+def _walk(value, path, findings):
+    if isinstance(value, str):
+        if len(value) < 6:
+            return value
+        redacted, hits = scan_text(value)
+        for kind, start, end in hits:
+            findings.append({"type": kind, "path": path, "span": [start, end]})
+        return redacted
+    if isinstance(value, dict):
+        copy = None
+        for key, item in value.items():
+            if key in SKIP_KEYS:
+                continue
+            new_item = _walk(item, f"{path}.{key}", findings)
+            if new_item is not item:
+                if copy is None:
+                    copy = dict(value)
+                copy[key] = new_item
+        return value if copy is None else copy
+    if isinstance(value, list):
+        copy = None
+        for i, item in enumerate(value):
+            new_item = _walk(item, f"{path}[{i}]", findings)
+            if new_item is not item:
+                if copy is None:
+                    copy = list(value)
+                copy[i] = new_item
+        return value if copy is None else copy
+    return value
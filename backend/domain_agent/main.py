@@ -1,17 +1,25 @@
 import os
+import sys
 import redis
-import json
 import time
 import uuid
 import random
 from fastapi import FastAPI
 from threading import Thread
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in
+from shared.pipeline import load_pipeline
 
 # --- Configuration ---
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 AGENT_ID = "domain_intelligence_agent_v1"
-LISTEN_TO_CHANNEL = "entity.found"
+STAGE = load_pipeline().stage("domain")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
 
 # --- FastAPI App Initialization (for health checks) ---
 app = FastAPI(title=AGENT_ID, version="1.0.0")
@@ -19,7 +27,7 @@ app = FastAPI(title=AGENT_ID, version="1.0.0")
 # --- Redis Connection & Event Publishing ---
 redis_client = None
 
-def publish_event(channel, data):
+def publish_event(channel, data, trace_id=None):
     if not redis_client:
         print(f"[{AGENT_ID}] ERROR: Cannot publish event, Redis is not connected.")
         return
@@ -29,15 +37,17 @@ def publish_event(channel, data):
         "timestamp": time.time(),
         "agent_id": AGENT_ID,
         "channel": channel,
-        "payload": data
+        "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority()
     }
     
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] SUCCESS: Published to '{channel}'.")
 
 def process_event(message):
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         
         # Guard against processing its own messages
         if data.get("agent_id") == AGENT_ID:
@@ -49,35 +59,43 @@ def process_event(message):
             print(f"[{AGENT_ID}] DEBUG: Event matches listening channel.")
             
             entity = data.get("payload", {}).get("entity")
-            if entity:
+            if data.get("payload", {}).get("entity_type") == "person":
+                print(f"[{AGENT_ID}] DEBUG: Skipping person entity '{entity}'.")
+            elif entity:
                 print(f"[{AGENT_ID}] DEBUG: Extracted entity '{entity}'.")
                 
                 # Simulate a network call to fetch data
                 print(f"[{AGENT_ID}] INFO: Processing entity '{entity}'. Fetching data...")
                 time.sleep(2)
                 
+                # The mock profile is stable per company, as a real one would be.
                 fetched_data = {
                     "name": entity,
-                    "description": f"Mock description for {entity}, a leading innovator in the tech industry with over {random.randint(100, 100000)} employees.",
+                    "description": f"Mock description for {entity}, a leading innovator in the tech industry with over {random.Random(entity.lower()).randint(100, 100000)} employees.",
                     "source": "Mock API v1.3"
                 }
                 
                 print(f"[{AGENT_ID}] DEBUG: Data fetched. Preparing to publish...")
-                publish_event("domain.fetched", fetched_data)
+                publish_event(OUTPUT_CHANNEL, fetched_data, data.get("trace_id"))
             else:
                 print(f"[{AGENT_ID}] WARNING: No entity found in payload.")
     except Exception as e:
         print(f"[{AGENT_ID}] CRITICAL: Error processing event: {e}\nData: {message.get('data', '')}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client:
         return
 
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'. Listening for events...")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -93,7 +111,18 @@ async def startup_event():
         print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
         redis_client = None
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
 
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,203 @@
+"""
+Gazetteer-based entity tagging for the Entity Extraction Agent.
+
+All known company, person and competitor names (plus their aliases) are
+compiled into a single Aho-Corasick automaton, so tagging a transcript is one
+left-to-right pass over the text no matter how many names are loaded.
+
+The trie is stored as one flat ``dict`` keyed by ``(state << 21) | codepoint``
+instead of a dict per node, which keeps memory reasonable with hundreds of
+thousands of names.
+"""
+
+import json
+import os
+from array import array
+
+ENTITY_TYPES = ("company", "person", "competitor")
+
+# Unicode codepoints fit in 21 bits, so (state, char) packs into one int key.
+_CHAR_BITS = 21
+
+
+def _normalize(text: str) -> str:
+    """Lowercases text without changing its length, so match offsets stay valid."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+
+class Gazetteer:
+    """An Aho-Corasick automaton over typed entity names and aliases."""
+
+    def __init__(self):
+        self._goto = {}
+        self._fail = array("i", [0])
+        self._parent = array("i", [0])
+        self._char = array("i", [0])
+        self._depth = array("i", [0])
+        # state -> pattern id, only for states that end a pattern
+        self._terminal = {}
+        # state -> nearest terminal state along the fail chain (0 = none)
+        self._dict_link = array("i")
+        # pattern id -> list of (canonical name, entity type)
+        self._entries = []
+        self._pattern_ids = {}
+        self.max_pattern_length = 0
+        self._compiled = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, name: str, entity_type: str, aliases=()):
+        """Registers a canonical name and its aliases under an entity type."""
+        if entity_type not in ENTITY_TYPES:
+            raise ValueError(f"Unknown entity type '{entity_type}'.")
+        for surface in (name, *aliases):
+            surface = _normalize(surface.strip())
+            if surface:
+                self._add_pattern(surface, name, entity_type)
+        self._compiled = False
+
+    def _add_pattern(self, surface, canonical, entity_type):
+        pattern_id = self._pattern_ids.get(surface)
+        if pattern_id is None:
+            pattern_id = len(self._entries)
+            self._pattern_ids[surface] = pattern_id
+            self._entries.append([])
+            state = 0
+            for ch in surface:
+                key = (state << _CHAR_BITS) | ord(ch)
+                nxt = self._goto.get(key)
+                if nxt is None:
+                    nxt = len(self._fail)
+                    self._goto[key] = nxt
+                    self._fail.append(0)
+                    self._parent.append(state)
+                    self._char.append(ord(ch))
+                    self._depth.append(self._depth[state] + 1)
+                state = nxt
+            self._terminal[state] = pattern_id
+            self.max_pattern_length = max(self.max_pattern_length, len(surface))
+        entry = (canonical, entity_type)
+        if entry not in self._entries[pattern_id]:
+            self._entries[pattern_id].append(entry)
+
+    def compile(self):
+        """Builds the fail and dictionary-suffix links in breadth-first order."""
+        goto, fail, parent, char = self._goto, self._fail, self._parent, self._char
+        num_states = len(fail)
+
+        # Counting sort by depth gives a BFS order without per-node child lists.
+        max_depth = max(self._depth) if num_states else 0
+        buckets = [[] for _ in range(max_depth + 1)]
+        for state in range(1, num_states):
+            buckets[self._depth[state]].append(state)
+
+        dict_link = array("i", bytes(4 * num_states))
+        for bucket in buckets[1:]:
+            for state in bucket:
+                p = parent[state]
+                if p == 0:
+                    fail[state] = 0
+                    continue
+                c = char[state]
+                f = fail[p]
+                while f and ((f << _CHAR_BITS) | c) not in goto:
+                    f = fail[f]
+                fail[state] = goto.get((f << _CHAR_BITS) | c, 0)
+                target = fail[state]
+                dict_link[state] = target if target in self._terminal else dict_link[target]
+
+        self._dict_link = dict_link
+        self._compiled = True
+        return self
+
+    def _raw_matches(self, text):
+        """Yields (start, end, pattern_id) for every pattern occurrence in text."""
+        if not self._compiled:
+            self.compile()
+        goto, fail, terminal, dict_link = self._goto, self._fail, self._terminal, self._dict_link
+        state = 0
+        for i, ch in enumerate(text):
+            c = ord(ch)
+            nxt = goto.get((state << _CHAR_BITS) | c)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto.get((state << _CHAR_BITS) | c)
+            state = nxt or 0
+            hit = state if state in terminal else dict_link[state]
+            while hit:
+                pattern_id = terminal[hit]
+                yield i + 1 - self._depth[hit], i + 1, pattern_id
+                hit = dict_link[hit]
+
+    def extract(self, text: str, min_end: int = 0) -> list:
+        """
+        Tags every gazetteer mention in the text in a single pass.
+        Matches must sit on word boundaries; overlapping matches are resolved
+        leftmost-longest, so 'stark industries' wins over 'stark'. Mentions
+        ending at or before `min_end` are dropped (used for streaming windows).
+        """
+        if not text or not self._entries:
+            return []
+        normalized = _normalize(text)
+        size = len(normalized)
+        candidates = []
+        for start, end, pattern_id in self._raw_matches(normalized):
+            if start > 0 and normalized[start - 1].isalnum():
+                continue
+            if end < size and normalized[end].isalnum():
+                continue
+            candidates.append((start, end, pattern_id))
+
+        candidates.sort(key=lambda m: (m[0], m[0] - m[1]))
+        entities = []
+        covered_until = 0
+        for start, end, pattern_id in candidates:
+            if start < covered_until:
+                continue
+            covered_until = end
+            if end <= min_end:
+                continue
+            for canonical, entity_type in self._entries[pattern_id]:
+                entities.append({
+                    "entity": canonical,
+                    "entity_type": entity_type,
+                    "mention": text[start:end],
+                    "span": [start, end],
+                })
+        return entities
+
+
+def load_gazetteer(path: str) -> Gazetteer:
+    """
+    Loads and compiles a gazetteer file.
+
+    JSON files map each entity type to a list of names, where a name is either
+    a string or {"name": ..., "aliases": [...]}. Large dictionaries can instead
+    be shipped as TSV with one `type<TAB>name<TAB>alias|alias` row per entity.
+    """
+    gazetteer = Gazetteer()
+    if path.endswith(".tsv"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) < 2 or line.startswith("#"):
+                    continue
+                aliases = parts[2].split("|") if len(parts) > 2 and parts[2] else ()
+                gazetteer.add(parts[1], parts[0], aliases)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for entity_type, names in data.items():
+            for item in names:
+                if isinstance(item, str):
+                    gazetteer.add(item, entity_type)
+                else:
+                    gazetteer.add(item["name"], entity_type, item.get("aliases", ()))
+    return gazetteer.compile()
+
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.json")
@@ -1,62 +1,115 @@
 import os
+import sys
 import redis
-import json
 import time
 import uuid
 from fastapi import FastAPI
 from threading import Thread
+from gazetteer import DEFAULT_GAZETTEER_PATH, load_gazetteer
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from stream import TranscriptStreamer
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.pipeline import load_pipeline
 
 # --- Configuration ---
 AGENT_ID = "entity_extraction_agent_v1"
-LISTEN_TO_CHANNEL = "transcript.new"
+STAGE = load_pipeline().stage("entity")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
+# Accounts precomputed before a meeting are not re-triggered when mentioned live
+MEETING_OPENED_CHANNEL = STAGE.context[0]
 # This will default to your local Redis instance but use the cloud URL when deployed
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+# Company, person and competitor names compiled into one Aho-Corasick automaton
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", DEFAULT_GAZETTEER_PATH)
+# Streaming traces forget their emitted entities after this long without new text
+STREAM_TRACE_TTL_SECONDS = float(os.getenv("STREAM_TRACE_TTL_SECONDS", 900))
 
 # --- FastAPI App Initialization ---
 # This line is essential for the `uvicorn` command to start the server.
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
+gazetteer = None
+streamer = None
 
 def publish_event(channel, data, trace_id):
     """A helper function to publish a structured event to a Redis channel."""
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data,
-        "trace_id": trace_id
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
+def extract_entities(raw_text: str) -> list:
+    """Tags all known companies, people and competitors in the text."""
+    entities = gazetteer.extract(raw_text) if gazetteer else []
+    if not entities:
+        # Nothing known was mentioned, so keep the old behaviour of treating
+        # the whole text as the key entity.
+        entities = [{"entity": raw_text, "entity_type": None}]
+    return entities
+
 def process_event(message):
-    """Processes an event by 'extracting' the entity from the raw text."""
+    """Processes an event by extracting typed entities from the raw text."""
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         trace_id = data.get("trace_id")
-        raw_text = data.get("payload", {}).get("text")
-        
-        if raw_text and trace_id:
-            # In a real system, this is where NLP would happen.
-            # For the demo, we assume the whole text is the key entity.
-            print(f"[{AGENT_ID}] Extracted entity: '{raw_text}'")
-            publish_event("entity.found", {"entity": raw_text}, trace_id)
+        payload = resolve(redis_client, data.get("payload", {}))
+        raw_text = payload.get("text")
+
+        if data.get("channel") == MEETING_OPENED_CHANNEL:
+            if trace_id and streamer:
+                # Tag each name too, so a live mention resolving to the canonical name matches.
+                entities = [tagged for entity in payload.get("entities", [])
+                            for tagged in gazetteer.extract(entity["entity"]) + [entity]]
+                seeded = streamer.seed(trace_id, entities)
+                print(f"[{AGENT_ID}] Meeting {payload.get('meeting_id')} opened on trace {trace_id}; {seeded} precomputed entities won't re-trigger.")
+        elif payload.get("stream") and trace_id and streamer:
+            # Live call: tag the new chunk against the trace's sliding window and
+            # only publish entities this call hasn't triggered yet.
+            for entity in streamer.feed(trace_id, raw_text or "", final=payload.get("final", False)):
+                print(f"[{AGENT_ID}] New {entity['entity_type']} entity in stream: '{entity['entity']}'")
+                publish_event(OUTPUT_CHANNEL, entity, trace_id)
+        elif raw_text and trace_id:
+            for entity in extract_entities(raw_text):
+                print(f"[{AGENT_ID}] Extracted {entity['entity_type'] or 'untyped'} entity: '{entity['entity']}'")
+                publish_event(OUTPUT_CHANNEL, entity, trace_id)
 
     except Exception as e:
         print(f"[{AGENT_ID}] Error processing event: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     """Connects to Redis and enters a loop to listen for messages."""
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
-    pubsub.subscribe(LISTEN_TO_CHANNEL)
+    pubsub.subscribe(*STAGE.subscriptions)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
     """Initializes the Redis connection and starts the listener thread."""
-    global redis_client
+    global redis_client, gazetteer, streamer
+    try:
+        started = time.perf_counter()
+        gazetteer = load_gazetteer(GAZETTEER_PATH)
+        streamer = TranscriptStreamer(gazetteer, ttl_seconds=STREAM_TRACE_TTL_SECONDS)
+        print(f"[{AGENT_ID}] Compiled gazetteer with {len(gazetteer)} names and aliases in {time.perf_counter() - started:.2f}s.")
+    except Exception as e:
+        print(f"[{AGENT_ID}] WARNING: Could not load gazetteer '{GAZETTEER_PATH}'. {e}")
     try:
         # Ensures the connection is secure (SSL/TLS) for cloud providers like Upstash
         final_url = REDIS_URL
@@ -69,4 +122,21 @@ async def startup_event():
         
         Thread(target=listen_for_events, daemon=True).start()
     except Exception as e:
-        print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
\ No newline at end of file
+        print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
+@app.get("/")
+def read_root():
+    stream_stats = streamer.stats() if streamer else None
+    return {"status": "online", "agent_id": AGENT_ID, "stream": stream_stats}
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,106 @@
+"""
+Streaming transcript processing for the Entity Extraction Agent.
+
+During a live call each trace sends many small utterances. The streamer keeps
+the tail of every trace's transcript, so a name split across two chunks is
+still tagged, and remembers which entities a trace has already emitted so each
+one reaches the downstream pipeline once per call. Idle traces are evicted
+after a TTL.
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from shared.expiry import evict_idle
+
+
+class _TraceState:
+    __slots__ = ("tail", "emitted", "last_seen")
+
+    def __init__(self, now):
+        self.tail = ""
+        self.emitted = set()
+        self.last_seen = now
+
+
+class TranscriptStreamer:
+    """Sliding-window entity tagging with per-trace dedup and TTL eviction."""
+
+    def __init__(self, gazetteer, ttl_seconds: float = 900.0, max_traces: int = 10000):
+        self.gazetteer = gazetteer
+        self.ttl_seconds = ttl_seconds
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = Lock()
+        self.mentions_seen = 0
+        self.entities_emitted = 0
+
+    def feed(self, trace_id: str, text: str, final: bool = False) -> list:
+        """
+        Tags one chunk of a trace's transcript and returns only the entities
+        this trace has not emitted before. `final` drops the trace's state.
+        """
+        now = time.time()
+        with self._lock:
+            evict_idle(self._traces, now, self.ttl_seconds, self.max_traces)
+            state = self._traces.pop(trace_id, None) or _TraceState(now)
+            state.last_seen = now
+
+            tail = state.tail
+            if tail and text and not tail[-1].isspace() and not text[0].isspace():
+                tail += " "
+            window = tail + text
+            mentions = self.gazetteer.extract(window, min_end=len(tail))
+            self.mentions_seen += len(mentions)
+
+            new_entities = []
+            for mention in mentions:
+                key = (mention["entity"], mention["entity_type"])
+                if key in state.emitted:
+                    continue
+                state.emitted.add(key)
+                new_entities.append(mention)
+            self.entities_emitted += len(new_entities)
+
+            if not final:
+                state.tail = self._trim(window)
+                self._traces[trace_id] = state
+            return new_entities
+
+    def seed(self, trace_id: str, entities: list) -> int:
+        """
+        Marks entities as already emitted for a trace, e.g. the accounts of a
+        meeting that were precomputed before the call. Returns how many were new.
+        """
+        now = time.time()
+        with self._lock:
+            evict_idle(self._traces, now, self.ttl_seconds, self.max_traces)
+            state = self._traces.pop(trace_id, None) or _TraceState(now)
+            state.last_seen = now
+            before = len(state.emitted)
+            state.emitted.update((entity["entity"], entity["entity_type"]) for entity in entities)
+            self._traces[trace_id] = state
+            return len(state.emitted) - before
+
+    def _trim(self, window):
+        """Keeps just enough of the window to catch a name split across chunks."""
+        keep = self.gazetteer.max_pattern_length
+        if len(window) <= keep:
+            return window
+        cut = len(window) - keep
+        tail = window[cut:]
+        if window[cut - 1].isalnum():
+            # Don't let a half word at the cut look like a word boundary.
+            space = tail.find(" ")
+            tail = tail[space + 1:] if space >= 0 else ""
+        return tail
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active_traces": len(self._traces),
+                "mentions_seen": self.mentions_seen,
+                "entities_emitted": self.entities_emitted,
+                "duplicates_suppressed": self.mentions_seen - self.entities_emitted,
+            }
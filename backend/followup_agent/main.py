@@ -1,4 +1,5 @@
 import os
+import sys
 import redis
 import json
 import time
@@ -7,17 +8,29 @@ import requests
 from fastapi import FastAPI
 from threading import Thread
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.prompts import PromptBuilder, prompt_stats, token_budget
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, routed_models
 
 load_dotenv()
 
 # --- Configuration ---
 AGENT_ID = "followup_agent_v1"
-LISTEN_TO_CHANNEL = "action_items.created"
+STAGE = load_pipeline().stage("followup")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL_NAME = "google/gemini-flash-1.5"
+# The model for each call is picked per prompt from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+PROMPT_TOKEN_BUDGET = token_budget(AGENT_ID, 1500)
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
@@ -26,10 +39,12 @@ def publish_event(channel, data, trace_id=None):
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data,
-        "trace_id": trace_id
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
 def generate_followup_plan(action_items: list) -> dict:
@@ -51,10 +66,8 @@ def generate_followup_plan(action_items: list) -> dict:
         }
     
     try:
-        prompt = f"""
-        Create a comprehensive follow-up plan based on these action items:
-        {json.dumps(action_items, indent=2)}
-        
+        prompt = PromptBuilder(AGENT_ID, PROMPT_TOKEN_BUDGET).instruction("""
+        Create a comprehensive follow-up plan based on these action items.
         Return ONLY a valid JSON object with these keys:
         - "followup_plan": object with "immediate_actions", "short_term", "long_term" arrays
         - "timeline": object with "next_24_hours", "next_week", "next_month" arrays
@@ -62,21 +75,21 @@ def generate_followup_plan(action_items: list) -> dict:
         - "priority_levels": object mapping each action to priority (high/medium/low)
         - "success_metrics": array of metrics to track follow-up success
         - "escalation_triggers": array of conditions that should trigger escalation
-        
         Focus on creating an actionable, time-bound follow-up strategy.
-        """
+        """).section("Action items", action_items).build()
         
         headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [{"role": "user", "content": prompt}],
-            "response_format": {"type": "json_object"}
-        }
+        with router.route(prompt) as model:
+            payload = {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "response_format": {"type": "json_object"}
+            }
         
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
+            response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
+            response.raise_for_status()
         
-        followup_data = json.loads(response.json()["choices"][0]["message"]["content"])
+            followup_data = json.loads(response.json()["choices"][0]["message"]["content"])
         return followup_data
         
     except Exception as e:
@@ -98,24 +111,29 @@ def generate_followup_plan(action_items: list) -> dict:
 
 def process_event(message):
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         trace_id = data.get("trace_id")
-        action_items = data.get("payload", {}).get("actions", [])
+        action_items = resolve(redis_client, data.get("payload", {})).get("actions", [])
         
         if action_items and trace_id:
             print(f"[{AGENT_ID}] Generating follow-up plan...")
             followup_plan = generate_followup_plan(action_items)
-            publish_event("followup.plan_generated", followup_plan, trace_id)
+            publish_event(OUTPUT_CHANNEL, followup_plan, trace_id)
     except Exception as e:
         print(f"[{AGENT_ID}] Error: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -126,6 +144,26 @@ async def startup_event():
     except Exception as e:
         print(f"[{AGENT_ID}] Startup failed: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/prompts")
+def prompt_metrics():
+    return prompt_stats(AGENT_ID)
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -1,12 +1,25 @@
 import os
+import sys
 import redis
 import json
 import time
 import uuid
 import requests
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from typing import Any, Dict, List
 from threading import Thread
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.prompts import PromptBuilder, compact_json, prompt_stats, token_budget
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, routed_models
+from shared.semantic_cache import SemanticCache
+from scorer import LeadScorer
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -14,68 +27,115 @@ load_dotenv()
 # --- Configuration ---
 AGENT_ID = "lead_scoring_agent_v1"
 # --- THIS WAS THE BUG! Corrected to listen for the right signal ---
-LISTEN_TO_CHANNEL = "person.enriched" 
+STAGE = load_pipeline().stage("lead_scoring")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL_NAME = "google/gemini-flash-1.5"
+# The model for each call is picked per prompt from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+PROMPT_TOKEN_BUDGET = token_budget(AGENT_ID, 800)
+# The LLM only writes the narrative 'reason'; scores are always computed locally.
+LEAD_REASON_WITH_LLM = os.getenv("LEAD_REASON_WITH_LLM", "true").lower() == "true"
+LEAD_SCORING_WEIGHTS = json.loads(os.getenv("LEAD_SCORING_WEIGHTS", "{}"))
+MAX_BULK_LEADS = int(os.getenv("MAX_BULK_LEADS", 100000))
+# Near-duplicate prompts are answered from a semantic cache (SEMANTIC_CACHE_<AGENT_ID>=false turns it off).
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 1000))
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
+scorer = LeadScorer(LEAD_SCORING_WEIGHTS)
+semantic_cache = SemanticCache(AGENT_ID, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE)
+
+class BulkScorePayload(BaseModel):
+    leads: List[Dict[str, Any]]
 
 def publish_event(channel, data, trace_id):
     """A helper function to publish a structured event to a Redis channel."""
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data,
-        "trace_id": trace_id
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
-def score_lead(person_data: dict) -> dict:
-    """Scores the lead by calling the OpenRouter LLM API."""
-    if not OPENROUTER_API_KEY or "sk-or-..." in OPENROUTER_API_KEY:
-        return {"qualification_status": "Error", "reason": "API Key not configured."}
+def llm_available() -> bool:
+    return bool(LEAD_REASON_WITH_LLM and OPENROUTER_API_KEY and "sk-or-..." not in OPENROUTER_API_KEY)
+
+def narrate_reason(person_data: dict, result: dict) -> str:
+    """Asks the LLM to explain an already computed score. Returns None on failure."""
+    # Leads at the same company with the same score and features share a reason,
+    # so the prompt only carries what the cache key does (no name).
+    inputs = compact_json({
+        "score": result["lead_score"], "status": result["qualification_status"], "features": result["features"],
+        "profile": {field: person_data.get(field) for field in ("title", "employees", "company_size", "engagement")},
+    })
+    company = str(person_data.get("company") or "")
+    cached = semantic_cache.get("reason", inputs, company)
+    if cached is not None:
+        return cached
     try:
-        prompt = f"""
-        Score this sales lead based on their profile: {json.dumps(person_data, indent=2)}
-        Return ONLY a valid JSON object with keys: "lead_score" (0-100), "qualification_status" ("Hot", "Warm", "Cold"), and "reason" (a brief explanation).
-        """
+        prompt = PromptBuilder(AGENT_ID, PROMPT_TOKEN_BUDGET).instruction(f"""
+        A sales lead was scored {result['lead_score']}/100 ({result['qualification_status']}).
+        In one or two sentences, explain this score for a sales rep. Return ONLY the explanation.
+        """).section("Features", result["features"], importance=1).section(
+            "Profile", person_data, fields=["title", "company", "employees", "company_size", "engagement"],
+        ).build()
         headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-        payload = {"model": MODEL_NAME, "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}}
-        
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        
-        return json.loads(response.json()["choices"][0]["message"]["content"])
+        with router.route(prompt) as model:
+            payload = {"model": model, "messages": [{"role": "user", "content": prompt}]}
+
+            response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
+            response.raise_for_status()
+            reason = response.json()["choices"][0]["message"]["content"].strip()
+        semantic_cache.put("reason", inputs, reason, company)
+        return reason
     except Exception as e:
-        print(f"[{AGENT_ID}] LLM call failed: {e}")
-        return {"qualification_status": "Error", "reason": "API call failed."}
+        print(f"[{AGENT_ID}] LLM reason failed, keeping the rule-based one: {e}")
+        return None
+
+def score_lead(person_data: dict) -> dict:
+    """Scores one lead locally; the LLM, when configured, only rewrites the reason."""
+    result = scorer.score([person_data])[0]
+    if llm_available():
+        reason = narrate_reason(person_data, result)
+        if reason:
+            result["reason"] = reason
+    return result
 
 def process_event(message):
     """Processes an event received from the subscribed Redis channel."""
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         trace_id = data.get("trace_id")
-        person_data = data.get("payload", {})
+        person_data = resolve(redis_client, data.get("payload", {}))
         
         if person_data and trace_id:
             print(f"[{AGENT_ID}] Received person data. Scoring lead...")
             lead_score_data = score_lead(person_data)
-            publish_event("lead.scored", lead_score_data, trace_id)
+            publish_event(OUTPUT_CHANNEL, lead_score_data, trace_id)
     except Exception as e:
         print(f"[{AGENT_ID}] Error processing event: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     """Connects to Redis and enters a loop to listen for messages."""
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -87,4 +147,41 @@ async def startup_event():
         print(f"[{AGENT_ID}] Successfully connected to Redis.")
         Thread(target=listen_for_events, daemon=True).start()
     except Exception as e:
-        print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
\ No newline at end of file
+        print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
+@app.post("/score")
+def score_leads(request: BulkScorePayload):
+    """Scores a batch of lead profiles (e.g. a CRM backfill). Never calls the LLM."""
+    if len(request.leads) > MAX_BULK_LEADS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_LEADS} leads per request.")
+    started = time.perf_counter()
+    results = scorer.score(request.leads)
+    return {
+        "count": len(results),
+        "results": results,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+@app.get("/semantic_cache")
+def semantic_cache_stats():
+    return semantic_cache.stats()
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/prompts")
+def prompt_metrics():
+    return prompt_stats(AGENT_ID)
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,181 @@
+"""
+Feature-based lead scoring for the Lead Scoring Agent.
+
+Each lead profile is reduced to four features in [0, 1]:
+
+- seniority: from the job title (C-level > VP > director > manager > IC)
+- function_fit: whether the title's department is one we sell to
+- company_size: log-scaled employee count (10,000+ saturates)
+- engagement: email opens/clicks, site visits, meetings and demo requests,
+  decayed by days since the last activity
+
+Title and company-size strings repeat heavily across a CRM, so their parsing
+is memoized; everything after extraction is NumPy over the whole batch. The
+score is the weighted mean of the features scaled to 0-100.
+"""
+
+import math
+import re
+from functools import lru_cache
+
+import numpy as np
+
+FEATURES = ("seniority", "function_fit", "company_size", "engagement")
+DEFAULT_WEIGHTS = {"seniority": 0.35, "function_fit": 0.1, "company_size": 0.2, "engagement": 0.35}
+HOT_THRESHOLD = 70
+WARM_THRESHOLD = 40
+
+# (pattern, level, label); the highest level found in the title wins.
+_SENIORITY = [
+    (r"\b(?:chief|c[etfoi]o|founder|co-founder|owner|president|partner)\b", 1.0, "C-level"),
+    (r"\b(?:vp|svp|evp|vice president|head of)\b", 0.85, "VP"),
+    (r"\b(?:director)\b", 0.7, "director"),
+    (r"\b(?:manager|lead|principal|architect)\b", 0.5, "manager"),
+    (r"\b(?:senior|sr|staff|specialist|engineer|analyst|consultant)\b", 0.3, "individual contributor"),
+    (r"\b(?:intern|student|assistant|trainee|junior|jr)\b", 0.05, "junior"),
+]
+_SENIORITY = [(re.compile(pattern), level, label) for pattern, level, label in _SENIORITY]
+_UNKNOWN_SENIORITY = (0.2, "unknown seniority")
+
+_BUYING_FUNCTIONS = re.compile(
+    r"\b(?:it|technology|engineering|innovation|digital|data|operations|procurement|product|"
+    r"information|infrastructure|cto|cio|coo|ceo)\b"
+)
+_ADJACENT_FUNCTIONS = re.compile(r"\b(?:sales|marketing|finance|cfo|revenue|strategy|business)\b")
+_NUMBER = re.compile(r"(\d[\d,.]*)\s*([km]?)", re.IGNORECASE)
+_UNKNOWN_SIZE = 0.3
+
+
+@lru_cache(maxsize=65536)
+def parse_title(title: str):
+    """(seniority, seniority_label, function_fit) for a job title."""
+    lowered = title.lower()
+    seniority, label = _UNKNOWN_SENIORITY
+    for pattern, level, name in _SENIORITY:
+        if pattern.search(lowered):
+            seniority, label = level, name
+            break
+    if _BUYING_FUNCTIONS.search(lowered):
+        function_fit = 1.0
+    elif _ADJACENT_FUNCTIONS.search(lowered):
+        function_fit = 0.5
+    else:
+        function_fit = 0.3
+    return seniority, label, function_fit
+
+
+@lru_cache(maxsize=4096)
+def parse_company_size(value: str) -> float:
+    """Employee count from CRM strings such as '51-200', '10,001+' or '1k-5k' (NaN if none)."""
+    counts = []
+    for digits, suffix in _NUMBER.findall(value):
+        try:
+            number = float(digits.replace(",", ""))
+        except ValueError:
+            continue
+        counts.append(number * {"k": 1e3, "m": 1e6}.get(suffix.lower(), 1.0))
+    return sum(counts) / len(counts) if counts else math.nan
+
+
+def _number(value) -> float:
+    """A CRM field as a finite float; anything else (e.g. "yes", "high", None) is missing (NaN)."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number if math.isfinite(number) else math.nan
+
+
+def _employee_count(lead: dict) -> float:
+    for key in ("employee_count", "employees", "company_size"):
+        value = lead.get(key)
+        if value is None:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return _number(value)
+        return parse_company_size(str(value))
+    return math.nan
+
+
+_ENGAGEMENT_FIELDS = ("email_opens", "email_clicks", "website_visits", "meetings", "demo_requested")
+_ENGAGEMENT_WEIGHTS = np.array([0.1, 0.3, 0.1, 0.8, 1.5])
+_RECENCY_DAYS = 30.0
+
+
+class LeadScorer:
+    """Deterministic weighted scoring over extracted lead features."""
+
+    def __init__(self, weights: dict = None):
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        vector = np.array([float(weights[name]) for name in FEATURES])
+        self.weights = vector / vector.sum()
+
+    def extract(self, leads: list) -> dict:
+        """Feature arrays for a batch of lead profiles, plus the seniority labels."""
+        n = len(leads)
+        seniority = np.empty(n)
+        function_fit = np.empty(n)
+        employees = np.empty(n)
+        activity = np.zeros((n, len(_ENGAGEMENT_FIELDS)))
+        days = np.full(n, np.nan)
+        labels = []
+        for i, lead in enumerate(leads):
+            # A malformed row scores on whatever it has; it must not fail the whole batch.
+            if not isinstance(lead, dict):
+                lead = {}
+            seniority[i], label, function_fit[i] = parse_title(str(lead.get("title") or ""))
+            labels.append(label)
+            employees[i] = _employee_count(lead)
+            engagement = lead.get("engagement")
+            if not isinstance(engagement, dict):
+                engagement = lead
+            for j, field in enumerate(_ENGAGEMENT_FIELDS):
+                value = _number(engagement.get(field))
+                if value > 0:
+                    activity[i, j] = value
+            days[i] = _number(engagement.get("days_since_last_activity"))
+
+        size = np.where(np.isnan(employees), _UNKNOWN_SIZE,
+                        np.clip(np.log10(np.maximum(employees, 1.0)) / 4.0, 0.0, 1.0))
+        # Activity with no known date counts half, as if it were a month old.
+        recency = np.where(np.isnan(days), 0.5, np.exp(-np.maximum(days, 0.0) / _RECENCY_DAYS))
+        engagement = (1.0 - np.exp(-(activity @ _ENGAGEMENT_WEIGHTS))) * recency
+        return {
+            "matrix": np.column_stack([seniority, function_fit, size, engagement]),
+            "seniority_labels": labels,
+            "employees": employees,
+        }
+
+    def score(self, leads: list) -> list:
+        """Scores a batch of leads; returns one result dict per lead, in order."""
+        if not leads:
+            return []
+        features = self.extract(leads)
+        matrix = features["matrix"]
+        scores = np.rint(matrix @ self.weights * 100).astype(int)
+        statuses = np.where(scores >= HOT_THRESHOLD, "Hot",
+                            np.where(scores >= WARM_THRESHOLD, "Warm", "Cold"))
+        results = []
+        for i, (score, status) in enumerate(zip(scores.tolist(), statuses.tolist())):
+            results.append({
+                "lead_score": score,
+                "qualification_status": status,
+                "reason": _reason(features["seniority_labels"][i], features["employees"][i], matrix[i]),
+                "features": dict(zip(FEATURES, matrix[i].round(3).tolist())),
+            })
+        return results
+
+
+def _reason(seniority_label, employees, row):
+    parts = [f"{seniority_label} title"]
+    if not math.isnan(employees):
+        parts.append(f"company of ~{int(employees):,} employees")
+    engagement = row[3]
+    if engagement >= 0.6:
+        parts.append("strong recent engagement")
+    elif engagement >= 0.25:
+        parts.append("some engagement")
+    else:
+        parts.append("little engagement")
+    reason = "; ".join(parts)
+    return reason[0].upper() + reason[1:] + "."
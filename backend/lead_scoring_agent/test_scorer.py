@@ -0,0 +1,24 @@
+from scorer import LeadScorer
+
+
+def test_bad_rows_score_as_missing_fields():
+    clean = {"title": "VP of Engineering", "employees": 5000,
+             "engagement": {"email_clicks": 2, "demo_requested": 1, "days_since_last_activity": 3}}
+    bad_rows = [
+        {"title": "VP of Engineering", "engagement": "high"},
+        {"title": "CTO", "demo_requested": "yes"},
+        {"title": "Director", "employee_count": "n/a", "engagement": {"meetings": None,
+                                                                      "days_since_last_activity": "recently"}},
+        {"title": None, "employees": float("nan"), "engagement": ["email_opens"]},
+        "not a lead",
+    ]
+    results = LeadScorer().score([clean] + bad_rows)
+
+    assert len(results) == 1 + len(bad_rows)
+    for result in results:
+        assert 0 <= result["lead_score"] <= 100
+    # Unparseable engagement counts as no engagement, not as a failure.
+    assert results[1]["features"]["engagement"] == 0.0
+    assert results[2]["features"]["engagement"] == 0.0
+    # The clean row scores the same as it does on its own.
+    assert results[0] == LeadScorer().score([clean])[0]
@@ -1,15 +1,23 @@
 import os
+import sys
 import redis
 import json
+import random
 import time
 from fastapi import FastAPI
 from threading import Thread
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.envelope import decode
 
 # --- Configuration ---
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 AGENT_ID = "logger_agent_v1"
 LISTEN_TO_CHANNEL = "*" # Wildcard to listen to ALL channels
+# Optional sample of events, one JSON envelope per line, for offline analysis
+# such as training the payload compression dictionary
+EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH")
+EVENT_LOG_SAMPLE_RATE = float(os.getenv("EVENT_LOG_SAMPLE_RATE", 1.0))
 
 # --- FastAPI App Initialization ---
 app = FastAPI(title=AGENT_ID, version="1.0.0")
@@ -17,13 +25,23 @@ app = FastAPI(title=AGENT_ID, version="1.0.0")
 # --- Redis Connection & Event Processing ---
 redis_client = None
 
+def as_json(data):
+    """The event as one line of plain JSON, whatever envelope version it came in."""
+    try:
+        return decode(data).to_json()
+    except ValueError:
+        return data # Not an envelope; log it as published
+
 def process_event(message):
     """Processes a single event received from Redis by logging it."""
     try:
         channel = message['channel']
-        data = message["data"]
-        # For the logger, we just print the raw event to simulate storing it.
+        data = as_json(message["data"])
+        # For the logger, we just print the event to simulate storing it.
         print(f"[{AGENT_ID}] LOG ==> Channel: '{channel}' | Data: {data}")
+        if EVENT_LOG_PATH and random.random() < EVENT_LOG_SAMPLE_RATE:
+            with open(EVENT_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(data + "\n")
     except Exception as e:
         print(f"[{AGENT_ID}] CRITICAL: Error processing event: {e}")
 
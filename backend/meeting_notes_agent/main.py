@@ -1,4 +1,5 @@
 import os
+import sys
 import redis
 import json
 import time
@@ -7,17 +8,29 @@ import requests
 from fastapi import FastAPI
 from threading import Thread
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.prompts import PromptBuilder, prompt_stats, token_budget
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, routed_models
 
 load_dotenv()
 
 # --- Configuration ---
 AGENT_ID = "meeting_notes_agent_v1"
-LISTEN_TO_CHANNEL = "summary.created"
+STAGE = load_pipeline().stage("meeting_notes")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL_NAME = "google/gemini-flash-1.5"
+# The model for each call is picked per prompt from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+PROMPT_TOKEN_BUDGET = token_budget(AGENT_ID, 2000)
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
@@ -26,10 +39,12 @@ def publish_event(channel, data, trace_id=None):
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data,
-        "trace_id": trace_id
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
 def structure_meeting_notes(summary: str) -> dict:
@@ -48,10 +63,8 @@ def structure_meeting_notes(summary: str) -> dict:
         }
     
     try:
-        prompt = f"""
-        Structure this sales conversation summary into organized meeting notes:
-        {summary}
-        
+        prompt = PromptBuilder(AGENT_ID, PROMPT_TOKEN_BUDGET).instruction("""
+        Structure this sales conversation summary into organized meeting notes.
         Return ONLY a valid JSON object with these keys:
         - "meeting_notes": object with "attendees", "key_topics", "decisions_made", "next_meeting"
         - "action_items": array of specific action items
@@ -59,21 +72,21 @@ def structure_meeting_notes(summary: str) -> dict:
         - "pain_points": array of customer pain points mentioned
         - "budget_indicators": array of budget-related information
         - "timeline": estimated timeline for decision making
-        
         Focus on extracting actionable information for follow-up.
-        """
+        """).section("Summary", summary).build()
         
         headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [{"role": "user", "content": prompt}],
-            "response_format": {"type": "json_object"}
-        }
-        
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        
-        notes_data = json.loads(response.json()["choices"][0]["message"]["content"])
+        with router.route(prompt) as model:
+            payload = {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "response_format": {"type": "json_object"}
+            }
+
+            response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
+            response.raise_for_status()
+
+            notes_data = json.loads(response.json()["choices"][0]["message"]["content"])
         return notes_data
         
     except Exception as e:
@@ -92,24 +105,33 @@ def structure_meeting_notes(summary: str) -> dict:
 
 def process_event(message):
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         trace_id = data.get("trace_id")
-        summary = data.get("payload", {}).get("summary")
+        payload = resolve(redis_client, data.get("payload", {}))
+        summary = payload.get("summary")
+        # Rolling summaries arrive every few blocks mid-call; only the final one is acted on.
+        if payload.get("final") is False:
+            return
         
         if summary and trace_id:
             print(f"[{AGENT_ID}] Structuring meeting notes...")
             meeting_notes = structure_meeting_notes(summary)
-            publish_event("meeting.notes_structured", meeting_notes, trace_id)
+            publish_event(OUTPUT_CHANNEL, meeting_notes, trace_id)
     except Exception as e:
         print(f"[{AGENT_ID}] Error: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -120,6 +142,26 @@ async def startup_event():
     except Exception as e:
         print(f"[{AGENT_ID}] Startup failed: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/prompts")
+def prompt_metrics():
+    return prompt_stats(AGENT_ID)
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,116 @@
+import os
+import sys
+import redis
+import time
+import uuid
+from fastapi import FastAPI, HTTPException
+from threading import Thread
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import PRIORITY_LIVE
+from shared.claimcheck import check_in
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.pipeline import JOIN_CHANNEL_PREFIX, TraceTracker, load_pipeline
+
+# --- Configuration ---
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+AGENT_ID = "orchestrator_agent_v1"
+LISTEN_TO_CHANNEL = "*" # Observes every channel to follow traces through the pipeline
+STREAM_TRACE_TTL_SECONDS = float(os.getenv("STREAM_TRACE_TTL_SECONDS", 900))
+
+# The spec is validated here, at import time, so a broken graph fails startup.
+pipeline = load_pipeline()
+tracker = TraceTracker(pipeline, ttl_seconds=STREAM_TRACE_TTL_SECONDS)
+
+# --- FastAPI App Initialization ---
+app = FastAPI(title=AGENT_ID, version="1.0.0")
+
+# --- Redis Connection & Event Processing ---
+redis_client = None
+publisher = Publisher(AGENT_ID)
+
+def publish_join(stage, joined, trigger):
+    """Publishes the joined inputs of an "all" stage on its join channel."""
+    if not redis_client: return
+    event_envelope = {
+        "event_id": str(uuid.uuid4()), "timestamp": time.time(),
+        "agent_id": AGENT_ID, "channel": stage.join_channel,
+        # Claimed inputs are passed on as claims; the stage resolves what it needs.
+        "payload": check_in(redis_client, {
+            "stage": stage.name,
+            "inputs": {channel: envelope.get("payload", {}) for channel, envelope in joined.items()},
+            "event_ids": {channel: envelope.get("event_id") for channel, envelope in joined.items()},
+        }),
+        "trace_id": trigger.get("trace_id"),
+        # The join runs at the priority of the event that completed it.
+        "priority": trigger.get("priority", PRIORITY_LIVE)
+    }
+    publisher.publish(stage.join_channel, encode(event_envelope))
+    print(f"[{AGENT_ID}] Joined {sorted(joined)} for stage '{stage.name}' (trace {trigger.get('trace_id')}).")
+
+def process_event(message):
+    """Records an event against its trace and fires any join it completes."""
+    if message["channel"].startswith(JOIN_CHANNEL_PREFIX):
+        return
+    try:
+        # Only the header is decoded; payloads are read for join keys and joins.
+        envelope = decode(message["data"])
+    except ValueError:
+        return # Not a JSON envelope; nothing to track
+    try:
+        envelope.setdefault("channel", message["channel"])
+        for stage, joined in tracker.observe(envelope):
+            publish_join(stage, joined, envelope)
+    except Exception as e:
+        print(f"[{AGENT_ID}] CRITICAL: Error processing event: {e}")
+
+def listen_for_events():
+    """Connects to Redis and enters a blocking loop to listen for events."""
+    if not redis_client: return
+
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.psubscribe(LISTEN_TO_CHANNEL)
+
+    print(f"[{AGENT_ID}] Pipeline valid: {len(pipeline.stages)} stages in {len(pipeline.waves)} waves. Observing all channels...")
+    for message in pubsub.listen():
+        process_event(message)
+
+@app.on_event("startup")
+async def startup_event():
+    """Initializes Redis connection and starts the listener thread on app startup."""
+    global redis_client
+    try:
+        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+        redis_client.ping()
+        print(f"[{AGENT_ID}] Successfully connected to Redis.")
+        publisher.start(redis_client)
+        thread = Thread(target=listen_for_events, daemon=True)
+        thread.start()
+    except redis.exceptions.ConnectionError as e:
+        print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
+        redis_client = None
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
+@app.get("/")
+def read_root():
+    return {"status": "online", "agent_id": AGENT_ID, **tracker.stats()}
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
+
+@app.get("/pipeline")
+def pipeline_graph():
+    """The stages, their start-up waves and the expected critical path."""
+    return pipeline.to_dict()
+
+@app.get("/traces/{trace_id}/critical_path")
+def trace_critical_path(trace_id: str):
+    path = tracker.critical_path(trace_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired trace.")
+    return path
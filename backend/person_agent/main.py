@@ -1,37 +1,54 @@
 import os
+import sys
 import redis
-import json
 import time
 import uuid
 from fastapi import FastAPI
 from threading import Thread
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in
+from shared.pipeline import load_pipeline
 
 # --- Configuration ---
 AGENT_ID = "person_enrichment_agent_v1"
-LISTEN_TO_CHANNEL = "entity.found"
+STAGE = load_pipeline().stage("person")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
 
-def publish_event(channel, data):
+def publish_event(channel, data, trace_id=None):
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
 def process_event(message):
     try:
-        data = json.loads(message["data"])
-        entity = data.get("payload", {}).get("entity", "").lower()
+        data = decode(message["data"])
+        payload = data.get("payload", {})
+        entity = payload.get("entity", "").lower()
+        entity_type = payload.get("entity_type")
 
-        # Simple mock logic: if the entity is a common name, "enrich" it.
+        # Typed entities come from the entity agent's gazetteer; untyped ones
+        # (e.g. straight from the UI trigger) fall back to the name check.
         common_names = ["john", "jane", "alex", "samantha"]
-        if any(name in entity for name in common_names):
+        if entity_type:
+            is_person = entity_type == "person"
+        else:
+            is_person = any(name in entity for name in common_names)
+        if is_person:
             print(f"[{AGENT_ID}] Person entity '{entity}' detected. Enriching...")
             time.sleep(2) # Simulate API call latency
             
@@ -42,17 +59,22 @@ def process_event(message):
                 "linkedin": f"https://linkedin.com/in/{entity.replace(' ', '')}",
                 "source": "Mock People API v2.1"
             }
-            publish_event("person.enriched", mock_profile)
+            publish_event(OUTPUT_CHANNEL, mock_profile, data.get("trace_id"))
     except Exception as e:
         print(f"[{AGENT_ID}] Error: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -66,6 +88,18 @@ async def startup_event():
     except redis.exceptions.ConnectionError as e:
         print(f"[{AGENT_ID}] Redis connection failed: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -1,112 +1,156 @@
 import os
+import sys
 import redis
 import json
 import time
 import uuid
 import requests
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.prompts import PromptBuilder, prompt_stats, token_budget
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, carry, routed_models
+from rate_card import DEFAULT_RATE_CARD_PATH, load_rate_card
 
 load_dotenv()
 
 # --- Configuration ---
 AGENT_ID = "pricing_intelligence_agent_v1"
-LISTEN_TO_CHANNEL = "competitor.analyzed"
+STAGE = load_pipeline().stage("pricing")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL_NAME = "google/gemini-flash-1.5"
+# The model for each call is picked per prompt from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+PROMPT_TOKEN_BUDGET = token_budget(AGENT_ID, 1000)
+RATE_CARD_PATH = os.getenv("RATE_CARD_PATH", DEFAULT_RATE_CARD_PATH)
+# How long the numbers wait for the LLM's negotiation tips before publishing without them.
+NEGOTIATION_TIPS_TIMEOUT = float(os.getenv("NEGOTIATION_TIPS_TIMEOUT", 15))
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
+rate_card = load_rate_card(RATE_CARD_PATH)
+tips_executor = ThreadPoolExecutor(max_workers=4)
 
 def publish_event(channel, data, trace_id=None):
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data,
-        "trace_id": trace_id
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
-def generate_pricing_strategy(competitor_data: dict) -> dict:
-    """Generates pricing strategy based on competitor analysis."""
-    if not OPENROUTER_API_KEY or "..." in OPENROUTER_API_KEY:
-        return {
-            "pricing_strategy": {
-                "recommended_approach": "Value-based pricing",
-                "price_range": "$50,000 - $75,000",
-                "discount_strategy": "10-15% for annual contracts"
-            },
-            "competitive_advantages": ["Superior support", "Better integration"],
-            "pricing_tactics": ["Bundle services", "Offer pilot programs"],
-            "source": "Mock pricing strategy - API key not configured"
-        }
-    
+def llm_configured() -> bool:
+    return bool(OPENROUTER_API_KEY and "..." not in OPENROUTER_API_KEY)
+
+def generate_negotiation_tips(competitor_data: dict) -> list:
+    """Asks the LLM for negotiation tips only; all figures come from the rate card."""
     try:
-        prompt = f"""
-        Based on this competitor analysis, generate a pricing strategy for our sales team:
-        {json.dumps(competitor_data, indent=2)}
-        
-        Return ONLY a valid JSON object with these keys:
-        - "pricing_strategy": object with "recommended_approach", "price_range", "discount_strategy"
-        - "competitive_advantages": array of our advantages to highlight
-        - "pricing_tactics": array of specific pricing tactics to use
-        - "value_proposition": string describing our unique value
-        - "negotiation_tips": array of tips for price negotiations
-        
-        Focus on actionable pricing insights for sales conversations.
-        """
-        
+        prompt = PromptBuilder(AGENT_ID, PROMPT_TOKEN_BUDGET).instruction("""
+        Based on this competitor analysis, write negotiation tips for our sales team.
+        Do not quote prices or discount percentages; those are set separately.
+        Return ONLY a valid JSON object with one key, "negotiation_tips": an array of short tips.
+        """).section(
+            "Competitor analysis", competitor_data,
+            fields=["competitor", "weaknesses", "strengths", "counter_strategy"],
+        ).build()
         headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [{"role": "user", "content": prompt}],
-            "response_format": {"type": "json_object"}
-        }
-        
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        
-        pricing_data = json.loads(response.json()["choices"][0]["message"]["content"])
-        return pricing_data
-        
+        with router.route(prompt) as model:
+            payload = {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "response_format": {"type": "json_object"}
+            }
+
+            response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
+            response.raise_for_status()
+
+            return json.loads(response.json()["choices"][0]["message"]["content"]).get("negotiation_tips", [])
     except Exception as e:
         print(f"[{AGENT_ID}] LLM call failed: {e}")
-        return {
-            "pricing_strategy": {
-                "recommended_approach": "Competitive pricing",
-                "price_range": "Market rate",
-                "discount_strategy": "Standard discounts"
-            },
-            "competitive_advantages": ["Quality", "Service"],
-            "pricing_tactics": ["Focus on value"],
-            "source": f"Pricing analysis failed: {str(e)}"
-        }
+        return []
+
+def generate_pricing_strategy(competitor_data: dict) -> dict:
+    """
+    Prices the deal from the rate card. The LLM, if configured, writes the
+    negotiation tips concurrently and never touches the numbers.
+    """
+    tips_future = tips_executor.submit(carry(generate_negotiation_tips), competitor_data) if llm_configured() else None
+
+    competitor = (competitor_data.get("competitor") or "").strip().lower() or None
+    quote = rate_card.quote(
+        competitor_data.get("product") or rate_card.default_product,
+        competitor_data.get("tier") or rate_card.default_tier,
+        int(competitor_data.get("seats") or rate_card.default_seats),
+        competitor,
+    )
+    strategy = {
+        "pricing_strategy": {
+            "recommended_approach": quote["recommended_approach"],
+            "price_range": quote["price_range"],
+            "discount_strategy": (
+                f"Up to {quote['discount_ceiling']:.0%} off list; "
+                f"a further {quote['annual_prepay_discount']:.0%} for annual prepay"
+            ),
+        },
+        "competitive_advantages": competitor_data.get("weaknesses") or ["Superior support", "Better integration"],
+        "pricing_tactics": list(quote["tactics"]),
+        "quote": {key: value for key, value in quote.items() if key != "tactics"},
+        "negotiation_tips": [],
+        "source": "Rate card",
+    }
+
+    if tips_future:
+        try:
+            strategy["negotiation_tips"] = tips_future.result(timeout=NEGOTIATION_TIPS_TIMEOUT)
+            strategy["source"] = "Rate card + LLM negotiation tips"
+        except FutureTimeoutError:
+            print(f"[{AGENT_ID}] Negotiation tips timed out; publishing the numbers without them.")
+    return strategy
 
 def process_event(message):
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         trace_id = data.get("trace_id")
-        competitor_data = data.get("payload", {})
+        competitor_data = resolve(redis_client, data.get("payload", {}))
         
         if competitor_data and trace_id:
             print(f"[{AGENT_ID}] Generating pricing strategy...")
-            pricing_strategy = generate_pricing_strategy(competitor_data)
-            publish_event("pricing.strategy_generated", pricing_strategy, trace_id)
+            try:
+                pricing_strategy = generate_pricing_strategy(competitor_data)
+            except (KeyError, ValueError) as e:
+                print(f"[{AGENT_ID}] Cannot price this deal: {e}")
+                return
+            publish_event(OUTPUT_CHANNEL, pricing_strategy, trace_id)
     except Exception as e:
         print(f"[{AGENT_ID}] Error: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -117,6 +161,40 @@ async def startup_event():
     except Exception as e:
         print(f"[{AGENT_ID}] Startup failed: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/prompts")
+def prompt_metrics():
+    return prompt_stats(AGENT_ID)
+
+@app.get("/quote")
+def get_quote(product: str = None, tier: str = None, seats: int = None, competitor: str = None):
+    """Rate card quote without the LLM, e.g. for the UI's deal desk view."""
+    try:
+        quote = rate_card.quote(
+            product or rate_card.default_product, tier or rate_card.default_tier,
+            seats or rate_card.default_seats, competitor.lower() if competitor else None,
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {**quote, "tactics": list(quote["tactics"])}
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,107 @@
+"""
+Rate card pricing for the Pricing Intelligence Agent.
+
+The rate card file lists per-seat list and floor prices for every
+(product, tier, seat band), plus discount rules that may be scoped to a
+product, tier, seat band and/or competitor ("*" matches anything). At load
+time every rule is resolved against every rate, so a quote is two dict
+lookups and a bisect; quotes are memoized on top of that.
+
+Where several rules match, the most specific one (fewest wildcards) wins, and
+later rules win ties.
+"""
+
+import bisect
+import json
+import os
+from functools import lru_cache
+
+DEFAULT_RATE_CARD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_card.json")
+ANY = "*"
+_RULE_KEYS = ("product", "tier", "seat_band", "competitor")
+
+
+class RateCard:
+    """Indexed rate card; `quote` is deterministic and memoized."""
+
+    def __init__(self, card: dict, cache_size: int = 4096):
+        self.currency = card.get("currency", "USD")
+        self.default_product = card["default_product"]
+        self.default_tier = card["default_tier"]
+        self.default_seats = int(card.get("default_seats", 1))
+
+        bands = sorted(card["seat_bands"], key=lambda band: band["min_seats"])
+        self._band_starts = [band["min_seats"] for band in bands]
+        self._band_names = [band["band"] for band in bands]
+
+        self._rates = {}
+        for rate in card["rates"]:
+            key = (rate["product"], rate["tier"], rate["seat_band"])
+            if rate["list_price_per_seat"] < rate["floor_price_per_seat"]:
+                raise ValueError(f"Rate {key} has a floor above its list price.")
+            self._rates[key] = rate
+
+        rules = card["discount_rules"]
+        self.competitors = sorted({r.get("competitor", ANY) for r in rules} - {ANY})
+        # (product, tier, seat_band, competitor) -> the rule that applies
+        self._rules = {}
+        for rate_key in self._rates:
+            for competitor in self.competitors + [ANY]:
+                rule = _resolve(rules, rate_key + (competitor,))
+                if rule is None:
+                    raise ValueError(f"No discount rule covers {rate_key + (competitor,)}.")
+                self._rules[rate_key + (competitor,)] = rule
+
+        self.quote = lru_cache(maxsize=cache_size)(self._quote)
+
+    def seat_band(self, seats: int) -> str:
+        index = bisect.bisect_right(self._band_starts, seats) - 1
+        return self._band_names[max(index, 0)]
+
+    def _quote(self, product: str, tier: str, seats: int, competitor: str = None) -> dict:
+        if seats <= 0:
+            raise ValueError(f"Cannot quote {seats} seats.")
+        band = self.seat_band(seats)
+        rate = self._rates.get((product, tier, band))
+        if rate is None:
+            raise KeyError(f"No rate for {product}/{tier}/{band}.")
+        competitor_key = competitor if competitor in self.competitors else ANY
+        rule = self._rules[(product, tier, band, competitor_key)]
+
+        list_per_seat = rate["list_price_per_seat"]
+        floor_per_seat = rate["floor_price_per_seat"]
+        # The rule's discount can never take us below the floor price.
+        ceiling = min(rule["max_discount"], 1.0 - floor_per_seat / list_per_seat)
+        list_price = list_per_seat * seats
+        lowest_price = round(list_price * (1.0 - ceiling), 2)
+        return {
+            "product": product,
+            "tier": tier,
+            "seats": seats,
+            "seat_band": band,
+            "competitor": competitor_key if competitor_key != ANY else None,
+            "currency": self.currency,
+            "list_price": list_price,
+            "lowest_price": lowest_price,
+            "floor_price": floor_per_seat * seats,
+            "discount_ceiling": round(ceiling, 4),
+            "annual_prepay_discount": rule.get("annual_prepay_discount", 0.0),
+            "price_range": f"${lowest_price:,.0f} - ${list_price:,.0f}",
+            "recommended_approach": rule.get("recommended_approach"),
+            "tactics": tuple(rule.get("tactics", ())),
+        }
+
+
+def _resolve(rules, key):
+    best, best_specificity = None, -1
+    for rule in rules:
+        if all(rule.get(name, ANY) in (ANY, value) for name, value in zip(_RULE_KEYS, key)):
+            specificity = sum(rule.get(name, ANY) != ANY for name in _RULE_KEYS)
+            if specificity >= best_specificity:
+                best, best_specificity = rule, specificity
+    return best
+
+
+def load_rate_card(path: str = DEFAULT_RATE_CARD_PATH) -> RateCard:
+    with open(path, encoding="utf-8") as f:
+        return RateCard(json.load(f))
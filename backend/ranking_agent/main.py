@@ -1,24 +1,40 @@
 import os
+import sys
 import redis
-import json
 import time
 import uuid
 from fastapi import FastAPI
 from threading import Thread
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.pipeline import load_pipeline
+from collections import OrderedDict
+from ranker import rank
 
 # --- Configuration ---
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 AGENT_ID = "ranking_agent_v1"
-LISTEN_TO_CHANNEL = "suggestions.created"
+STAGE = load_pipeline().stage("ranking")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
+# Context the suggestions are ranked against, keyed by the domain.fetched event id
+CONTEXT_CHANNELS = STAGE.context
+MAX_CONTEXTS = 1000
+RANKING_TOP_K = int(os.getenv("RANKING_TOP_K", 0)) or None
+RANKING_DIVERSITY = float(os.getenv("RANKING_DIVERSITY", 0.3))
 
 # --- FastAPI App Initialization ---
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 
 # --- Redis Connection & Event Publishing ---
 redis_client = None
+contexts = OrderedDict()
 
-def publish_event(channel, data):
+def publish_event(channel, data, trace_id=None):
     """Publishes a structured event to a Redis channel."""
     if not redis_client:
         print(f"[{AGENT_ID}] ERROR: Cannot publish event, Redis is not connected.")
@@ -28,45 +44,68 @@ def publish_event(channel, data):
         "timestamp": time.time(),
         "agent_id": AGENT_ID,
         "channel": channel,
-        "payload": data
+        "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] SUCCESS: Published to '{channel}'.")
 
-def rank_suggestions(suggestions: list) -> list:
-    """
-    In a real system, this would involve a complex ranking algorithm.
-    For the hackathon, we will just pass them through to demonstrate the agent is working.
-    """
-    print(f"[{AGENT_ID}] INFO: 'Ranking' suggestions (passthrough).")
-    return suggestions
+def remember_context(key, texts):
+    """Keeps the latest context documents per domain event, bounded in size."""
+    if not key:
+        return
+    contexts.setdefault(key, []).extend(t for t in texts if isinstance(t, str))
+    contexts.move_to_end(key)
+    while len(contexts) > MAX_CONTEXTS:
+        contexts.popitem(last=False)
+
+def rank_suggestions(suggestions: list, context: list):
+    """Scores suggestions against the context and removes near-duplicates (MMR)."""
+    started = time.perf_counter()
+    ranked, scores = rank(suggestions, context, top_k=RANKING_TOP_K, diversity=RANKING_DIVERSITY)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"[{AGENT_ID}] INFO: Ranked {len(suggestions)} suggestions against {len(context)} context docs in {elapsed_ms:.2f}ms.")
+    return ranked, scores
 
 def process_event(message):
     """Processes a single event received from Redis."""
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         if data.get("agent_id") == AGENT_ID:
             return
+        channel = data.get("channel")
+        payload = resolve(redis_client, data.get("payload", {}))
 
-        if data.get("channel") == LISTEN_TO_CHANNEL:
-            payload = data.get("payload", {})
+        if channel == "domain.fetched":
+            remember_context(data.get("event_id"), [payload.get("description")])
+        elif channel == "documents.retrieved":
+            remember_context(payload.get("source_event_id"), payload.get("retrieved_snippets", []))
+        elif channel == LISTEN_TO_CHANNEL:
             suggestions_to_rank = payload.get("suggestions", [])
+            context = contexts.get(payload.get("source_event_id"), [])
             
-            ranked_suggestions = rank_suggestions(suggestions_to_rank)
+            ranked_suggestions, scores = rank_suggestions(suggestions_to_rank, context)
             
-            publish_event("suggestions.ranked", {"suggestions": ranked_suggestions, "source_event_id": data.get("event_id")})
+            publish_event(OUTPUT_CHANNEL, {"suggestions": ranked_suggestions, "scores": scores, "source_event_id": data.get("event_id")},
+                          data.get("trace_id"))
 
     except Exception as e:
         print(f"[{AGENT_ID}] CRITICAL: Error processing event: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     """Connects to Redis and enters a blocking loop to listen for events."""
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
-    pubsub.subscribe(LISTEN_TO_CHANNEL)
-    print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'. Listening for events...")
+    pubsub.subscribe(LISTEN_TO_CHANNEL, *CONTEXT_CHANNELS)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
+    print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}' and context channels. Listening for events...")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -82,6 +121,18 @@ async def startup_event():
         print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
         redis_client = None
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
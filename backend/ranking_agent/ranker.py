@@ -0,0 +1,95 @@
+"""
+Relevance and diversity ranking for the Ranking Agent.
+
+Candidates and context documents become hashed TF-IDF vectors (unigrams and
+bigrams) kept in sparse coordinate form, so every step is a NumPy gather or
+bincount over the non-zero entries rather than a dense matrix. Relevance is
+the dot product with the context centroid; Maximal Marginal Relevance (MMR)
+then picks candidates greedily, trading relevance against similarity to what
+has already been picked, and drops near-duplicates above
+`duplicate_threshold`.
+"""
+
+import string
+
+import numpy as np
+
+# Texts are joined around a "\x00" token, so one translate + split tokenizes them all.
+_PUNCTUATION_TO_SPACE = str.maketrans({ch: " " for ch in string.punctuation})
+_SEPARATOR_HASH = hash("\x00")
+_STOPWORDS = (
+    "a an and are as at be by for from has have in is it its of on or our that the their "
+    "they this to was we with you your".split()
+)
+# hash() is salted per process, which is fine: vectors never leave one call.
+_STOPWORD_HASHES = np.array([hash(word) for word in _STOPWORDS], dtype=np.int64)
+
+
+def hashed_tfidf(texts, n_features: int = 1024):
+    """
+    Returns the L2-normalized TF-IDF matrix of `texts` as sparse coordinates
+    (rows, cols, weights), sorted by row.
+    """
+    tokens = " \x00 ".join(texts).lower().translate(_PUNCTUATION_TO_SPACE).split()
+    hashes = np.fromiter(map(hash, tokens), dtype=np.int64, count=len(tokens))
+    separators = hashes == _SEPARATOR_HASH
+    rows = np.cumsum(separators)
+    keep = ~(separators | np.isin(hashes, _STOPWORD_HASHES))
+    unigrams, rows = hashes[keep], rows[keep]
+
+    # Bigrams, so 'customer support' counts as its own feature
+    same_text = rows[:-1] == rows[1:]
+    bigrams = (unigrams[:-1] * 1000003 ^ unigrams[1:])[same_text]
+    features = np.concatenate([unigrams, bigrams]) % n_features
+    feature_rows = np.concatenate([rows, rows[:-1][same_text]])
+
+    cells, counts = np.unique(feature_rows * n_features + features, return_counts=True)
+    rows, cols = cells // n_features, cells % n_features
+    doc_freq = np.bincount(cols, minlength=n_features)
+    idf = np.log((1.0 + len(texts)) / (1.0 + doc_freq)) + 1.0
+    weights = np.log1p(counts) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights * weights, minlength=len(texts)))
+    weights /= norms[rows]
+    return rows, cols, weights
+
+
+def rank(candidates: list, context: list, top_k: int = None, diversity: float = 0.3,
+         duplicate_threshold: float = 0.85, n_features: int = 1024):
+    """
+    Orders candidate talking points by MMR against the context documents.
+    Returns (ranked_candidates, relevance_scores) with near-duplicates removed.
+    """
+    n = len(candidates)
+    if not n:
+        return [], []
+    top_k = min(top_k or n, n)
+    rows, cols, weights = hashed_tfidf(list(candidates) + list(context), n_features)
+    split = np.searchsorted(rows, n)
+    c_rows, c_cols, c_weights = rows[:split], cols[:split], weights[:split]
+    starts = np.searchsorted(c_rows, np.arange(n + 1))
+
+    centroid = np.bincount(cols[split:], weights[split:], minlength=n_features)
+    norm = np.linalg.norm(centroid)
+    if norm:
+        relevance = np.bincount(c_rows, c_weights * (centroid / norm)[c_cols], minlength=n)
+    else:
+        relevance = np.zeros(n)
+
+    selected = []
+    max_sim = np.zeros(n)
+    available = np.ones(n, dtype=bool)
+    picked = np.zeros(n_features)
+    while len(selected) < top_k and available.any():
+        mmr = (1.0 - diversity) * relevance - diversity * max_sim
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        # Similarity of every candidate to the one just picked, one row at a time.
+        picked[:] = 0.0
+        lo, hi = starts[best], starts[best + 1]
+        picked[c_cols[lo:hi]] = c_weights[lo:hi]
+        np.maximum(max_sim, np.bincount(c_rows, c_weights * picked[c_cols], minlength=n), out=max_sim)
+        available &= max_sim < duplicate_threshold
+
+    return [candidates[i] for i in selected], [round(float(relevance[i]), 4) for i in selected]
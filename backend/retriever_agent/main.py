@@ -1,32 +1,42 @@
 import os
+import sys
 import redis
-import json
 import time
 import uuid
 from fastapi import FastAPI
 from threading import Thread
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in
+from shared.pipeline import load_pipeline
 
 # --- Configuration ---
 AGENT_ID = "retriever_rag_agent_v1"
-LISTEN_TO_CHANNEL = "domain.fetched"
+STAGE = load_pipeline().stage("retriever")
+LISTEN_TO_CHANNEL = STAGE.inputs[0]
+OUTPUT_CHANNEL = STAGE.outputs[0]
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
 app = FastAPI(title=AGENT_ID, version="1.0.0")
 redis_client = None
 
-def publish_event(channel, data):
+def publish_event(channel, data, trace_id=None):
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] Published to '{channel}'.")
 
 def process_event(message):
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         company_name = data.get("payload", {}).get("name", "the company")
         print(f"[{AGENT_ID}] Received domain info for {company_name}. Retrieving documents...")
         time.sleep(1.5) # Simulate vector DB query time
@@ -37,19 +47,25 @@ def process_event(message):
                 f"Sales Battlecard: When pitching against {company_name}, focus on our superior customer support and flexible pricing.",
                 "Market Analysis 2024: The report indicates a 15% market share growth for our main competitor, driven by their new AI platform."
             ],
-            "source": "Internal VectorDB (Pinecone Mock)"
+            "source": "Internal VectorDB (Pinecone Mock)",
+            "source_event_id": data.get("event_id")
         }
-        publish_event("documents.retrieved", mock_docs)
+        publish_event(OUTPUT_CHANNEL, mock_docs, data.get("trace_id"))
     except Exception as e:
         print(f"[{AGENT_ID}] Error: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe(LISTEN_TO_CHANNEL)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -63,6 +79,18 @@ async def startup_event():
     except redis.exceptions.ConnectionError as e:
         print(f"[{AGENT_ID}] Redis connection failed: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
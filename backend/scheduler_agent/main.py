@@ -0,0 +1,218 @@
+import os
+import sys
+import redis
+import json
+import time
+import uuid
+from fastapi import FastAPI, HTTPException, Request
+from threading import Lock, Thread
+from collections import OrderedDict
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import PRIORITY_BATCH
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.pipeline import load_pipeline
+from shared.precomputed import account_key, meeting_key, read_precomputed
+from meetings import account_from_email, normalize_account, parse_calendar
+
+# --- Configuration ---
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+AGENT_ID = "scheduler_agent_v1"
+# Calendar export (ICS or JSON) loaded at startup; more can be POSTed to /calendar
+CALENDAR_PATH = os.getenv("CALENDAR_PATH")
+INTERNAL_EMAIL_DOMAINS = {d.strip().lower() for d in os.getenv("INTERNAL_EMAIL_DOMAINS", "").split(",") if d.strip()}
+# Meetings are precomputed this long before they start
+PRECOMPUTE_LEAD_MINUTES = float(os.getenv("PRECOMPUTE_LEAD_MINUTES", 30))
+PRECOMPUTE_RETENTION_SECONDS = int(os.getenv("PRECOMPUTE_RETENTION_SECONDS", 86400))
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", 15))
+# Spreads a busy calendar over several ticks instead of one burst
+SCHEDULER_MAX_TRIGGERS_PER_TICK = int(os.getenv("SCHEDULER_MAX_TRIGGERS_PER_TICK", 20))
+ENTITY_CHANNEL = "entity.found"
+# Every stage output is collected for the scheduler's traces
+RESULT_CHANNELS = sorted({channel for stage in load_pipeline().stages.values() for channel in stage.outputs}
+                         - {ENTITY_CHANNEL})
+
+# --- FastAPI App Initialization ---
+app = FastAPI(title=AGENT_ID, version="1.0.0")
+
+# --- Redis Connection & Scheduling State ---
+redis_client = None
+publisher = Publisher(AGENT_ID)
+meetings = OrderedDict()
+triggered = {}
+trace_accounts = {}
+state_lock = Lock()
+stats = {"meetings_triggered": 0, "traces_started": 0, "results_stored": 0, "missed": 0}
+
+def publish_event(channel, data, trace_id):
+    if not redis_client: return
+    event_envelope = {
+        "event_id": str(uuid.uuid4()), "timestamp": time.time(),
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        # Precomputation never competes with live calls
+        "priority": PRIORITY_BATCH
+    }
+    publisher.publish(channel, encode(event_envelope))
+
+def add_meetings(new_meetings):
+    with state_lock:
+        for meeting in new_meetings:
+            meetings[meeting.meeting_id] = meeting
+    return len(new_meetings)
+
+def retention_for(meeting):
+    return int(max(meeting.start - time.time(), 0)) + PRECOMPUTE_RETENTION_SECONDS
+
+def precompute(meeting):
+    """Triggers one batch trace per account: the company, plus its attendees."""
+    traces, entities = {}, []
+    for account in meeting.accounts:
+        trace_id = f"meeting-{meeting.meeting_id}-{uuid.uuid4().hex[:8]}"
+        traces[account] = trace_id
+        account_entities = [{"entity": account, "entity_type": "company"}]
+        account_entities += [
+            {"entity": attendee["name"], "entity_type": "person"} for attendee in meeting.attendees
+            if attendee.get("name") and normalize_account(account_from_email(attendee.get("email", ""), INTERNAL_EMAIL_DOMAINS) or "") == normalize_account(account)
+        ]
+        with state_lock:
+            trace_accounts[trace_id] = (meeting.meeting_id, account, time.time() + retention_for(meeting))
+        for entity in account_entities:
+            publish_event(ENTITY_CHANNEL, entity, trace_id)
+        entities += account_entities
+
+    key = meeting_key(meeting.meeting_id)
+    redis_client.hset(key, mapping={
+        "meeting": json.dumps(meeting.to_dict()), "entities": json.dumps(entities),
+        "traces": json.dumps(traces), "triggered_at": time.time(),
+    })
+    redis_client.expire(key, retention_for(meeting))
+    with state_lock:
+        stats["meetings_triggered"] += 1
+        stats["traces_started"] += len(traces)
+    print(f"[{AGENT_ID}] Precomputing meeting '{meeting.title}' ({meeting.meeting_id}) for {meeting.accounts}.")
+
+def due_meetings(now):
+    """Untriggered meetings inside the lead window, soonest first; meetings already started are skipped."""
+    lead = PRECOMPUTE_LEAD_MINUTES * 60
+    due = []
+    with state_lock:
+        for trace_id in [trace_id for trace_id, target in trace_accounts.items() if target[2] < now]:
+            del trace_accounts[trace_id]
+        for meeting in meetings.values():
+            if meeting.meeting_id in triggered:
+                continue
+            if meeting.start < now:
+                triggered[meeting.meeting_id] = None
+                stats["missed"] += 1
+            elif meeting.start - lead <= now:
+                due.append(meeting)
+    return sorted(due, key=lambda meeting: meeting.start)[:SCHEDULER_MAX_TRIGGERS_PER_TICK]
+
+def schedule_loop():
+    while True:
+        for meeting in due_meetings(time.time()):
+            with state_lock:
+                triggered[meeting.meeting_id] = time.time()
+            try:
+                precompute(meeting)
+            except Exception as e:
+                print(f"[{AGENT_ID}] ERROR: Could not precompute meeting {meeting.meeting_id}: {e}")
+        time.sleep(SCHEDULER_TICK_SECONDS)
+
+def process_event(message):
+    """Stores a result published for one of the scheduler's traces."""
+    try:
+        data = decode(message["data"])
+        with state_lock:
+            target = trace_accounts.get(data.get("trace_id"))
+        if not target:
+            return
+        meeting_id, account, expires_at = target
+        key = account_key(meeting_id, account)
+        result = {"payload": resolve(redis_client, data.get("payload")), "agent_id": data.get("agent_id"), "timestamp": data.get("timestamp")}
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(key, data.get("channel", message["channel"]), json.dumps(result))
+        pipe.expire(key, max(int(expires_at - time.time()), 1))
+        pipe.execute()
+        with state_lock:
+            stats["results_stored"] += 1
+    except Exception as e:
+        print(f"[{AGENT_ID}] ERROR: Could not store result: {e}")
+
+def listen_for_events():
+    if not redis_client: return
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(*RESULT_CHANNELS)
+    print(f"[{AGENT_ID}] Collecting results from {len(RESULT_CHANNELS)} channels.")
+    for message in pubsub.listen():
+        process_event(message)
+
+@app.on_event("startup")
+async def startup_event():
+    global redis_client
+    try:
+        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+        redis_client.ping()
+        print(f"[{AGENT_ID}] Successfully connected to Redis.")
+        publisher.start(redis_client)
+        if CALENDAR_PATH:
+            with open(CALENDAR_PATH, encoding="utf-8") as f:
+                count = add_meetings(parse_calendar(f.read(), INTERNAL_EMAIL_DOMAINS))
+            print(f"[{AGENT_ID}] Loaded {count} meetings from {CALENDAR_PATH}.")
+        Thread(target=listen_for_events, daemon=True).start()
+        Thread(target=schedule_loop, daemon=True).start()
+    except redis.exceptions.ConnectionError as e:
+        print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
+        redis_client = None
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
+@app.post("/calendar")
+async def import_calendar(request: Request):
+    """Imports a calendar export (ICS or JSON body); meetings with known ids are replaced."""
+    try:
+        count = add_meetings(parse_calendar((await request.body()).decode("utf-8"), INTERNAL_EMAIL_DOMAINS))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse calendar: {e}")
+    return {"status": "imported", "meetings": count}
+
+@app.get("/meetings")
+def list_meetings():
+    with state_lock:
+        return [{**meeting.to_dict(), "precomputed_at": triggered.get(meeting.meeting_id)}
+                for meeting in sorted(meetings.values(), key=lambda meeting: meeting.start)]
+
+@app.get("/meetings/{meeting_id}")
+def get_meeting(meeting_id: str):
+    precomputed = read_precomputed(redis_client, meeting_id) if redis_client else None
+    if precomputed is None:
+        raise HTTPException(status_code=404, detail="Meeting not precomputed yet")
+    return precomputed
+
+@app.post("/meetings/{meeting_id}/precompute")
+def precompute_now(meeting_id: str):
+    """Precomputes a meeting immediately, e.g. one added at short notice."""
+    with state_lock:
+        meeting = meetings.get(meeting_id)
+    if not meeting:
+        raise HTTPException(status_code=404, detail="Unknown meeting")
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not connected")
+    with state_lock:
+        triggered[meeting_id] = time.time()
+    precompute(meeting)
+    return {"status": "triggered", "meeting_id": meeting_id}
+
+@app.get("/")
+def read_root():
+    with state_lock:
+        return {"status": "online", "agent_id": AGENT_ID, "meetings": len(meetings), **stats}
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,156 @@
+"""
+Calendar parsing for the Scheduler Agent.
+
+Accepts an ICS export (VEVENTs) or JSON (a list of meetings, or an object
+with a "meetings" list). Each meeting's accounts are the explicit ones
+(JSON "accounts", ICS X-ACCOUNT / CATEGORIES) plus the companies behind
+external attendees' email domains; internal domains are ignored.
+"""
+
+import calendar
+import json
+import re
+import time
+from datetime import datetime
+
+_ICS_TIME = re.compile(r"^(\d{8})(?:T(\d{6})(Z)?)?$")
+_ESCAPES = {"\\n": "\n", "\\N": "\n", "\\,": ",", "\\;": ";", "\\\\": "\\"}
+_ESCAPE = re.compile(r"\\[nN,;\\]")
+_GENERIC_EMAIL_DOMAINS = {"gmail.com", "outlook.com", "hotmail.com", "yahoo.com", "icloud.com"}
+# Public suffixes with two labels; any other domain's suffix is its last label.
+_SECOND_LEVEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "ltd.uk", "plc.uk", "co.in", "net.in", "org.in", "firm.in",
+    "co.jp", "ne.jp", "or.jp", "co.kr", "com.au", "net.au", "org.au", "co.nz", "org.nz", "com.br",
+    "com.cn", "com.hk", "com.sg", "com.my", "com.mx", "com.ar", "com.tr", "co.za", "co.il", "com.tw",
+}
+_LEGAL_SUFFIXES = {"inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "llc",
+                   "plc", "gmbh", "ag", "sa", "bv", "nv", "pvt", "private"}
+_NAME_WORD = re.compile(r"[a-z0-9]+")
+
+
+class Meeting:
+    __slots__ = ("meeting_id", "title", "start", "accounts", "attendees")
+
+    def __init__(self, meeting_id, title, start, accounts, attendees):
+        self.meeting_id = meeting_id
+        self.title = title
+        self.start = start
+        self.accounts = accounts
+        self.attendees = attendees
+
+    def to_dict(self) -> dict:
+        return {"meeting_id": self.meeting_id, "title": self.title, "start": self.start,
+                "accounts": self.accounts, "attendees": self.attendees}
+
+
+def account_from_email(email: str, internal_domains=()):
+    """The company behind an attendee's email domain, or None for internal / personal addresses."""
+    domain = email.rpartition("@")[2].lower().strip()
+    if not domain or domain in internal_domains or domain in _GENERIC_EMAIL_DOMAINS:
+        return None
+    labels = domain.split(".")
+    # acme.com -> Acme, us.ibm.com -> Ibm, eu.acme.co.uk -> Acme
+    suffix_labels = 2 if ".".join(labels[-2:]) in _SECOND_LEVEL_SUFFIXES else 1
+    if len(labels) <= suffix_labels:
+        return None
+    return labels[-suffix_labels - 1].capitalize()
+
+
+def normalize_account(name: str) -> str:
+    """A company name without case, punctuation or legal suffix: "Acme Corp." and "acme" are one account."""
+    words = _NAME_WORD.findall(name.lower())
+    while len(words) > 1 and words[-1] in _LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _accounts(explicit, attendees, internal_domains):
+    """Explicit accounts first, then attendee domains, one per normalized name."""
+    accounts, seen = [], set()
+    for account in list(explicit) + [account_from_email(a.get("email", ""), internal_domains) for a in attendees]:
+        key = normalize_account(account or "")
+        if key and key not in seen:
+            seen.add(key)
+            accounts.append(account)
+    return accounts
+
+
+def _unfold(text):
+    """Joins ICS continuation lines (RFC 5545 line folding)."""
+    return re.sub(r"\r?\n[ \t]", "", text).splitlines()
+
+
+def _unescape(value):
+    return _ESCAPE.sub(lambda match: _ESCAPES[match.group(0)], value)
+
+
+def _parse_ics_time(value):
+    match = _ICS_TIME.match(value.strip())
+    if not match:
+        raise ValueError(f"Unsupported DTSTART '{value}'.")
+    day, clock, utc = match.groups()
+    parsed = time.strptime(day + (clock or "000000"), "%Y%m%d%H%M%S")
+    if utc:
+        return float(calendar.timegm(parsed))
+    # Floating and TZID times are taken as the scheduler's local time.
+    return time.mktime(parsed)
+
+
+def parse_ics(text: str, internal_domains=()) -> list:
+    meetings, event = [], None
+    for line in _unfold(text):
+        if line == "BEGIN:VEVENT":
+            event = {"attendees": [], "accounts": []}
+            continue
+        if line == "END:VEVENT" and event is not None:
+            if event.get("uid") and event.get("start") is not None:
+                meetings.append(Meeting(event["uid"], event.get("title", ""), event["start"],
+                                        _accounts(event["accounts"], event["attendees"], internal_domains),
+                                        event["attendees"]))
+            event = None
+            continue
+        if event is None or ":" not in line:
+            continue
+        head, value = line.split(":", 1)
+        name, *raw_params = head.split(";")
+        params = dict(param.split("=", 1) for param in raw_params if "=" in param)
+        name = name.upper()
+        if name == "UID":
+            event["uid"] = value.strip()
+        elif name == "SUMMARY":
+            event["title"] = _unescape(value)
+        elif name == "DTSTART":
+            event["start"] = _parse_ics_time(value)
+        elif name == "ATTENDEE":
+            email = value[7:] if value.lower().startswith("mailto:") else value
+            event["attendees"].append({"name": params.get("CN", "").strip('"'), "email": email.strip()})
+        elif name in ("X-ACCOUNT", "CATEGORIES"):
+            event["accounts"].extend(_unescape(part).strip() for part in value.split(",") if part.strip())
+    return meetings
+
+
+def _parse_json_time(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def parse_json(data, internal_domains=()) -> list:
+    items = data.get("meetings", []) if isinstance(data, dict) else data
+    meetings = []
+    for item in items:
+        meeting_id = item.get("id") or item.get("uid")
+        if not meeting_id or "start" not in item:
+            raise ValueError("Each meeting needs an 'id' and a 'start'.")
+        attendees = [attendee if isinstance(attendee, dict) else {"name": "", "email": attendee}
+                     for attendee in item.get("attendees", [])]
+        meetings.append(Meeting(str(meeting_id), item.get("title", ""), _parse_json_time(item["start"]),
+                                _accounts(item.get("accounts", []), attendees, internal_domains), attendees))
+    return meetings
+
+
+def parse_calendar(text: str, internal_domains=()) -> list:
+    """Parses an ICS or JSON calendar export into meetings."""
+    if text.lstrip().startswith("BEGIN:VCALENDAR"):
+        return parse_ics(text, internal_domains)
+    return parse_json(json.loads(text), internal_domains)
@@ -0,0 +1,170 @@
+"""
+Local sentiment classification for the Sentiment Agent.
+
+A softmax regression over hashed unigrams and bigrams, plus two lexicon
+features (positive and negative cue counts), answers in microseconds. Negators
+("not", "never", ...) flip the polarity of the next few words, so "not happy"
+becomes a NOT_happy feature and counts as a negative cue.
+
+The model is trained at startup on a small labelled seed corpus. Its
+probabilities are calibrated with temperature scaling on a held-out split, so
+`confidence` can be compared against a threshold to decide when a text is
+ambiguous enough to send to the LLM.
+"""
+
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+LABELS = ("POSITIVE", "NEGATIVE", "NEUTRAL")
+DEFAULT_SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentiment_seed.json")
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|[.!?,;:]")
+_CLAUSE_END = frozenset(".!?,;:")
+_NEGATORS = frozenset("not no never without cannot can't don't doesn't didn't isn't wasn't "
+                      "aren't won't hardly nor".split())
+_NEGATION_SCOPE = 3
+
+POSITIVE_WORDS = frozenset("""
+    agree agreed appreciate approved awesome benefit champion commit commitment confident
+    delighted eager easy enthusiastic excellent excited fantastic glad good great happy
+    impressed impressive interest interested love loved perfect pleased positive praised
+    progress promising receptive recommend recommends renew satisfied strong success succeed
+    thrilled valuable value win won wonderful
+""".split())
+NEGATIVE_WORDS = frozenset("""
+    angry annoyed bad blocker bug bugs cancel cancelled cancelling churn churning complained
+    complaint concern concerns confused cut delay delays disappointed disappointment doubt
+    escalate expensive fail failed failure frustrated frustrating hold lacks lost missed
+    negative outage outages poor problem problems reject rejected risk serious skeptical slow
+    stalled terrible threatened unacceptable unhappy unlikely unresolved worse worst
+""".split())
+
+
+def tokenize(text: str) -> list:
+    """Lowercased word tokens, with words in a negator's scope prefixed 'NOT_'."""
+    tokens, scope = [], 0
+    for token in _TOKEN.findall(text.lower()):
+        if token in _CLAUSE_END:
+            scope = 0
+        elif token in _NEGATORS:
+            tokens.append(token)
+            scope = _NEGATION_SCOPE
+        elif scope:
+            tokens.append("NOT_" + token)
+            scope -= 1
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def lexicon_counts(tokens) -> tuple:
+    """(positive, negative) cue counts; a negated cue counts for the other side."""
+    positive = negative = 0
+    for token in tokens:
+        negated = token.startswith("NOT_")
+        word = token[4:] if negated else token
+        if word in POSITIVE_WORDS:
+            positive, negative = (positive, negative + 1) if negated else (positive + 1, negative)
+        elif word in NEGATIVE_WORDS:
+            positive, negative = (positive + 1, negative) if negated else (positive, negative + 1)
+    return positive, negative
+
+
+class SentimentClassifier:
+    """Softmax regression over hashed n-grams and lexicon counts."""
+
+    def __init__(self, n_features: int = 4096):
+        self.n_features = n_features
+        # Two extra columns for the lexicon counts, one for the bias.
+        self.weights = np.zeros((n_features + 3, len(LABELS)))
+        self.temperature = 1.0
+
+    def _features(self, text: str):
+        tokens = tokenize(text)
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        # crc32 rather than hash(): it is stable across processes.
+        index = [zlib.crc32(gram.encode()) % self.n_features for gram in grams]
+        value = [1.0] * len(index)
+        positive, negative = lexicon_counts(tokens)
+        index += [self.n_features, self.n_features + 1, self.n_features + 2]
+        value += [float(positive), float(negative), 1.0]
+        return np.array(index, dtype=np.int64), np.array(value)
+
+    def _design(self, texts):
+        matrix = np.zeros((len(texts), self.n_features + 3))
+        for row, text in enumerate(texts):
+            index, value = self._features(text)
+            np.add.at(matrix[row], index, value)
+        return matrix
+
+    def _train(self, matrix, targets, epochs, learning_rate, l2):
+        weights = np.zeros((matrix.shape[1], len(LABELS)))
+        one_hot = np.eye(len(LABELS))[targets]
+        for _ in range(epochs):
+            probs = _softmax(matrix @ weights)
+            gradient = matrix.T @ (probs - one_hot) / len(targets) + l2 * weights
+            weights -= learning_rate * gradient
+        return weights
+
+    def fit(self, texts, labels, epochs: int = 300, learning_rate: float = 0.5,
+            l2: float = 1e-3, holdout: float = 0.25, seed: int = 0):
+        """
+        Trains on `texts`. The temperature is fitted on a held-out split first,
+        then the weights are refit on everything.
+        """
+        matrix = self._design(texts)
+        targets = np.array([LABELS.index(label) for label in labels])
+        order = np.random.default_rng(seed).permutation(len(texts))
+        cut = int(len(texts) * holdout)
+        held, train = order[:cut], order[cut:]
+        if cut:
+            weights = self._train(matrix[train], targets[train], epochs, learning_rate, l2)
+            self.temperature = _fit_temperature(matrix[held] @ weights, targets[held])
+        self.weights = self._train(matrix, targets, epochs, learning_rate, l2)
+        return self
+
+    def predict(self, text: str):
+        """Returns (label, confidence, {label: probability})."""
+        index, value = self._features(text)
+        logits = value @ self.weights[index]
+        probs = _softmax(logits / self.temperature)
+        best = int(np.argmax(probs))
+        return LABELS[best], float(probs[best]), dict(zip(LABELS, probs.round(4).tolist()))
+
+
+def _softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+def _fit_temperature(logits, targets):
+    """The temperature minimizing held-out negative log-likelihood (grid search)."""
+    best, best_nll = 1.0, np.inf
+    for temperature in np.geomspace(0.25, 8.0, 41):
+        probs = _softmax(logits / temperature)
+        nll = -np.log(probs[np.arange(len(targets)), targets] + 1e-12).mean()
+        if nll < best_nll:
+            best, best_nll = float(temperature), nll
+    return best
+
+
+def load_seed(path: str = DEFAULT_SEED_PATH):
+    """Reads the seed corpus ({label: [texts]}) as parallel (texts, labels) lists."""
+    with open(path, encoding="utf-8") as f:
+        corpus = json.load(f)
+    texts, labels = [], []
+    for label, examples in corpus.items():
+        if label not in LABELS:
+            raise ValueError(f"Unknown sentiment label in seed corpus: {label}")
+        texts.extend(examples)
+        labels.extend([label] * len(examples))
+    return texts, labels
+
+
+def train_default(path: str = DEFAULT_SEED_PATH) -> SentimentClassifier:
+    texts, labels = load_seed(path)
+    return SentimentClassifier().fit(texts, labels)
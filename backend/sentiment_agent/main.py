@@ -1,19 +1,44 @@
 import os
+import sys
 import redis
 import threading
-import json
+import time
+import uuid
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from openai import OpenAI
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, routed_models
+from classifier import DEFAULT_SEED_PATH, LABELS, train_default
+from trajectory import SentimentTrajectory
 
 # Load environment variables from .env file
 load_dotenv()
 
 # --- Configuration ---
+AGENT_ID = "sentiment_agent_v1"
+STAGE = load_pipeline().stage("sentiment")
+SUMMARY_CHANNEL, TRANSCRIPT_CHANNEL = STAGE.inputs
+SENTIMENT_CHANNEL, TRAJECTORY_CHANNEL = STAGE.outputs
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
+# The model for each LLM escalation is picked from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+SENTIMENT_SEED_PATH = os.getenv("SENTIMENT_SEED_PATH", DEFAULT_SEED_PATH)
+# Local predictions below this confidence are escalated to the LLM.
+SENTIMENT_CONFIDENCE_THRESHOLD = float(os.getenv("SENTIMENT_CONFIDENCE_THRESHOLD", 0.8))
+# Streaming mode: per-utterance scoring of live transcripts.
+SENTIMENT_EWMA_ALPHA = float(os.getenv("SENTIMENT_EWMA_ALPHA", 0.3))
+SENTIMENT_MIN_DELTA = float(os.getenv("SENTIMENT_MIN_DELTA", 0.1))
+SENTIMENT_TURN_HYSTERESIS = float(os.getenv("SENTIMENT_TURN_HYSTERESIS", 0.2))
+STREAM_TRACE_TTL_SECONDS = float(os.getenv("STREAM_TRACE_TTL_SECONDS", 900))
 
 # --- FastAPI App ---
 app = FastAPI()
@@ -37,29 +62,122 @@ else:
     )
     print("✅ OpenAI client for OpenRouter configured.")
 
-def perform_sentiment_analysis(summary_text: str) -> str:
-    """Calls the LLM to get the sentiment of the text."""
+# --- Local Classifier ---
+classifier = train_default(SENTIMENT_SEED_PATH)
+print(f"✅ Local sentiment classifier trained (temperature={classifier.temperature:.2f}).")
+cascade_stats = {"local": 0, "llm": 0, "llm_failed_local": 0, "low_confidence_no_llm": 0}
+trajectory = SentimentTrajectory(
+    alpha=SENTIMENT_EWMA_ALPHA, min_delta=SENTIMENT_MIN_DELTA,
+    hysteresis=SENTIMENT_TURN_HYSTERESIS, ttl_seconds=STREAM_TRACE_TTL_SECONDS,
+)
+
+def perform_sentiment_analysis(summary_text: str):
+    """Calls the LLM to get the sentiment of the text. Returns None on failure or an unknown label."""
     if not llm_client:
         print("❌ LLM client not configured. Cannot perform analysis.")
-        return "NEUTRAL"
+        return None
         
     print(f"🧠 Performing sentiment analysis on summary...")
     try:
-        response = llm_client.chat.completions.create(
-            model="nousresearch/nous-hermes-2-mixtral-8x7b-dpo",
-            messages=[
-                {"role": "system", "content": "You are a sentiment analysis expert. Analyze the given text and respond with only one word: POSITIVE, NEGATIVE, or NEUTRAL."},
-                {"role": "user", "content": summary_text}
-            ],
-            temperature=0.1,
-            max_tokens=5
-        )
-        sentiment = response.choices[0].message.content.strip().upper()
-        print(f"👍 Sentiment analysis successful. Result: {sentiment}")
-        return sentiment
+        with router.route(summary_text) as model:
+            response = llm_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": "You are a sentiment analysis expert. Analyze the given text and respond with only one word: POSITIVE, NEGATIVE, or NEUTRAL."},
+                    {"role": "user", "content": summary_text}
+                ],
+                temperature=0.1,
+                max_tokens=5
+            )
+        sentiment = response.choices[0].message.content.strip().strip(".").upper()
     except Exception as e:
         print(f"❌ Error during sentiment analysis API call: {e}")
-        return "NEUTRAL" # Fallback sentiment
+        return None
+    if sentiment not in LABELS:
+        print(f"❌ LLM answered '{sentiment}', not a sentiment label.")
+        return None
+    print(f"👍 Sentiment analysis successful. Result: {sentiment}")
+    return sentiment
+
+def classify_sentiment(text: str) -> dict:
+    """
+    Answers locally when the classifier is confident, otherwise escalates to
+    the LLM. Returns the sentiment plus where it came from. Confidence and
+    probabilities are the local classifier's, so an LLM answer has neither.
+    """
+    sentiment, confidence, probabilities = classifier.predict(text)
+    if confidence >= SENTIMENT_CONFIDENCE_THRESHOLD:
+        source = "local"
+    elif llm_client:
+        llm_sentiment = perform_sentiment_analysis(text)
+        source = "llm" if llm_sentiment else "llm_failed_local"
+    else:
+        source = "low_confidence_no_llm"
+    cascade_stats[source] += 1
+    if source == "llm":
+        return {"sentiment": llm_sentiment, "confidence": None, "probabilities": None, "sentiment_source": source}
+    return {
+        "sentiment": sentiment,
+        "confidence": round(confidence, 4),
+        "probabilities": probabilities,
+        "sentiment_source": source,
+    }
+
+def track_utterance(envelope: dict):
+    """
+    Scores one streamed utterance locally (never the LLM) and publishes a
+    trajectory delta when the trace's aggregate mood changed meaningfully.
+    """
+    payload = resolve(redis_client, envelope.get("payload")) or {}
+    trace_id = envelope.get("trace_id")
+    if not payload.get("stream") or not trace_id:
+        return
+    final = bool(payload.get("final"))
+    text = payload.get("text") or ""
+    if not text.strip():
+        # An empty final only closes the call; scoring it would pull the mood toward neutral
+        delta = trajectory.finish(trace_id) if final else None
+    else:
+        _, _, probabilities = classifier.predict(text)
+        delta = trajectory.feed(trace_id, probabilities["POSITIVE"] - probabilities["NEGATIVE"], final=final)
+    if delta:
+        publish_event(TRAJECTORY_CHANNEL, delta, trace_id)
+
+def publish_event(channel, data, trace_id=None):
+    """Publishes a result wrapped in the standard event envelope."""
+    if not redis_client: return
+    event_envelope = {
+        "event_id": str(uuid.uuid4()), "timestamp": time.time(),
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
+    }
+    publisher.publish(channel, encode(event_envelope))
+
+def process_event(message):
+    """Runs sentiment analysis on a 'summary.created' event."""
+    if message["type"] == "message":
+        data = decode(message["data"])
+        if message["channel"] == TRANSCRIPT_CHANNEL:
+            track_utterance(data)
+            return
+        summary = resolve(redis_client, data.get("payload", {})).get("summary")
+        
+        if summary:
+            print("📩 Received summary. Starting sentiment analysis.")
+            result = classify_sentiment(summary)
+            print(f"👍 Sentiment: {result['sentiment']} ({result['sentiment_source']}, confidence {result['confidence']})")
+
+            # Publish the result
+            result["source_summary"] = summary
+            publish_event(SENTIMENT_CHANNEL, result, data.get("trace_id"))
+            print(f"📣 Published '{SENTIMENT_CHANNEL}' event.")
+        else:
+            print(f"⚠️ Received message on '{SUMMARY_CHANNEL}' but no summary text found.")
+
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
 
 def sentiment_analysis_task():
     """A background task that listens for summaries and performs sentiment analysis."""
@@ -68,24 +186,13 @@ def sentiment_analysis_task():
         return
 
     pubsub = redis_client.pubsub()
-    pubsub.subscribe("summary.created")
-    print("👂 Listening for 'summary.created' event...")
+    pubsub.subscribe(*STAGE.subscriptions)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
+    print(f"👂 Listening for '{SUMMARY_CHANNEL}' and '{TRANSCRIPT_CHANNEL}' events...")
 
     for message in pubsub.listen():
-        if message["type"] == "message":
-            data = json.loads(message["data"])
-            summary = data.get("summary")
-            
-            if summary:
-                print("📩 Received summary. Starting sentiment analysis.")
-                sentiment = perform_sentiment_analysis(summary)
-                
-                # Publish the result
-                result = {"sentiment": sentiment, "source_summary": summary}
-                redis_client.publish("sentiment.completed", json.dumps(result))
-                print("📣 Published 'sentiment.completed' event.")
-            else:
-                print("⚠️ Received message on 'summary.created' but no summary text found.")
+        lanes.submit(message)
 
 
 @app.on_event("startup")
@@ -93,4 +200,30 @@ async def startup_event():
     """Start the background thread when the app starts."""
     print("🚀 Sentiment Agent starting up...")
     thread = threading.Thread(target=sentiment_analysis_task, daemon=True)
-    thread.start()
\ No newline at end of file
+    thread.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
+@app.get("/sentiment/stats")
+def sentiment_stats():
+    total = sum(cascade_stats.values())
+    return {
+        **cascade_stats,
+        "threshold": SENTIMENT_CONFIDENCE_THRESHOLD,
+        "llm_calls_avoided": round(1 - (cascade_stats["llm"] + cascade_stats["llm_failed_local"]) / total, 4) if total else None,
+        "stream": trajectory.stats(),
+    }
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
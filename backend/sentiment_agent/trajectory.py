@@ -0,0 +1,141 @@
+"""
+Streaming sentiment trajectories for the Sentiment Agent.
+
+Each utterance of a live call gets a score in [-1, 1] (P(positive) -
+P(negative) from the local classifier). Per trace we keep a fixed handful of
+numbers: an EWMA of the scores, an EWMA of its slope (the trend), and the
+running extreme used to spot turning points. A turning point is a reversal of
+the EWMA by more than `hysteresis` from its last peak or trough, so noise
+around a flat mood doesn't register as a swing.
+
+`feed` returns a compact delta only when the aggregate moved by at least
+`min_delta` since the last one, a turning point occurred, or the call ended;
+otherwise it returns None. `finish` ends a call without a last score. Idle
+traces are evicted after a TTL.
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from shared.expiry import evict_idle
+
+RISING, FALLING, FLAT = "rising", "falling", "flat"
+
+
+class _TraceState:
+    __slots__ = ("seq", "ewma", "trend", "direction", "extreme", "turns",
+                 "published", "last_seen")
+
+    def __init__(self, now):
+        self.seq = 0
+        self.ewma = 0.0
+        self.trend = 0.0
+        self.direction = 0
+        self.extreme = 0.0
+        self.turns = 0
+        self.published = None
+        self.last_seen = now
+
+
+class SentimentTrajectory:
+    """Per-trace EWMA, trend and turning points with TTL eviction."""
+
+    def __init__(self, alpha: float = 0.3, trend_alpha: float = 0.5, min_delta: float = 0.1,
+                 hysteresis: float = 0.2, ttl_seconds: float = 900.0, max_traces: int = 10000):
+        self.alpha = alpha
+        self.trend_alpha = trend_alpha
+        self.min_delta = min_delta
+        self.hysteresis = hysteresis
+        self.ttl_seconds = ttl_seconds
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = Lock()
+        self.utterances = 0
+        self.deltas = 0
+
+    def feed(self, trace_id: str, score: float, final: bool = False):
+        """Folds one utterance score into the trace; returns a delta dict or None."""
+        now = time.time()
+        with self._lock:
+            evict_idle(self._traces, now, self.ttl_seconds, self.max_traces)
+            state = self._traces.pop(trace_id, None) or _TraceState(now)
+            state.last_seen = now
+            state.seq += 1
+            self.utterances += 1
+
+            if state.seq == 1:
+                state.ewma = state.extreme = score
+            else:
+                previous = state.ewma
+                state.ewma += self.alpha * (score - state.ewma)
+                state.trend += self.trend_alpha * (state.ewma - previous - state.trend)
+            turning_point = self._track_extreme(state)
+
+            delta = None
+            if (state.published is None or final or turning_point
+                    or abs(state.ewma - state.published) >= self.min_delta):
+                delta = self._delta(state, score, turning_point, final)
+                state.published = state.ewma
+                self.deltas += 1
+
+            if not final:
+                self._traces[trace_id] = state
+            return delta
+
+    def finish(self, trace_id: str):
+        """Ends the trace without folding in a score; returns its final delta, or None if unknown."""
+        with self._lock:
+            state = self._traces.pop(trace_id, None)
+            if state is None:
+                return None
+            self.deltas += 1
+            return self._delta(state, None, None, True)
+
+    def _track_extreme(self, state):
+        """Zigzag over the EWMA; returns the turning point it just confirmed, if any."""
+        ewma, h = state.ewma, self.hysteresis
+        if state.direction == 0:
+            # No direction yet: the first score is the anchor.
+            if abs(ewma - state.extreme) >= h:
+                state.direction = 1 if ewma > state.extreme else -1
+                state.extreme = ewma
+            return None
+        if state.direction > 0 and ewma > state.extreme:
+            state.extreme = ewma
+        elif state.direction < 0 and ewma < state.extreme:
+            state.extreme = ewma
+        if (state.direction > 0 and ewma <= state.extreme - h) or \
+                (state.direction < 0 and ewma >= state.extreme + h):
+            turn = {"to": FALLING if state.direction > 0 else RISING, "from_score": round(state.extreme, 3)}
+            state.direction = -state.direction
+            state.extreme = ewma
+            state.turns += 1
+            return turn
+        return None
+
+    def _delta(self, state, score, turning_point, final):
+        if state.trend > self.min_delta / 4:
+            trend = RISING
+        elif state.trend < -self.min_delta / 4:
+            trend = FALLING
+        else:
+            trend = FLAT
+        delta = {"seq": state.seq, "score": round(state.ewma, 3)}
+        if score is not None:
+            delta["utterance_score"] = round(score, 3)
+        delta.update(trend=trend, slope=round(state.trend, 3), turns=state.turns)
+        if turning_point:
+            delta["turning_point"] = turning_point
+        if final:
+            delta["final"] = True
+        return delta
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active_traces": len(self._traces),
+                "utterances": self.utterances,
+                "deltas_published": self.deltas,
+                "deltas_suppressed": self.utterances - self.deltas,
+            }
@@ -0,0 +1,6 @@
+"""
+Helpers shared by the backend agents.
+
+Each agent runs from its own directory, so agents add `backend/` to sys.path
+before importing from here.
+"""
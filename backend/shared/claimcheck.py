@@ -0,0 +1,72 @@
+"""
+Claim-check storage for large event payloads.
+
+Every pattern subscriber (logger, compliance, the UI's SSE clients and trace
+state, the orchestrator) receives, and parses, every event on the bus. A
+payload whose JSON exceeds CLAIM_CHECK_BYTES is therefore stored once in
+Redis under its content hash, for CLAIM_CHECK_TTL_SECONDS, and the envelope
+carries a claim instead:
+
+    {"source_event_id": "...", "claim_check": {"key": "claim:<sha256>", "bytes": 18234}}
+
+Short scalar fields of the payload (ids, flags, names) stay inline next to the
+claim, so consumers that only route or join on them never fetch the body.
+Consumers that need it call `resolve`, which returns any other value as is.
+Identical payloads share one key.
+
+Measuring a payload means serializing it, so a small payload is returned
+already serialized (`shared.envelope.Serialized`) and the envelope's `encode`
+writes that JSON instead of serializing the payload a second time.
+"""
+
+import hashlib
+import json
+import os
+
+from shared.envelope import serialize
+
+CLAIM_CHECK_BYTES = int(os.getenv("CLAIM_CHECK_BYTES", 4096))
+CLAIM_CHECK_TTL_SECONDS = int(os.getenv("CLAIM_CHECK_TTL_SECONDS", 3600))
+KEY_PREFIX = "claim:"
+CLAIM_FIELD = "claim_check"
+MAX_INLINE_CHARS = 128
+
+
+class ClaimExpired(LookupError):
+    """The claimed payload is no longer in Redis."""
+
+
+def is_claim(value) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(CLAIM_FIELD), dict)
+
+
+def check_in(redis_client, payload, threshold: int = None, ttl_seconds: int = None):
+    """The payload, serialized, if small; otherwise a claim for it, after storing the body."""
+    threshold = CLAIM_CHECK_BYTES if threshold is None else threshold
+    if redis_client is None or threshold <= 0 or not isinstance(payload, (dict, list)):
+        return payload
+    serialized = serialize(payload)
+    body = serialized.json.encode("utf-8")
+    if len(body) <= threshold:
+        return serialized
+    key = KEY_PREFIX + hashlib.sha256(body).hexdigest()
+    # Re-storing an existing key only refreshes its TTL.
+    redis_client.set(key, body, ex=ttl_seconds or CLAIM_CHECK_TTL_SECONDS)
+    claim = {}
+    if isinstance(payload, dict):
+        claim = {field: value for field, value in payload.items()
+                 if value is None or isinstance(value, (bool, int, float))
+                 or (isinstance(value, str) and len(value) <= MAX_INLINE_CHARS)}
+    claim[CLAIM_FIELD] = {"key": key, "bytes": len(body)}
+    return claim
+
+
+def resolve(redis_client, value):
+    """The full payload behind a claim; any other value is returned unchanged."""
+    if not is_claim(value):
+        return value
+    key = value[CLAIM_FIELD]["key"]
+    body = redis_client.get(key) if redis_client else None
+    if body is None:
+        raise ClaimExpired(f"Payload {key} has expired.")
+    return json.loads(body)
@@ -0,0 +1,109 @@
+"""
+Optional zstd compression of envelope payloads.
+
+Events repeat the same keys, agent ids, channel names and boilerplate text,
+which a zstd dictionary trained on logged events captures: small payloads
+that plain zstd can barely shrink compress well with one. Payloads of at
+least ENVELOPE_COMPRESS_MIN_BYTES are compressed with the dictionary when
+ENVELOPE_COMPRESSION=true; the envelope header then carries
+"payload_encoding": "zstd" and the payload is the base64 of the zstd frame
+(Redis clients here read text). Messages without the flag are read as
+before, so agents with and without compression interoperate. Every agent
+must have zstandard installed before any agent turns compression on.
+
+ENVELOPE_ZSTD_DICTIONARY lists dictionary files, comma-separated; the first
+compresses, and all of them decompress, so a retrained dictionary can be
+rolled out by listing it first and dropping the old one once no publisher
+uses it. A zstd frame records the id of its dictionary. Without a dictionary
+file, payloads are compressed with plain zstd.
+
+Dictionaries are trained offline from the logger's event sample (see
+EVENT_LOG_PATH in the Logger Agent) with train_compression_dictionary.py.
+"""
+
+import base64
+import os
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ENCODING = "zstd"
+ENVELOPE_COMPRESSION = os.getenv("ENVELOPE_COMPRESSION", "false").lower() == "true"
+COMPRESS_MIN_BYTES = int(os.getenv("ENVELOPE_COMPRESS_MIN_BYTES", 128))
+COMPRESSION_LEVEL = int(os.getenv("ENVELOPE_COMPRESSION_LEVEL", 3))
+DICTIONARY_PATHS = [path for path in os.getenv(
+    "ENVELOPE_ZSTD_DICTIONARY",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "envelope.zstd-dict")
+).split(",") if path]
+
+
+def load_dictionaries(paths) -> list:
+    """The dictionaries in the files that exist, in order."""
+    dictionaries = []
+    for path in paths:
+        if zstandard is not None and os.path.exists(path):
+            with open(path, "rb") as f:
+                dictionaries.append(zstandard.ZstdCompressionDict(f.read()))
+    return dictionaries
+
+
+def train_dictionary(samples, size: int = 16384) -> bytes:
+    """A dictionary trained on sample payloads (JSON text). Raises ValueError on too few samples."""
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed.")
+    try:
+        return zstandard.train_dictionary(size, [sample.encode("utf-8") for sample in samples]).as_bytes()
+    except zstandard.ZstdError as e:
+        raise ValueError(f"Could not train a dictionary: {e}") from e
+
+
+class PayloadCodec:
+    """Compresses payload JSON with the first dictionary; decompresses with any of them."""
+
+    def __init__(self, dictionaries=(), level: int = COMPRESSION_LEVEL, min_bytes: int = COMPRESS_MIN_BYTES,
+                 enabled: bool = ENVELOPE_COMPRESSION):
+        self.dictionaries = {d.dict_id(): d for d in dictionaries}
+        self._default = dictionaries[0] if dictionaries else None
+        self.level = level
+        self.min_bytes = min_bytes
+        self.enabled = enabled and zstandard is not None
+        # zstd contexts are not thread-safe; publishers run on several threads.
+        self._local = threading.local()
+
+    def _compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._default, write_content_size=True)
+        return compressor
+
+    def _decompressor(self, dict_id):
+        decompressors = self._local.__dict__.setdefault("decompressors", {})
+        if dict_id not in decompressors:
+            if dict_id and dict_id not in self.dictionaries:
+                raise ValueError(f"Payload was compressed with unknown dictionary {dict_id}.")
+            decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=self.dictionaries.get(dict_id))
+        return decompressors[dict_id]
+
+    def compress(self, text: str):
+        """The encoded payload, or None if it should go out as is."""
+        if not self.enabled or len(text) < self.min_bytes:
+            return None
+        encoded = base64.b64encode(self._compressor().compress(text.encode("utf-8"))).decode("ascii")
+        return encoded if len(encoded) < len(text) else None
+
+    def decompress(self, encoded: str) -> str:
+        if zstandard is None:
+            raise ValueError("Payload is zstd-compressed but zstandard is not installed.")
+        frame = base64.b64decode(encoded)
+        dict_id = zstandard.get_frame_parameters(frame).dict_id
+        try:
+            return self._decompressor(dict_id).decompress(frame).decode("utf-8")
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupt compressed payload: {e}") from e
+
+
+codec = PayloadCodec(load_dictionaries(DICTIONARY_PATHS))
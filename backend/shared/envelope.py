@@ -0,0 +1,206 @@
+"""
+The event envelope on the wire.
+
+Most consumers look at an event's agent_id, channel, trace_id or priority
+before they need its payload, and many never need the payload at all
+(pattern subscribers, or an agent skipping its own events). Version 1 of the
+wire format therefore keeps the two apart:
+
+    "\\x01" <header JSON> "\\n" <payload JSON>
+
+The header holds every envelope field but the payload. JSON escapes
+newlines, so the first newline ends it. `decode` parses the header only;
+the payload is decoded the first time it is read. Both parts are compact
+JSON written by orjson when it is installed, and by the json module
+otherwise, so the bytes on the wire are the same either way.
+
+With ENVELOPE_COMPRESSION=true, larger payloads are zstd-compressed and the
+header says so with "payload_encoding" (see shared/compression.py). Decoding
+only reads that field; the payload is decompressed on first access too.
+
+The leading version byte keeps old envelopes readable: a message starting
+with "{" is a version 0 envelope (one JSON object) and is decoded whole.
+ENVELOPE_VERSION=0 makes `encode` write version 0 too, e.g. while consumers
+outside this repo still expect plain JSON.
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from shared import compression
+
+ENVELOPE_VERSION = int(os.getenv("ENVELOPE_VERSION", 1))
+VERSION_PREFIX = "\x01"
+ENCODING_FIELD = "payload_encoding"
+_UNSET = object()
+
+if orjson is not None:
+    def _dumps(value) -> str:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    _loads = orjson.loads
+else:
+    def _dumps(value) -> str:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+    _loads = json.loads
+
+
+class Serialized:
+    """A payload already serialized to compact JSON; `encode` writes the text as is."""
+
+    __slots__ = ("value", "json")
+
+    def __init__(self, value, json_text: str):
+        self.value = value
+        self.json = json_text
+
+
+def serialize(value) -> Serialized:
+    return Serialized(value, _dumps(value))
+
+
+class Envelope:
+    """
+    A decoded event. Reads like the envelope dict it replaces (`get`, `[]`,
+    `in`), with the payload decoded on first access.
+    """
+
+    __slots__ = ("header", "_payload", "_raw_payload", "_encoding")
+
+    def __init__(self, header: dict, payload=_UNSET, raw_payload: str = None, encoding: str = None):
+        self.header = header
+        self._payload = payload
+        self._raw_payload = raw_payload
+        self._encoding = encoding
+
+    @property
+    def agent_id(self):
+        return self.header.get("agent_id")
+
+    @property
+    def channel(self):
+        return self.header.get("channel")
+
+    @property
+    def trace_id(self):
+        return self.header.get("trace_id")
+
+    @property
+    def priority(self):
+        return self.header.get("priority")
+
+    def has_payload(self) -> bool:
+        return self._raw_payload is not None or self._payload is not _UNSET
+
+    @property
+    def payload(self):
+        if self._payload is _UNSET:
+            self._payload = _loads(self._payload_json()) if self._raw_payload is not None else None
+        return self._payload
+
+    def _payload_json(self) -> str:
+        if self._raw_payload is None:
+            return _dumps(self._payload)
+        if self._encoding is None:
+            return self._raw_payload
+        if self._encoding != compression.ENCODING:
+            raise ValueError(f"Unknown payload encoding '{self._encoding}'.")
+        return compression.codec.decompress(self._raw_payload)
+
+    def get(self, key, default=None):
+        if key == "payload":
+            return self.payload if self.has_payload() else default
+        return self.header.get(key, default)
+
+    def __getitem__(self, key):
+        if key == "payload":
+            if not self.has_payload():
+                raise KeyError(key)
+            return self.payload
+        return self.header[key]
+
+    def __contains__(self, key):
+        return self.has_payload() if key == "payload" else key in self.header
+
+    def setdefault(self, key, default=None):
+        return self.header.setdefault(key, default)
+
+    def to_dict(self) -> dict:
+        if not self.has_payload():
+            return dict(self.header)
+        return {**self.header, "payload": self.payload}
+
+    def to_json(self) -> str:
+        """The envelope as one JSON object (version 0), without decoding the payload."""
+        header = _dumps(self.header)
+        if not self.has_payload():
+            return header
+        raw = self._payload_json()
+        return f'{header[:-1]}{"," if len(header) > 2 else ""}"payload":{raw}}}'
+
+    def encode(self, version: int = None) -> str:
+        version = ENVELOPE_VERSION if version is None else version
+        if version == 0:
+            return self.to_json()
+        if not self.has_payload():
+            return f"{VERSION_PREFIX}{_dumps(self.header)}"
+        if self._encoding is not None and self._raw_payload is not None:
+            # Still encoded as received; pass it on without decompressing.
+            return f"{VERSION_PREFIX}{_dumps({**self.header, ENCODING_FIELD: self._encoding})}\n{self._raw_payload}"
+        raw = self._payload_json()
+        compressed = compression.codec.compress(raw)
+        if compressed is None:
+            return f"{VERSION_PREFIX}{_dumps(self.header)}\n{raw}"
+        return f"{VERSION_PREFIX}{_dumps({**self.header, ENCODING_FIELD: compression.ENCODING})}\n{compressed}"
+
+
+def encode(envelope: dict, version: int = None) -> str:
+    """Serializes an envelope dict for publishing."""
+    header = {key: value for key, value in envelope.items() if key != "payload"}
+    if "payload" not in envelope:
+        return Envelope(header).encode(version)
+    payload = envelope["payload"]
+    if isinstance(payload, Serialized):
+        return Envelope(header, raw_payload=payload.json).encode(version)
+    return Envelope(header, payload).encode(version)
+
+
+def decode(raw) -> Envelope:
+    """Decodes an envelope of any version; the payload is left for later. Raises ValueError."""
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    if not isinstance(raw, str):
+        raise ValueError("Not an envelope.")
+    if raw.startswith(VERSION_PREFIX):
+        header, separator, payload = raw[1:].partition("\n")
+        header = _loads(header)
+        if not isinstance(header, dict):
+            raise ValueError("Envelope header is not an object.")
+        encoding = header.pop(ENCODING_FIELD, None)
+        return Envelope(header, raw_payload=payload if separator else None, encoding=encoding)
+    data = _loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("Not an envelope.")
+    if "payload" not in data:
+        return Envelope(data)
+    payload = data.pop("payload")
+    return Envelope(data, payload)
+
+
+def header_of(raw) -> str:
+    """A version 1 message's raw header JSON, or None for older messages."""
+    if isinstance(raw, bytes):
+        if not raw.startswith(VERSION_PREFIX.encode()):
+            return None
+        end = raw.find(b"\n")
+        return (raw[1:end] if end != -1 else raw[1:]).decode("utf-8", errors="replace")
+    if not isinstance(raw, str) or not raw.startswith(VERSION_PREFIX):
+        return None
+    end = raw.find("\n")
+    return raw[1:end] if end != -1 else raw[1:]
@@ -0,0 +1,17 @@
+"""
+Idle eviction for per-trace state held in memory.
+
+Agents keep per-trace state in an OrderedDict ordered by last use: an entry
+is popped and reinserted each time it is touched, so the oldest entry comes
+first. `evict_idle` drops entries from the front while they are idle for
+longer than the TTL or the dict is at capacity, leaving room for one more.
+"""
+
+
+def evict_idle(entries, now: float, ttl_seconds: float, max_entries: int):
+    """Drops entries (with a `last_seen` time) idle past the TTL or over capacity, oldest first."""
+    while entries:
+        oldest = next(iter(entries.values()))
+        if now - oldest.last_seen < ttl_seconds and len(entries) < max_entries:
+            break
+        entries.popitem(last=False)
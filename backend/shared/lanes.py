@@ -0,0 +1,151 @@
+"""
+Priority lanes for event dispatch.
+
+Every envelope carries a "priority": "live" for traffic from a call in
+progress, "batch" for offline work such as backfills. An agent's Redis
+listener hands each message to a LaneDispatcher, and a worker thread always
+serves the live lane first. A batch event that has waited longer than
+`max_batch_wait` seconds is served next anyway, so batch work can't starve.
+
+Handlers see the priority of the event they are processing through
+`current_priority()`, so publish_event can stamp it on whatever they emit.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+
+from shared.envelope import encode, header_of
+from shared.routing import reset_routed_models
+
+PRIORITY_LIVE = "live"
+PRIORITY_BATCH = "batch"
+LANES = (PRIORITY_LIVE, PRIORITY_BATCH)
+METRICS_CHANNEL = "metrics.lanes"
+
+_local = threading.local()
+
+
+def current_priority() -> str:
+    """The priority of the event being handled on this thread (live if none)."""
+    return getattr(_local, "priority", PRIORITY_LIVE)
+
+
+def lane_of(raw) -> str:
+    """
+    Picks the lane without decoding the event. Envelope headers are compact
+    JSON, and older envelopes were written by json.dumps with default
+    separators, so a substring check is enough.
+    """
+    header = header_of(raw)
+    if header is not None:
+        return PRIORITY_BATCH if '"priority":"batch"' in header else PRIORITY_LIVE
+    if isinstance(raw, bytes):
+        return PRIORITY_BATCH if b'"priority": "batch"' in raw else PRIORITY_LIVE
+    if isinstance(raw, str):
+        return PRIORITY_BATCH if '"priority": "batch"' in raw else PRIORITY_LIVE
+    return PRIORITY_LIVE
+
+
+class LaneDispatcher:
+    """Two FIFO lanes drained by one worker thread, live lane first."""
+
+    def __init__(self, agent_id, handler, max_batch_wait: float = 30.0,
+                 metrics_interval: float = 5.0):
+        self.agent_id = agent_id
+        self.handler = handler
+        self.max_batch_wait = max_batch_wait
+        self.metrics_interval = metrics_interval
+        self._lanes = {lane: deque() for lane in LANES}
+        self._served = {lane: 0 for lane in LANES}
+        self._max_wait = {lane: 0.0 for lane in LANES}
+        self._aged_batches = 0
+        self._last_signature = None
+        self._cond = threading.Condition()
+        self._redis_client = None
+        self._worker = None
+
+    def start(self, redis_client=None):
+        """Starts the worker thread; lane metrics are published if Redis is given."""
+        self._redis_client = redis_client
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def submit(self, message):
+        """Queues a pubsub message on the lane its envelope asks for."""
+        if message.get("channel") == METRICS_CHANNEL:
+            return  # pattern subscribers shouldn't feed on each other's metrics
+        lane = lane_of(message.get("data"))
+        with self._cond:
+            self._lanes[lane].append((time.monotonic(), message))
+            self._cond.notify()
+
+    def _next(self):
+        live, batch = self._lanes[PRIORITY_LIVE], self._lanes[PRIORITY_BATCH]
+        if batch and (not live or time.monotonic() - batch[0][0] > self.max_batch_wait):
+            if live:
+                self._aged_batches += 1
+            return PRIORITY_BATCH, batch.popleft()
+        return PRIORITY_LIVE, live.popleft()
+
+    def _run(self):
+        last_metrics = time.monotonic()
+        while True:
+            with self._cond:
+                while not any(self._lanes.values()):
+                    self._cond.wait(timeout=self.metrics_interval)
+                    if time.monotonic() - last_metrics >= self.metrics_interval:
+                        break
+                if any(self._lanes.values()):
+                    lane, (queued_at, message) = self._next()
+                else:
+                    lane = None
+
+            if lane:
+                waited = time.monotonic() - queued_at
+                self._max_wait[lane] = max(self._max_wait[lane], waited)
+                _local.priority = lane
+                reset_routed_models()
+                try:
+                    self.handler(message)
+                except Exception as e:
+                    print(f"[{self.agent_id}] CRITICAL: Unhandled error in {lane} lane: {e}")
+                finally:
+                    _local.priority = PRIORITY_LIVE
+                self._served[lane] += 1
+
+            if time.monotonic() - last_metrics >= self.metrics_interval:
+                self._publish_metrics()
+                last_metrics = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "agent_id": self.agent_id,
+                "depth": {lane: len(queue) for lane, queue in self._lanes.items()},
+                "served": dict(self._served),
+                "max_wait_seconds": {lane: round(w, 3) for lane, w in self._max_wait.items()},
+                "aged_batch_events": self._aged_batches,
+            }
+
+    def _publish_metrics(self):
+        if not self._redis_client:
+            return
+        stats = self.stats()
+        # Nothing queued and nothing new since the last report: stay quiet.
+        signature = (tuple(stats["depth"].values()), tuple(stats["served"].values()))
+        if signature == self._last_signature:
+            return
+        self._last_signature = signature
+        self._max_wait = {lane: 0.0 for lane in LANES}
+        envelope = {
+            "event_id": str(uuid.uuid4()), "timestamp": time.time(),
+            "agent_id": self.agent_id, "channel": METRICS_CHANNEL, "payload": stats,
+            "priority": PRIORITY_BATCH
+        }
+        try:
+            self._redis_client.publish(METRICS_CHANNEL, encode(envelope))
+        except Exception as e:
+            print(f"[{self.agent_id}] ERROR: Could not publish lane metrics: {e}")
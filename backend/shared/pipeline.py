@@ -0,0 +1,303 @@
+"""
+Declarative pipeline spec.
+
+`backend/pipeline.json` describes every stage of the agent pipeline: the
+agent that runs it, the channels it consumes (`inputs`) and publishes
+(`outputs`), and optionally:
+
+- `join`: "any" (default) runs the stage once per input event; "all" waits
+  until one event has arrived on every input, for the same trace and the
+  same `join_on` key, and runs it once on the joined set. The orchestrator
+  does the waiting and publishes the joined set on `pipeline.join.<stage>`;
+- `join_on`: per input, a dotted path into the envelope (default
+  "trace_id") whose value must match across the inputs of one join;
+- `context`: channels the stage also reads but is not triggered by;
+- `expected_ms`: typical stage latency, used for the static critical path.
+
+Agents read their channels from the spec instead of hard-coding them, and
+`load_pipeline` validates the whole graph the first time it is read, so a
+dangling input or a cycle stops an agent at startup rather than silently
+starving a stage.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from shared.envelope import Envelope
+from shared.expiry import evict_idle
+
+DEFAULT_SPEC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pipeline.json")
+JOIN_CHANNEL_PREFIX = "pipeline.join."
+JOIN_MODES = ("any", "all")
+
+
+class PipelineError(ValueError):
+    """The pipeline spec does not describe a valid graph."""
+
+
+class Stage:
+    __slots__ = ("name", "agent", "inputs", "outputs", "join", "join_on", "context", "expected_ms")
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.agent = spec.get("agent", name)
+        self.inputs = list(spec.get("inputs", []))
+        self.outputs = list(spec.get("outputs", []))
+        self.join = spec.get("join", "any")
+        self.join_on = dict(spec.get("join_on", {}))
+        self.context = list(spec.get("context", []))
+        self.expected_ms = float(spec.get("expected_ms", 0))
+
+    @property
+    def join_channel(self):
+        return JOIN_CHANNEL_PREFIX + self.name
+
+    @property
+    def subscriptions(self) -> list:
+        """The channels the stage's agent subscribes to."""
+        triggers = [self.join_channel] if self.join == "all" else self.inputs
+        return triggers + [channel for channel in self.context if channel not in triggers]
+
+    def join_key(self, channel, envelope):
+        value = envelope
+        for part in self.join_on.get(channel, "trace_id").split("."):
+            value = value.get(part) if isinstance(value, (dict, Envelope)) else None
+        return value
+
+    def to_dict(self) -> dict:
+        return {"agent": self.agent, "inputs": self.inputs, "outputs": self.outputs,
+                "join": self.join, "join_on": self.join_on, "context": self.context,
+                "expected_ms": self.expected_ms}
+
+
+class Pipeline:
+    def __init__(self, spec: dict):
+        self.sources = list(spec.get("sources", []))
+        self.stages = {name: Stage(name, stage) for name, stage in spec.get("stages", {}).items()}
+        self.producers = {}
+        for stage in self.stages.values():
+            for channel in stage.outputs:
+                self.producers.setdefault(channel, []).append(stage.name)
+        self.validate()
+        self.waves = self._waves()
+
+    def stage(self, name: str) -> Stage:
+        try:
+            return self.stages[name]
+        except KeyError:
+            raise PipelineError(f"No stage named '{name}' in the pipeline spec.") from None
+
+    def validate(self):
+        """Raises PipelineError listing every problem with the graph."""
+        problems = []
+        known = set(self.sources) | set(self.producers)
+        for stage in self.stages.values():
+            if not stage.inputs:
+                problems.append(f"stage '{stage.name}' has no inputs")
+            if not stage.outputs:
+                problems.append(f"stage '{stage.name}' has no outputs")
+            if stage.join not in JOIN_MODES:
+                problems.append(f"stage '{stage.name}' has unknown join mode '{stage.join}'")
+            if stage.join == "all" and len(stage.inputs) < 2:
+                problems.append(f"stage '{stage.name}' joins on all inputs but has fewer than two")
+            for channel in stage.inputs + stage.context:
+                if channel not in known:
+                    problems.append(f"stage '{stage.name}' reads '{channel}', which nothing publishes")
+            for channel in stage.join_on:
+                if channel not in stage.inputs:
+                    problems.append(f"stage '{stage.name}' has a join key for '{channel}', which is not an input")
+        if not problems:
+            cycle = self._find_cycle()
+            if cycle:
+                problems.append("cycle: " + " -> ".join(cycle))
+        if problems:
+            raise PipelineError("Invalid pipeline spec: " + "; ".join(problems))
+
+    def upstream(self, stage: Stage) -> set:
+        """Stages whose outputs trigger `stage`."""
+        return {producer for channel in stage.inputs for producer in self.producers.get(channel, ())}
+
+    def _find_cycle(self):
+        visiting, done = [], set()
+
+        def visit(name):
+            if name in done:
+                return None
+            if name in visiting:
+                return visiting[visiting.index(name):] + [name]
+            visiting.append(name)
+            for upstream in sorted(self.upstream(self.stages[name])):
+                cycle = visit(upstream)
+                if cycle:
+                    return cycle
+            visiting.pop()
+            done.add(name)
+            return None
+
+        for name in self.stages:
+            cycle = visit(name)
+            if cycle:
+                return cycle[::-1]
+        return None
+
+    def _waves(self) -> list:
+        """Stages grouped by depth: every stage in a wave only depends on earlier waves."""
+        depth = {}
+
+        def depth_of(name):
+            if name not in depth:
+                depth[name] = 1 + max((depth_of(upstream) for upstream in self.upstream(self.stages[name])), default=-1)
+            return depth[name]
+
+        waves = []
+        for name in self.stages:
+            level = depth_of(name)
+            waves.extend([] for _ in range(level + 1 - len(waves)))
+            waves[level].append(name)
+        return waves
+
+    def critical_path(self) -> dict:
+        """The slowest chain of stages by `expected_ms`."""
+        best = {}
+
+        def longest(name):
+            if name not in best:
+                stage = self.stages[name]
+                before = max((longest(upstream) for upstream in self.upstream(stage)),
+                             key=lambda path: path[0], default=(0.0, []))
+                # A join waits for its slowest input, which is what `before` picks.
+                best[name] = (before[0] + stage.expected_ms, before[1] + [name])
+            return best[name]
+
+        total, path = max((longest(name) for name in self.stages), key=lambda path: path[0], default=(0.0, []))
+        return {"expected_ms": total, "stages": path}
+
+    def to_dict(self) -> dict:
+        return {"sources": self.sources,
+                "stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+                "waves": self.waves,
+                "critical_path": self.critical_path()}
+
+
+_pipelines = {}
+_pipelines_lock = Lock()
+
+
+def load_pipeline(path: str = None) -> Pipeline:
+    """The validated pipeline at `path` (PIPELINE_SPEC_PATH, else backend/pipeline.json)."""
+    path = path or os.getenv("PIPELINE_SPEC_PATH", DEFAULT_SPEC_PATH)
+    with _pipelines_lock:
+        if path not in _pipelines:
+            with open(path, encoding="utf-8") as f:
+                _pipelines[path] = Pipeline(json.load(f))
+        return _pipelines[path]
+
+
+class _TraceRun:
+    __slots__ = ("started", "arrivals", "pending_joins", "fired_joins", "last_seen")
+
+    def __init__(self, now):
+        self.started = None
+        self.arrivals = []
+        self.pending_joins = {}
+        self.fired_joins = set()
+        self.last_seen = now
+
+
+class TraceTracker:
+    """
+    Follows every event of every trace through the pipeline: completes "all"
+    joins and records arrivals for per-trace critical paths. Traces idle for
+    longer than the TTL are dropped.
+    """
+
+    def __init__(self, pipeline: Pipeline, ttl_seconds: float = 900.0, max_traces: int = 10000,
+                 max_events_per_trace: int = 1000):
+        self.pipeline = pipeline
+        self.ttl_seconds = ttl_seconds
+        self.max_traces = max_traces
+        self.max_events_per_trace = max_events_per_trace
+        self._joins = {}
+        for stage in pipeline.stages.values():
+            if stage.join == "all":
+                for channel in stage.inputs:
+                    self._joins.setdefault(channel, []).append(stage)
+        self._traces = OrderedDict()
+        self._lock = Lock()
+        self.joins_completed = 0
+
+    def observe(self, envelope) -> list:
+        """
+        Records one envelope. Returns (stage, joined) for every join the
+        envelope completed, where joined maps each input channel to the
+        envelope that arrived on it.
+        """
+        trace_id, channel = envelope.get("trace_id"), envelope.get("channel")
+        if not trace_id or not channel:
+            return []
+        now = time.time()
+        completed = []
+        with self._lock:
+            evict_idle(self._traces, now, self.ttl_seconds, self.max_traces)
+            run = self._traces.pop(trace_id, None) or _TraceRun(now)
+            run.last_seen = now
+            self._traces[trace_id] = run
+            at = envelope.get("timestamp") or now
+            if run.started is None:
+                run.started = at
+            if len(run.arrivals) < self.max_events_per_trace:
+                run.arrivals.append((at, channel, envelope.get("agent_id")))
+
+            for stage in self._joins.get(channel, ()):
+                key = (stage.name, json.dumps(stage.join_key(channel, envelope), default=str))
+                if key in run.fired_joins:
+                    continue
+                # The first event per input wins; a join fires once per key.
+                pending = run.pending_joins.setdefault(key, {})
+                pending.setdefault(channel, envelope)
+                if len(pending) == len(stage.inputs):
+                    del run.pending_joins[key]
+                    run.fired_joins.add(key)
+                    self.joins_completed += 1
+                    completed.append((stage, pending))
+        return completed
+
+    def critical_path(self, trace_id: str):
+        """
+        The chain of events that ended the trace, walked back from its last
+        event: each stage is charged to the latest of its inputs that arrived
+        before its output (for an "all" join, its slowest input). None if the
+        trace is unknown.
+        """
+        with self._lock:
+            run = self._traces.get(trace_id)
+            if run is None:
+                return None
+            arrivals = sorted(run.arrivals)
+            started = run.started
+
+        if not arrivals:
+            return {"trace_id": trace_id, "total_ms": 0.0, "path": []}
+        path = []
+        at, channel, agent = arrivals[-1]
+        while True:
+            producers = [self.pipeline.stages[name] for name in self.pipeline.producers.get(channel, ())]
+            inputs = {input_channel for stage in producers for input_channel in stage.inputs}
+            trigger = max(((t, c, a) for t, c, a in arrivals if c in inputs and t <= at), default=None)
+            step = at - trigger[0] if trigger else at - started
+            path.append({"channel": channel, "agent_id": agent,
+                         "stage": producers[0].name if producers else None,
+                         "at_ms": round((at - started) * 1000, 1), "step_ms": round(step * 1000, 1)})
+            if trigger is None:
+                break
+            at, channel, agent = trigger
+        path.reverse()
+        return {"trace_id": trace_id, "total_ms": round((arrivals[-1][0] - started) * 1000, 1), "path": path}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active_traces": len(self._traces), "joins_completed": self.joins_completed,
+                    "pending_joins": sum(len(run.pending_joins) for run in self._traces.values())}
@@ -0,0 +1,50 @@
+"""
+Precomputed meeting results, shared by the Scheduler Agent (writer) and the
+UI Agent (reader).
+
+Layout in Redis:
+- `precomputed:<meeting_id>`: hash with the meeting ("meeting"), the
+  entities that were triggered ("entities") and the trace of each account
+  ("traces"), all JSON;
+- `precomputed:<meeting_id>:<account>`: hash of channel -> the latest
+  {"payload", "agent_id", "timestamp"} published on that channel for the
+  account's trace.
+"""
+
+import json
+
+KEY_PREFIX = "precomputed"
+MEETING_OPENED_CHANNEL = "meeting.opened"
+
+
+def meeting_key(meeting_id: str) -> str:
+    return f"{KEY_PREFIX}:{meeting_id}"
+
+
+def account_key(meeting_id: str, account: str) -> str:
+    return f"{KEY_PREFIX}:{meeting_id}:{account.lower()}"
+
+
+def read_precomputed(redis_client, meeting_id: str):
+    """The meeting, its entities and each account's results in two round trips, or None."""
+    meta = redis_client.hgetall(meeting_key(meeting_id))
+    if not meta:
+        return None
+    meeting = json.loads(meta["meeting"])
+    traces = json.loads(meta.get("traces", "{}"))
+    pipe = redis_client.pipeline(transaction=False)
+    for account in meeting["accounts"]:
+        pipe.hgetall(account_key(meeting_id, account))
+    results = pipe.execute()
+    return {
+        "meeting": meeting,
+        "entities": json.loads(meta.get("entities", "[]")),
+        "triggered_at": float(meta["triggered_at"]) if "triggered_at" in meta else None,
+        "accounts": {
+            account: {
+                "trace_id": traces.get(account),
+                "results": {channel: json.loads(value) for channel, value in result.items()},
+            }
+            for account, result in zip(meeting["accounts"], results)
+        },
+    }
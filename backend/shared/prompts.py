@@ -0,0 +1,240 @@
+"""
+Token-budgeted prompt building.
+
+Agents used to interpolate whole payloads into f-strings, often through
+json.dumps(..., indent=2). PromptBuilder assembles the same prompts from named
+sections instead:
+
+- JSON values are written compactly, without empty fields;
+- lists of snippets lose near-duplicates (MinHash over word 3-shingles);
+- sections and dict fields are kept in order of importance until the agent's
+  token budget is spent; the section that crosses the budget is cut down to
+  whole items (or words), the rest are dropped.
+
+Token counts come from `count_tokens`, a local approximation of BPE
+tokenizers (about one token per short word or punctuation mark, longer words
+a token per four characters). Each build reports the tokens saved against
+the old pretty-printed prompt.
+
+Each agent has its own default budget; PROMPT_TOKEN_BUDGET_<AGENT_ID>
+overrides it for that agent only.
+"""
+
+import json
+import os
+import re
+import zlib
+from threading import Lock
+
+import numpy as np
+
+_TOKEN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_WORD = re.compile(r"\S+")
+_SHINGLE_WORD = re.compile(r"\w+")
+
+_MINHASH_PERMUTATIONS = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(1)
+_HASH_A = _rng.integers(1, 1 << 32, _MINHASH_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, 1 << 32, _MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+_totals_lock = Lock()
+_totals = {}
+
+
+def count_tokens(text: str) -> int:
+    """Approximate BPE token count."""
+    tokens = 0
+    for piece in _TOKEN.findall(text):
+        tokens += 1 + (len(piece) - 1) // 4 if len(piece) > 4 else 1
+    return tokens
+
+
+def token_budget(agent_id: str, default: int) -> int:
+    return int(os.getenv(f"PROMPT_TOKEN_BUDGET_{agent_id.upper()}", default))
+
+
+def compact_json(value) -> str:
+    """JSON without whitespace or empty values."""
+    return json.dumps(_prune(value), separators=(",", ":"), ensure_ascii=False)
+
+
+def _prune(value):
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_prune(item) for item in value]
+    return value
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of a text's lowercased word 3-shingles (punctuation ignored)."""
+    words = _SHINGLE_WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))]
+    hashes = np.array([zlib.crc32(shingle.encode()) for shingle in shingles], dtype=np.uint64)
+    return ((np.outer(hashes, _HASH_A) + _HASH_B) % _MERSENNE_PRIME).min(axis=0)
+
+
+def dedupe(snippets: list, threshold: float = 0.8) -> list:
+    """Drops snippets whose estimated Jaccard similarity to an earlier one reaches threshold."""
+    kept, signatures = [], []
+    for snippet in snippets:
+        text = snippet if isinstance(snippet, str) else compact_json(snippet)
+        signature = minhash(text)
+        if signatures and (np.asarray(signatures) == signature).mean(axis=1).max() >= threshold:
+            continue
+        kept.append(snippet)
+        signatures.append(signature)
+    return kept
+
+
+class _Section:
+    __slots__ = ("label", "value", "importance", "fields", "order")
+
+    def __init__(self, label, value, importance, fields, order):
+        self.label = label
+        self.value = value
+        self.importance = importance
+        self.fields = fields
+        self.order = order
+
+
+class PromptBuilder:
+    """
+    Builds one prompt within a token budget. Instructions are always kept;
+    sections are kept by importance (higher first), in the order they were added.
+    """
+
+    def __init__(self, agent_id: str, budget: int = 2000, dedupe_threshold: float = 0.8):
+        self.agent_id = agent_id
+        self.budget = budget
+        self.dedupe_threshold = dedupe_threshold
+        self._instructions = []
+        self._sections = []
+        self.report = None
+
+    def instruction(self, text: str):
+        self._instructions.append(_dedent(text))
+        return self
+
+    def section(self, label: str, value, importance: int = 0, fields: list = None):
+        """
+        Adds a labelled value: a string, a list of snippets, or a JSON-able
+        object. For dicts, `fields` lists the keys in order of importance;
+        unlisted keys come after them.
+        """
+        if value not in (None, "", [], {}):
+            self._sections.append(_Section(label, value, importance, fields, len(self._sections)))
+        return self
+
+    def build(self) -> str:
+        head = "\n".join(self._instructions)
+        remaining = self.budget - count_tokens(head)
+        rendered, dropped_snippets, truncated = {}, 0, []
+
+        for section in sorted(self._sections, key=lambda s: (-s.importance, s.order)):
+            value = section.value
+            if isinstance(value, list):
+                deduped = dedupe(value, self.dedupe_threshold)
+                dropped_snippets += len(value) - len(deduped)
+                value = deduped
+            text, cut = self._fit(section.label, value, section.fields, remaining)
+            if text is None:
+                truncated.append(section.label)
+                continue
+            if cut:
+                truncated.append(section.label)
+            rendered[section.order] = text
+            remaining -= count_tokens(text)
+
+        body = [rendered[order] for order in sorted(rendered)]
+        prompt = "\n\n".join([head] + body) if body else head
+        baseline = count_tokens("\n".join([head] + [
+            f"{s.label}: {_pretty(s.value)}" for s in self._sections
+        ]))
+        tokens = count_tokens(prompt)
+        self.report = {
+            "agent_id": self.agent_id,
+            "budget": self.budget,
+            "prompt_tokens": tokens,
+            "baseline_tokens": baseline,
+            "tokens_saved": max(baseline - tokens, 0),
+            "duplicates_dropped": dropped_snippets,
+            "truncated_sections": truncated,
+        }
+        _record(self.report)
+        print(f"[{self.agent_id}] Prompt: {tokens} tokens (budget {self.budget}, saved {self.report['tokens_saved']}).")
+        return prompt
+
+    def _fit(self, label, value, fields, remaining):
+        """Renders a section within `remaining` tokens. Returns (text, was_cut), or (None, True)."""
+        prefix = f"{label}: "
+        room = remaining - count_tokens(prefix)
+        if room <= 0:
+            return None, True
+        if isinstance(value, str):
+            text = _truncate_words(value, room)
+            return (prefix + text, text != value) if text else (None, True)
+        if isinstance(value, list):
+            items, used = [], 0
+            for item in value:
+                line = f"- {item if isinstance(item, str) else compact_json(item)}"
+                cost = count_tokens(line)
+                if used + cost > room:
+                    break
+                items.append(line)
+                used += cost
+            if not items:
+                return None, True
+            return prefix.rstrip() + "\n" + "\n".join(items), len(items) < len(value)
+        if isinstance(value, dict):
+            value = _prune(value)
+            ordered = [key for key in (fields or []) if key in value]
+            ordered += [key for key in value if key not in ordered]
+            kept = {}
+            for key in ordered:
+                candidate = dict(kept, **{key: value[key]})
+                if count_tokens(compact_json(candidate)) > room:
+                    continue
+                kept = candidate
+            if not kept:
+                return None, True
+            return prefix + compact_json(kept), len(kept) < len(value)
+        text = compact_json(value)
+        return (prefix + text, False) if count_tokens(text) <= room else (None, True)
+
+
+def _dedent(text):
+    return "\n".join(line.strip() for line in text.strip().splitlines())
+
+
+def _pretty(value):
+    return value if isinstance(value, str) else json.dumps(value, indent=2)
+
+
+def _truncate_words(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    words, used = [], 0
+    for word in _WORD.findall(text):
+        cost = count_tokens(word)
+        if used + cost > max_tokens:
+            break
+        words.append(word)
+        used += cost
+    return " ".join(words)
+
+
+def _record(report):
+    with _totals_lock:
+        totals = _totals.setdefault(report["agent_id"], {"prompts": 0, "prompt_tokens": 0, "tokens_saved": 0})
+        totals["prompts"] += 1
+        totals["prompt_tokens"] += report["prompt_tokens"]
+        totals["tokens_saved"] += report["tokens_saved"]
+
+
+def prompt_stats(agent_id: str) -> dict:
+    """Running totals of the prompts an agent has built."""
+    with _totals_lock:
+        return dict(_totals.get(agent_id, {"prompts": 0, "prompt_tokens": 0, "tokens_saved": 0}))
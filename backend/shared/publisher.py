@@ -0,0 +1,155 @@
+"""
+Batched, pipelined publishing.
+
+`redis_client.publish` costs one network round trip per event, which caps an
+agent emitting many partial events (streaming summaries, batch jobs) at a
+few thousand events per second. A Publisher queues encoded envelopes and a
+flusher thread sends them in one Redis pipeline per batch: a batch goes out
+when it holds PUBLISH_BATCH_SIZE messages, or PUBLISH_FLUSH_MS after its
+first message was queued, whichever comes first.
+
+- Order: one queue and one flusher, so messages reach Redis in the order
+  they were published, and so does every channel's share of them.
+- Backpressure: `publish` blocks while PUBLISH_QUEUE_SIZE messages are
+  waiting.
+- Shutdown: `close` flushes what is queued before stopping the flusher;
+  agents call it from their FastAPI shutdown hook. Anything published after
+  that goes straight to Redis.
+
+`flush` waits until every message queued so far has been sent, for callers
+that need a publish to have happened before they go on.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+PUBLISH_BATCH_SIZE = int(os.getenv("PUBLISH_BATCH_SIZE", 100))
+PUBLISH_FLUSH_MS = float(os.getenv("PUBLISH_FLUSH_MS", 2))
+PUBLISH_QUEUE_SIZE = int(os.getenv("PUBLISH_QUEUE_SIZE", 10000))
+
+
+class Publisher:
+    """Publishes (channel, message) pairs to Redis in pipelined batches."""
+
+    def __init__(self, agent_id, batch_size: int = None, flush_interval: float = None,
+                 max_queue: int = None):
+        self.agent_id = agent_id
+        self.batch_size = max(1, batch_size or PUBLISH_BATCH_SIZE)
+        self.flush_interval = PUBLISH_FLUSH_MS / 1000 if flush_interval is None else flush_interval
+        self.max_queue = max_queue or PUBLISH_QUEUE_SIZE
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._redis_client = None
+        self._thread = None
+        self._closed = False
+        self._flush_requests = 0
+        self._queued = 0
+        self._done = 0
+        self.published = 0
+        self.batches = 0
+        self.errors = 0
+
+    def start(self, redis_client):
+        with self._cond:
+            self._redis_client = redis_client
+            if self._thread is None:
+                self._closed = False
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def publish(self, channel: str, message: str):
+        """Queues one message, waiting while the queue is full."""
+        with self._cond:
+            if self._closed:
+                direct = self._redis_client
+            else:
+                while len(self._queue) >= self.max_queue and not self._closed:
+                    self._cond.wait()
+                self._queue.append((time.monotonic(), channel, message))
+                self._queued += 1
+                self._cond.notify_all()
+                return
+        # Published after close (e.g. by a handler still running): no batching.
+        if direct:
+            direct.publish(channel, message)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Sends everything queued so far now. False if it was not all sent within the timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._queued
+            if self._thread is None:
+                return self._done >= target
+            self._flush_requests += 1
+            self._cond.notify_all()
+            try:
+                while self._done < target:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flush_requests -= 1
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """Flushes the queue, then stops the flusher. False if messages were left unsent."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            self._cond.notify_all()
+        if thread:
+            thread.join(timeout)
+        return flushed
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            deadline = self._queue[0][0] + self.flush_interval
+            while (len(self._queue) < self.batch_size and not self._flush_requests
+                   and not self._closed):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+            # Room in the queue again for blocked publishers.
+            self._cond.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                pipe = self._redis_client.pipeline(transaction=False)
+                for _, channel, message in batch:
+                    pipe.publish(channel, message)
+                pipe.execute()
+                self.published += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"[{self.agent_id}] ERROR: Failed to publish batch of {len(batch)}: {e}")
+            with self._cond:
+                self._done += len(batch)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "capacity": self.max_queue,
+                "published": self.published,
+                "batches": self.batches,
+                "errors": self.errors,
+                "batch_size": self.batch_size,
+                "flush_ms": self.flush_interval * 1000,
+            }
@@ -0,0 +1,185 @@
+"""
+Per-request LLM model routing.
+
+`backend/model_routing.json` lists the models (quality rank, context window,
+latency prior) and per-agent routing config: a latency SLO and ordered
+rules. The first rule whose `max_prompt_tokens` covers the prompt decides
+what to prefer:
+
+- "fastest": the model with the lowest expected latency;
+- "capable": the highest-quality model expected to finish within the SLO.
+
+Models whose context window can't hold the prompt are never chosen, and
+models whose recent error rate exceeds `max_error_rate` are skipped while
+any healthy model is left. If nothing is expected to meet the SLO, the
+fastest model wins.
+
+Expected latency is a per-call overhead plus a per-prompt-token cost. The
+overhead starts from the prior in the config and tracks observed latencies
+(EWMA); error rates are an EWMA too and decay while a model is idle, so a
+skipped model is retried once its failures are old.
+
+Models routed while handling an event are collected per thread, so
+publish_event can record them in the envelope (`routed_models()`); the lane
+dispatcher starts every event with an empty list.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_routing.json")
+LATENCY_ALPHA = 0.2
+ERROR_ALPHA = 0.2
+ERROR_DECAY_SECONDS = 60.0
+FASTEST, CAPABLE = "fastest", "capable"
+
+_local = threading.local()
+
+
+def routed_models() -> list:
+    """The models routed so far for the event being handled on this thread."""
+    models = getattr(_local, "models", None)
+    if models is None:
+        models = _local.models = []
+    return models
+
+
+def reset_routed_models():
+    _local.models = []
+
+
+def carry(fn, models: list = None):
+    """
+    Wraps `fn` for a worker thread so the models it routes are recorded on
+    `models` (by default, the calling thread's current event).
+    """
+    target = routed_models() if models is None else models
+
+    def run(*args, **kwargs):
+        previous = getattr(_local, "models", None)
+        _local.models = target
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.models = previous
+
+    return run
+
+
+class _ModelStats:
+    __slots__ = ("overhead_ms", "ms_per_1k", "error_rate", "updated", "calls", "failures")
+
+    def __init__(self, spec):
+        self.overhead_ms = float(spec.get("overhead_ms", 1000))
+        self.ms_per_1k = float(spec.get("ms_per_1k_prompt_tokens", 0))
+        self.error_rate = 0.0
+        self.updated = time.time()
+        self.calls = 0
+        self.failures = 0
+
+    def expected_ms(self, tokens):
+        return self.overhead_ms + self.ms_per_1k * tokens / 1000
+
+    def current_error_rate(self, now):
+        return self.error_rate * math.exp(-(now - self.updated) / ERROR_DECAY_SECONDS)
+
+
+class ModelRouter:
+    """Chooses a model for each of one agent's LLM calls."""
+
+    def __init__(self, agent_id: str, config: dict = None):
+        if config is None:
+            with open(os.getenv("MODEL_ROUTING_PATH", DEFAULT_CONFIG_PATH), encoding="utf-8") as f:
+                config = json.load(f)
+        self.agent_id = agent_id
+        self.models = config["models"]
+        if not self.models:
+            raise ValueError("The routing config lists no models.")
+        settings = dict(config.get("defaults", {}))
+        settings.update(config.get("agents", {}).get(agent_id, {}))
+        self.slo_ms = float(settings.get("slo_ms", 8000))
+        self.max_error_rate = float(settings.get("max_error_rate", 0.5))
+        self.reserve_tokens = int(settings.get("reserve_tokens", 1024))
+        self.candidates = settings.get("models") or list(self.models)
+        self.rules = settings.get("rules") or [{"prefer": CAPABLE}]
+        unknown = [model for model in self.candidates if model not in self.models]
+        if unknown:
+            raise ValueError(f"Routing for '{agent_id}' names unknown models: {unknown}")
+        self._stats = {model: _ModelStats(self.models[model]) for model in self.candidates}
+        self._lock = threading.Lock()
+        self.routes = {model: 0 for model in self.candidates}
+
+    def choose(self, prompt_tokens: int) -> str:
+        now = time.time()
+        rule = next((rule for rule in self.rules if prompt_tokens <= rule.get("max_prompt_tokens", math.inf)),
+                    self.rules[-1])
+        with self._lock:
+            fits = [model for model in self.candidates
+                    if self.models[model].get("context_tokens", math.inf) >= prompt_tokens + self.reserve_tokens]
+            # A prompt too big for every window goes to the largest and is left to fail there.
+            fits = fits or [max(self.candidates, key=lambda model: self.models[model].get("context_tokens", math.inf))]
+            healthy = [model for model in fits if self._stats[model].current_error_rate(now) <= self.max_error_rate] or fits
+            expected = {model: self._stats[model].expected_ms(prompt_tokens) for model in healthy}
+            fastest = min(healthy, key=expected.get)
+            within_slo = [model for model in healthy if expected[model] <= self.slo_ms]
+            if rule.get("prefer", CAPABLE) == FASTEST or not within_slo:
+                model = fastest
+            else:
+                model = max(within_slo, key=lambda m: (self.models[m].get("quality", 0), -expected[m]))
+            self.routes[model] += 1
+        return model
+
+    def record(self, model: str, prompt_tokens: int, latency_ms: float = None, ok: bool = True):
+        now = time.time()
+        with self._lock:
+            stats = self._stats[model]
+            stats.error_rate = (1 - ERROR_ALPHA) * stats.current_error_rate(now) + ERROR_ALPHA * (0.0 if ok else 1.0)
+            stats.updated = now
+            stats.calls += 1
+            if ok and latency_ms is not None:
+                observed = max(latency_ms - stats.ms_per_1k * prompt_tokens / 1000, 0.0)
+                stats.overhead_ms = (1 - LATENCY_ALPHA) * stats.overhead_ms + LATENCY_ALPHA * observed
+            else:
+                stats.failures += 1
+
+    @contextmanager
+    def route(self, prompt: str):
+        """
+        Yields the model to call for `prompt`, timing the block: an exception
+        counts as a failure of that model and is re-raised.
+        """
+        # Imported here: shared.prompts needs numpy, which only LLM agents install,
+        # while every agent imports this module through the lane dispatcher.
+        from shared.prompts import count_tokens
+        tokens = count_tokens(prompt)
+        model = self.choose(tokens)
+        routed_models().append(model)
+        started = time.perf_counter()
+        try:
+            yield model
+        except Exception:
+            self.record(model, tokens, ok=False)
+            raise
+        self.record(model, tokens, (time.perf_counter() - started) * 1000)
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {
+                "agent_id": self.agent_id,
+                "slo_ms": self.slo_ms,
+                "models": {
+                    model: {
+                        "routed": self.routes[model],
+                        "calls": stats.calls,
+                        "failures": stats.failures,
+                        "expected_overhead_ms": round(stats.overhead_ms, 1),
+                        "error_rate": round(stats.current_error_rate(now), 4),
+                    }
+                    for model, stats in self._stats.items()
+                },
+            }
@@ -0,0 +1,203 @@
+"""
+Semantic caching of LLM responses.
+
+Exact-match caches miss prompts that differ only in phrasing: "alex from
+google" and "Alex at Google" should get the same talking points. A
+SemanticCache keys responses by an embedding of the prompt's variable input
+instead. The fixed instructions of a prompt template are identical on every
+call, so each template gets its own namespace and only its inputs are
+embedded. Callers can narrow a namespace further with an exact-match scope,
+such as the account the prompt is about: embeddings can't tell "Google is a
+global technology leader" from the same sentence about another company.
+
+- Normalization lowercases, drops punctuation and a few function words
+  ("from", "at", "the"...), so those variations map to the same text.
+- Embeddings are computed locally: hashed word and character 3-gram features,
+  L2-normalized, so cosine similarity is a dot product.
+- Each namespace has a small ANN index: random-hyperplane LSH tables whose
+  buckets give the candidates; the nearest candidate is a hit if its cosine
+  similarity reaches the threshold. Numbers must match exactly, so "50
+  seats" never answers for "500 seats", and a prompt using a word that the
+  candidate lacks but another cached prompt has ("Infosys" where the
+  candidate says "Google") is told apart, since that word distinguishes
+  cached prompts.
+- Size is bounded across namespaces with LRU eviction.
+
+Caching is on by default. SEMANTIC_CACHE=false turns it off for every agent;
+SEMANTIC_CACHE_<AGENT_ID> (e.g. SEMANTIC_CACHE_LEAD_SCORING_AGENT_V1)
+overrides it for one agent.
+"""
+
+import os
+import re
+import zlib
+from collections import Counter, OrderedDict
+from threading import Lock
+
+import numpy as np
+
+DIMENSIONS = 512
+LSH_TABLES = 16
+LSH_BITS = 8
+
+_WORD = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+STOPWORDS = frozenset("a an and at by for from in of on the to with".split())
+
+_rng = np.random.default_rng(7)
+_PLANES = _rng.standard_normal((LSH_TABLES, LSH_BITS, DIMENSIONS)).astype(np.float32)
+_BIT_VALUES = 1 << np.arange(LSH_BITS)
+
+
+def enabled_for(agent_id: str) -> bool:
+    default = os.getenv("SEMANTIC_CACHE", "true")
+    return os.getenv(f"SEMANTIC_CACHE_{agent_id.upper()}", default).lower() == "true"
+
+
+def normalize(text: str) -> str:
+    return " ".join(word for word in _WORD.findall(text.lower()) if word not in STOPWORDS)
+
+
+def embed(normalized: str) -> np.ndarray:
+    """Unit vector of hashed word and character 3-gram features."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for word in normalized.split():
+        padded = f" {word} "
+        features = [f"w:{word}"] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for feature in features:
+            digest = zlib.crc32(feature.encode())
+            vector[digest % DIMENSIONS] += 1.0 if digest & (1 << 31) else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _namespace(template, scope):
+    return f"{template}\x00{normalize(scope)}" if scope else template
+
+
+def _buckets(vector):
+    bits = (_PLANES @ vector) > 0
+    return [int(code) for code in bits @ _BIT_VALUES]
+
+
+class _Entry:
+    __slots__ = ("namespace", "vector", "words", "numbers", "buckets", "response")
+
+    def __init__(self, namespace, normalized, response):
+        self.namespace = namespace
+        self.vector = embed(normalized)
+        self.words = frozenset(normalized.split())
+        self.numbers = tuple(_NUMBER.findall(normalized))
+        self.buckets = _buckets(self.vector)
+        self.response = response
+
+
+class SemanticCache:
+    """An agent's LLM responses, looked up by prompt similarity per template."""
+
+    def __init__(self, agent_id: str, threshold: float = 0.9, max_entries: int = 1000,
+                 enabled: bool = None):
+        self.agent_id = agent_id
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled_for(agent_id) if enabled is None else enabled
+        self._entries = OrderedDict()
+        self._tables = {}
+        self._vocabulary = {}
+        self._lock = Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.exact_hits = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def get(self, template: str, text: str, scope: str = ""):
+        """The cached response for a prompt similar to `text` in the same template and scope, or None."""
+        if not self.enabled:
+            return None
+        namespace = _namespace(template, scope)
+        key = (namespace, normalize(text))
+        vector = embed(key[1])
+        words = frozenset(key[1].split())
+        numbers = tuple(_NUMBER.findall(key[1]))
+        with self._lock:
+            self.lookups += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.exact_hits += 1
+                return entry.response
+            tables = self._tables.get(namespace)
+            if not tables:
+                return None
+            candidates = set()
+            for table, bucket in zip(tables, _buckets(vector)):
+                candidates.update(table.get(bucket, ()))
+            candidates = [candidate for candidate in candidates if self._entries[candidate].numbers == numbers]
+            if not candidates:
+                return None
+            similarities = np.stack([self._entries[candidate].vector for candidate in candidates]) @ vector
+            vocabulary = self._vocabulary[namespace]
+            for index in similarities.argsort()[::-1]:
+                if similarities[index] < self.threshold:
+                    return None
+                entry = self._entries[candidates[index]]
+                if any(vocabulary[word] for word in words - entry.words):
+                    self.rejected += 1
+                    continue
+                self._entries.move_to_end(candidates[index])
+                self.hits += 1
+                return entry.response
+            return None
+
+    def put(self, template: str, text: str, response, scope: str = ""):
+        if not self.enabled:
+            return
+        namespace = _namespace(template, scope)
+        normalized = normalize(text)
+        key = (namespace, normalized)
+        entry = _Entry(namespace, normalized, response)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            tables = self._tables.setdefault(namespace, [{} for _ in range(LSH_TABLES)])
+            for table, bucket in zip(tables, entry.buckets):
+                table.setdefault(bucket, set()).add(key)
+            self._vocabulary.setdefault(namespace, Counter()).update(entry.words)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        tables = self._tables[entry.namespace]
+        for table, bucket in zip(tables, entry.buckets):
+            members = table[bucket]
+            members.discard(key)
+            if not members:
+                del table[bucket]
+        vocabulary = self._vocabulary[entry.namespace]
+        vocabulary.subtract(entry.words)
+        for word in entry.words:
+            if vocabulary[word] <= 0:
+                del vocabulary[word]
+        if not any(tables):
+            del self._tables[entry.namespace]
+            del self._vocabulary[entry.namespace]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "entries": len(self._entries),
+                "namespaces": len(self._tables),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "exact_hits": self.exact_hits,
+                "rejected_by_distinct_words": self.rejected,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+                "evictions": self.evictions,
+            }
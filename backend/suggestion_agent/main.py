@@ -1,4 +1,5 @@
 import os
+import sys
 import redis
 import json
 import time
@@ -7,6 +8,16 @@ import requests
 from fastapi import FastAPI
 from threading import Thread
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.prompts import PromptBuilder, compact_json, prompt_stats, token_budget
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, routed_models
+from shared.semantic_cache import SemanticCache
+from speculation import Speculator
 
 # --- Load Environment Variables ---
 load_dotenv()
@@ -15,12 +26,25 @@ load_dotenv()
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 AGENT_ID = "suggestion_agent_v1"
-LISTEN_TO_CHANNEL = "domain.fetched"
+# Runs once both the domain profile and the retrieved docs for it are in;
+# the orchestrator publishes the joined pair on the stage's join channel.
+STAGE = load_pipeline().stage("suggestion")
+LISTEN_TO_CHANNEL = STAGE.join_channel
+OUTPUT_CHANNEL = STAGE.outputs[0]
+# Known entities start generating on cached inputs as soon as they are found.
+ENTITY_CHANNEL = STAGE.context[0]
+SPECULATIVE_SUGGESTIONS = os.getenv("SPECULATIVE_SUGGESTIONS", "true").lower() == "true"
+SPECULATION_CACHE_SIZE = int(os.getenv("SPECULATION_CACHE_SIZE", 1000))
+SPECULATION_TTL_SECONDS = float(os.getenv("SPECULATION_TTL_SECONDS", 120))
 # --- OpenRouter API Configuration ---
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-# --- Switched to a more stable, free model on OpenRouter ---
-MODEL_NAME = "google/gemini-flash-1.5" 
+# The model for each call is picked per prompt from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+PROMPT_TOKEN_BUDGET = token_budget(AGENT_ID, 1500)
+# Near-duplicate prompts are answered from a semantic cache (SEMANTIC_CACHE_<AGENT_ID>=false turns it off).
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 1000))
 
 
 # --- FastAPI App Initialization ---
@@ -29,28 +53,40 @@ app = FastAPI(title=AGENT_ID, version="1.0.0")
 # --- Redis Connection & Event Publishing ---
 redis_client = None
 
-def publish_event(channel, data):
+def publish_event(channel, data, trace_id=None):
     if not redis_client: return
     event_envelope = {
         "event_id": str(uuid.uuid4()), "timestamp": time.time(),
-        "agent_id": AGENT_ID, "channel": channel, "payload": data
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    publisher.publish(channel, encode(event_envelope))
     print(f"[{AGENT_ID}] SUCCESS: Published to '{channel}'.")
 
 
-def generate_suggestions(context: str) -> list:
-    """Generates talking points using the OpenRouter LLM API."""
+API_FAILED_SUGGESTIONS = ["Mock suggestion (API failed).", "Check your API key and network.", "Is OpenRouter down?"]
+
+
+def generate_suggestions(context: str, documents: list = (), entity: str = ""):
+    """Generates talking points using the OpenRouter LLM API. Returns None if the call failed."""
     if not OPENROUTER_API_KEY or "sk-or-..." in OPENROUTER_API_KEY:
         print(f"[{AGENT_ID}] CRITICAL: OPENROUTER_API_KEY not set correctly in .env file.")
         return ["Mock suggestion: API Key not configured.", "Please check your .env file."]
 
+    # Scoped to the entity: the same profile wording about another company must not hit.
+    inputs = "\n".join([context] + [compact_json(document) for document in documents])
+    cached = semantic_cache.get("suggestions", inputs, entity)
+    if cached is not None:
+        print(f"[{AGENT_ID}] INFO: Talking points served from the semantic cache.")
+        return cached
+
     try:
-        prompt = f"""
+        prompt = PromptBuilder(AGENT_ID, PROMPT_TOKEN_BUDGET).instruction("""
         You are a helpful sales assistant. Based on the provided context about a company, generate 3 concise, actionable talking points for a sales representative.
         Return ONLY a valid JSON object with a single key "suggestions" which is a list of strings.
-        Company Context: {context}
-        """
+        """).section("Company Context", context, importance=1).section("Internal Documents", list(documents)).build()
         
         headers = {
             "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -58,50 +94,84 @@ def generate_suggestions(context: str) -> list:
             "X-Title": "Live Sales Assistant"
         }
 
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [{"role": "user", "content": prompt}],
-            "response_format": {"type": "json_object"}
-        }
+        with router.route(prompt) as model:
+            payload = {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "response_format": {"type": "json_object"}
+            }
         
-        print(f"[{AGENT_ID}] INFO: Calling OpenRouter API with stable model...")
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
+            print(f"[{AGENT_ID}] INFO: Calling OpenRouter API with {model}...")
+            response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=60)
         
-        # --- ENHANCED ERROR LOGGING ---
-        if response.status_code != 200:
-            print(f"[{AGENT_ID}] ERROR: API returned status {response.status_code}. Response: {response.text}")
-        response.raise_for_status()
+            # --- ENHANCED ERROR LOGGING ---
+            if response.status_code != 200:
+                print(f"[{AGENT_ID}] ERROR: API returned status {response.status_code}. Response: {response.text}")
+            response.raise_for_status()
 
-        response_text = response.json()["choices"][0]["message"]["content"]
-        suggestions_json = json.loads(response_text)
+            response_text = response.json()["choices"][0]["message"]["content"]
+            suggestions_json = json.loads(response_text)
         print(f"[{AGENT_ID}] INFO: Successfully parsed suggestions from OpenRouter LLM.")
-        return suggestions_json.get("suggestions", ["Failed to parse suggestions."])
+        if "suggestions" not in suggestions_json:
+            print(f"[{AGENT_ID}] ERROR: LLM response has no 'suggestions'.")
+            return None
+        semantic_cache.put("suggestions", inputs, suggestions_json["suggestions"], entity)
+        return suggestions_json["suggestions"]
 
     except Exception as e:
         print(f"[{AGENT_ID}] CRITICAL: LLM API call failed: {e}.")
-        return ["Mock suggestion (API failed).", "Check your API key and network.", "Is OpenRouter down?"]
+        return None
 
 
+semantic_cache = SemanticCache(AGENT_ID, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE)
+speculator = Speculator(generate_suggestions, cache_size=SPECULATION_CACHE_SIZE, ttl_seconds=SPECULATION_TTL_SECONDS)
+
 def process_event(message):
     try:
-        data = json.loads(message["data"])
+        data = decode(message["data"])
         if data.get("agent_id") == AGENT_ID: return
-
-        if data.get("channel") == LISTEN_TO_CHANNEL:
-            description = data.get("payload", {}).get("description", "No context.")
-            print(f"[{AGENT_ID}] INFO: Received context. Generating talking points...")
-            suggestions = generate_suggestions(description)
-            publish_event("suggestions.created", {"suggestions": suggestions, "source_event_id": data.get("event_id")})
+        trace_id = data.get("trace_id")
+
+        if data.get("channel") == ENTITY_CHANNEL:
+            payload = data.get("payload", {})
+            # Person entities never get a domain profile, so there is nothing to speculate on.
+            if SPECULATIVE_SUGGESTIONS and trace_id and payload.get("entity_type") != "person":
+                if speculator.on_entity(trace_id, payload.get("entity", "")):
+                    print(f"[{AGENT_ID}] INFO: Speculatively generating talking points for '{payload.get('entity')}'.")
+
+        elif data.get("channel") == LISTEN_TO_CHANNEL:
+            joined = resolve(redis_client, data.get("payload", {}))
+            inputs, event_ids = joined.get("inputs", {}), joined.get("event_ids", {})
+            domain = resolve(redis_client, inputs.get("domain.fetched", {}))
+            description = domain.get("description", "No context.")
+            documents = resolve(redis_client, inputs.get("documents.retrieved", {})).get("retrieved_snippets", [])
+            print(f"[{AGENT_ID}] INFO: Received context and {len(documents)} documents. Generating talking points...")
+            if SPECULATIVE_SUGGESTIONS and trace_id:
+                suggestions, outcome = speculator.resolve(trace_id, domain.get("name", ""), description, documents)
+                if outcome:
+                    print(f"[{AGENT_ID}] INFO: Speculation {outcome} for '{domain.get('name')}'.")
+            else:
+                suggestions = generate_suggestions(description, documents, domain.get("name", ""))
+            if suggestions is None:
+                suggestions = API_FAILED_SUGGESTIONS
+            # Ranking keys its context by the domain.fetched event.
+            publish_event(OUTPUT_CHANNEL, {"suggestions": suggestions, "source_event_id": event_ids.get("domain.fetched")},
+                          trace_id)
     except Exception as e:
         print(f"[{AGENT_ID}] CRITICAL: Error processing event: {e}")
 
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def listen_for_events():
     if not redis_client: return
     pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
-    pubsub.subscribe(LISTEN_TO_CHANNEL)
+    pubsub.subscribe(*STAGE.subscriptions)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
     print(f"[{AGENT_ID}] Subscribed to '{LISTEN_TO_CHANNEL}'.")
     for message in pubsub.listen():
-        process_event(message)
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
@@ -115,7 +185,35 @@ async def startup_event():
     except redis.exceptions.ConnectionError as e:
         print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "agent_id": AGENT_ID}
 
+@app.get("/speculation")
+def speculation_stats():
+    """Speculation hit rate and the latency it saved."""
+    return {"enabled": SPECULATIVE_SUGGESTIONS, **speculator.stats()}
+
+@app.get("/semantic_cache")
+def semantic_cache_stats():
+    return semantic_cache.stats()
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/prompts")
+def prompt_metrics():
+    return prompt_stats(AGENT_ID)
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,165 @@
+"""
+Speculative suggestion generation for the Suggestion Agent.
+
+Suggestions need the domain profile and the retrieved documents, which sit
+behind the domain fetch and the retrieval. For accounts seen before, those
+inputs rarely change, so when `entity.found` arrives and a profile for the
+entity is cached, generation starts straight away on the cached inputs.
+
+When the real inputs arrive, their content hash is compared with the cached
+one: on a match the speculative result is used (waiting for it if it is
+still running). Otherwise, or if the speculative call failed, the
+suggestions are regenerated from the real inputs. A speculation that has not
+started yet is cancelled; one already running cannot be aborted, so its
+result is ignored and counted as wasted. Either way the cache is refreshed.
+
+Latency saved on a hit is how much sooner the result is ready than if
+generation had started when the real inputs arrived. The models a
+speculation routed to are recorded on the event that uses it.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from shared.routing import carry, routed_models
+
+
+def entity_key(entity: str) -> str:
+    return " ".join((entity or "").lower().split())
+
+
+def content_hash(description: str, documents: list) -> str:
+    body = json.dumps([description, list(documents)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class _Speculation:
+    __slots__ = ("future", "hash", "started", "finished", "models")
+
+    def __init__(self, digest):
+        self.future = None
+        self.hash = digest
+        self.started = time.monotonic()
+        self.finished = None
+        self.models = []
+
+
+class Speculator:
+    """
+    Runs `generate(description, documents, entity)` early on cached inputs
+    and reconciles it with the real inputs. `generate` must not raise; it
+    returns None when it failed.
+    """
+
+    def __init__(self, generate, max_workers: int = 4, cache_size: int = 1000,
+                 ttl_seconds: float = 120.0):
+        self.generate = generate
+        self.cache_size = cache_size
+        self.ttl_seconds = ttl_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._profiles = OrderedDict()
+        self._pending = OrderedDict()
+        self._lock = Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0
+        self.expired = 0
+        self.wasted = 0
+        self.saved_ms = 0.0
+
+    def on_entity(self, trace_id: str, entity: str) -> bool:
+        """Starts generating for a known entity. Returns True if a speculation started."""
+        key = (trace_id, entity_key(entity))
+        with self._lock:
+            self._expire()
+            profile = self._profiles.get(key[1])
+            if profile is None or key in self._pending:
+                return False
+            self._profiles.move_to_end(key[1])
+            speculation = _Speculation(profile["hash"])
+
+            def run():
+                try:
+                    return self.generate(profile["description"], profile["documents"], entity)
+                finally:
+                    speculation.finished = time.monotonic()
+
+            speculation.future = self._pool.submit(carry(run, speculation.models))
+            self._pending[key] = speculation
+            self.started += 1
+        return True
+
+    def resolve(self, trace_id: str, entity: str, description: str, documents: list):
+        """
+        Suggestions for the real inputs, reusing the speculation when they
+        match what it ran on. Returns (suggestions, outcome), where outcome
+        is "hit", "miss", "failed" (the speculation failed and the
+        suggestions were regenerated) or None when nothing was speculated.
+        Suggestions are None if generation failed.
+        """
+        key = (trace_id, entity_key(entity))
+        digest = content_hash(description, documents)
+        arrived = time.monotonic()
+        with self._lock:
+            speculation = self._pending.pop(key, None)
+            self._profiles[key[1]] = {"description": description, "documents": list(documents), "hash": digest}
+            self._profiles.move_to_end(key[1])
+            while len(self._profiles) > self.cache_size:
+                self._profiles.popitem(last=False)
+
+        if speculation and speculation.hash == digest:
+            suggestions = speculation.future.result()
+            if suggestions is not None:
+                ready = time.monotonic()
+                routed_models().extend(speculation.models)
+                # Without speculation, generation would have started on arrival.
+                saved = max(arrived + (speculation.finished - speculation.started) - ready, 0.0)
+                with self._lock:
+                    self.hits += 1
+                    self.saved_ms += saved * 1000
+                return suggestions, "hit"
+            with self._lock:
+                self.failed += 1
+                self.wasted += 1
+            return self.generate(description, documents, entity), "failed"
+
+        if speculation:
+            cancelled = speculation.future.cancel()
+            with self._lock:
+                self.misses += 1
+                self.wasted += not cancelled
+        return self.generate(description, documents, entity), "miss" if speculation else None
+
+    def _expire(self):
+        """Drops speculations whose real inputs never arrived."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._pending:
+            key, speculation = next(iter(self._pending.items()))
+            if speculation.started >= cutoff:
+                break
+            self._pending.popitem(last=False)
+            self.expired += 1
+            self.wasted += not speculation.future.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            resolved = self.hits + self.misses + self.failed
+            return {
+                "cached_profiles": len(self._profiles),
+                "pending": len(self._pending),
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "failed": self.failed,
+                "expired": self.expired,
+                # Speculative calls that ran but whose result was not used
+                "wasted": self.wasted,
+                "hit_rate": round(self.hits / resolved, 4) if resolved else None,
+                "latency_saved_ms": round(self.saved_ms, 1),
+                "avg_latency_saved_ms": round(self.saved_ms / self.hits, 1) if self.hits else None,
+            }
@@ -0,0 +1,99 @@
+"""
+Hierarchical (map-reduce) summarization for the Summarizer Agent.
+
+Long inputs are split into chunks on line boundaries. Chunks are summarized
+concurrently (at most `max_concurrency` LLM calls at once), then the partial
+summaries are reduced in a tree: groups of `fan_in` are summarized together,
+level by level, until one summary is left.
+
+Every map and reduce result is cached by the SHA-256 of its input. Chunking
+is greedy from the start of the text, so when a transcript grows only its
+last chunk and the new ones are new; everything before them, and the reduce
+nodes built only from them, come from the cache.
+"""
+
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from shared.routing import carry
+
+MAP, REDUCE = "map", "reduce"
+
+
+def chunk_text(text: str, max_chars: int) -> list:
+    """Splits text into chunks of at most max_chars, breaking at newlines where possible."""
+    chunks, current, size = [], [], 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            # A single over-long line: break it at the last space that fits.
+            cut = line.rfind(" ", 0, max_chars - size) + 1 if size < max_chars else 0
+            if cut <= 0 and current:
+                chunks.append("".join(current))
+                current, size = [], 0
+                continue
+            cut = cut or max_chars
+            current.append(line[:cut])
+            chunks.append("".join(current))
+            current, size, line = [], 0, line[cut:]
+        if size + len(line) > max_chars and current:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+class HierarchicalSummarizer:
+    """
+    Map-reduce summarization over `summarize(text, stage)`, which must return
+    the summary or raise; failures are never cached.
+    """
+
+    def __init__(self, summarize, chunk_chars: int = 6000, fan_in: int = 4,
+                 max_concurrency: int = 4, cache_size: int = 4096):
+        self.summarize_fn = summarize
+        self.chunk_chars = chunk_chars
+        self.fan_in = max(fan_in, 2)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = Lock()
+        self.llm_calls = 0
+        self.cache_hits = 0
+
+    def summarize(self, text: str) -> str:
+        chunks = chunk_text(text, self.chunk_chars)
+        if not chunks:
+            return ""
+        if len(chunks) == 1:
+            return self._cached(chunks[0], MAP)
+        level = list(self._pool.map(carry(lambda chunk: self._cached(chunk, MAP)), chunks))
+        while len(level) > 1:
+            groups = ["\n\n".join(level[i:i + self.fan_in]) for i in range(0, len(level), self.fan_in)]
+            level = list(self._pool.map(carry(lambda group: self._cached(group, REDUCE)), groups))
+        return level[0]
+
+    def _cached(self, text, stage):
+        key = hashlib.sha256(f"{stage}\x00{text}".encode("utf-8")).hexdigest()
+        with self._lock:
+            summary = self._cache.get(key)
+            if summary is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return summary
+            self.llm_calls += 1
+        summary = self.summarize_fn(text, stage)
+        with self._lock:
+            self._cache[key] = summary
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return summary
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached_summaries": len(self._cache), "llm_calls": self.llm_calls,
+                    "cache_hits": self.cache_hits}
@@ -1,19 +1,46 @@
 import os
+import sys
 import redis
 import threading
-import json
+import time
+import uuid
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from openai import OpenAI
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.lanes import LaneDispatcher, current_priority
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.claimcheck import check_in, resolve
+from shared.pipeline import load_pipeline
+from shared.routing import ModelRouter, routed_models
+from hierarchy import MAP, REDUCE, HierarchicalSummarizer
+from rolling import RollingSummaries
 
 # Load environment variables from .env file
 load_dotenv()
 
 # --- Configuration ---
+AGENT_ID = "summarizer_agent_v1"
+STAGE = load_pipeline().stage("summarizer")
+# Retrieved documents are summarized in one go; live transcript text is rolled up.
+DOCUMENTS_CHANNEL, TRANSCRIPT_CHANNEL = STAGE.inputs
+OUTPUT_CHANNEL = STAGE.outputs[0]
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
+# The model for each call is picked per prompt from backend/model_routing.json
+router = ModelRouter(AGENT_ID)
+# Inputs longer than one chunk are summarized hierarchically (map-reduce).
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", 6000))
+SUMMARY_FAN_IN = int(os.getenv("SUMMARY_FAN_IN", 4))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", 4))
+# Live calls: transcript text is folded into a per-trace rolling summary block by block.
+ROLLING_BLOCK_CHARS = int(os.getenv("ROLLING_BLOCK_CHARS", 2000))
+ROLLING_SUMMARY_MAX_CHARS = int(os.getenv("ROLLING_SUMMARY_MAX_CHARS", 1500))
+ROLLING_FINAL_RETRIES = int(os.getenv("ROLLING_FINAL_RETRIES", 2))
+STREAM_TRACE_TTL_SECONDS = float(os.getenv("STREAM_TRACE_TTL_SECONDS", 900))
 
 # --- FastAPI App ---
 app = FastAPI()
@@ -37,30 +64,135 @@ else:
     )
     print("✅ Summarizer Agent: OpenAI client for OpenRouter configured.")
 
-def generate_summary(context: str) -> str:
-    """Calls the LLM to generate a summary from the given context."""
-    if not llm_client:
-        print("❌ LLM client not configured. Cannot generate summary.")
-        return "Summary could not be generated due to configuration error."
+SYSTEM_PROMPTS = {
+    MAP: "You are a helpful assistant. Summarize this part of a longer sales context in a few sentences. Keep names, numbers and commitments.",
+    REDUCE: "You are a helpful assistant. Combine these partial summaries into one concise paragraph for a sales executive.",
+    "single": "You are a helpful assistant. Summarize the following context in one concise paragraph for a sales executive.",
+}
 
-    print("🧠 Generating summary from context...")
-    try:
+def summarize_with_llm(context: str, stage: str = "single") -> str:
+    """One LLM summarization call; raises on failure so the result is never cached."""
+    with router.route(f"{SYSTEM_PROMPTS[stage]}\n{context}") as model:
         response = llm_client.chat.completions.create(
-            model="nousresearch/nous-hermes-2-mixtral-8x7b-dpo",
+            model=model,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant. Summarize the following context in one concise paragraph for a sales executive."},
+                {"role": "system", "content": SYSTEM_PROMPTS[stage]},
                 {"role": "user", "content": context}
             ],
             temperature=0.5,
-            max_tokens=200
+            max_tokens=200 if stage == MAP else 300
         )
-        summary = response.choices[0].message.content.strip()
+    return response.choices[0].message.content.strip()
+
+hierarchical = HierarchicalSummarizer(
+    summarize_with_llm, chunk_chars=SUMMARY_CHUNK_CHARS, fan_in=SUMMARY_FAN_IN,
+    max_concurrency=SUMMARY_MAX_CONCURRENCY,
+)
+
+def fold_into_summary(summary: str, new_text: str) -> str:
+    """Updates a running call summary with one new block of transcript; raises on failure."""
+    system = (
+        "You maintain the running summary of a live sales call. Update it with the new "
+        "transcript excerpt, keeping earlier points unless contradicted. Stay under "
+        f"{ROLLING_SUMMARY_MAX_CHARS // 6} words. Return only the updated summary."
+    )
+    user = f"Current summary:\n{summary or '(none yet)'}\n\nNew transcript excerpt:\n{new_text}"
+    with router.route(f"{system}\n{user}") as model:
+        response = llm_client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.3,
+            max_tokens=ROLLING_SUMMARY_MAX_CHARS // 3
+        )
+    return response.choices[0].message.content
+
+rolling = RollingSummaries(
+    fold_into_summary, block_chars=ROLLING_BLOCK_CHARS,
+    max_summary_chars=ROLLING_SUMMARY_MAX_CHARS, ttl_seconds=STREAM_TRACE_TTL_SECONDS,
+)
+
+def generate_summary(context: str) -> str:
+    """Calls the LLM to generate a summary from the given context."""
+    if not llm_client:
+        print("❌ LLM client not configured. Cannot generate summary.")
+        return "Summary could not be generated due to configuration error."
+
+    try:
+        if len(context) <= SUMMARY_CHUNK_CHARS:
+            print("🧠 Generating summary from context...")
+            summary = summarize_with_llm(context)
+        else:
+            print(f"🧠 Generating hierarchical summary from {len(context)} characters of context...")
+            summary = hierarchical.summarize(context)
         print("👍 Summary generated successfully.")
         return summary
     except Exception as e:
         print(f"❌ Error during summary generation API call: {e}")
         return "Summary could not be generated due to an API error."
 
+def update_rolling_summary(envelope: dict):
+    """Folds streamed transcript text into the trace's rolling summary and publishes each new version."""
+    payload = resolve(redis_client, envelope.get("payload")) or {}
+    trace_id = envelope.get("trace_id")
+    if not payload.get("stream") or not trace_id:
+        return
+    if not llm_client:
+        return
+    final = bool(payload.get("final"))
+    # Nothing follows a final utterance, so its folds are retried here; the text stays buffered meanwhile.
+    attempts = 1 + (ROLLING_FINAL_RETRIES if final else 0)
+    for attempt in range(attempts):
+        try:
+            update = rolling.add(trace_id, "" if attempt else payload.get("text") or "", final=final)
+            break
+        except Exception as e:
+            print(f"❌ Rolling summary update failed for trace {trace_id} (attempt {attempt + 1}/{attempts}): {e}")
+            if attempt + 1 < attempts:
+                time.sleep(attempt + 1)
+    else:
+        return
+    if update:
+        publish_event(OUTPUT_CHANNEL, update, trace_id)
+        print(f"📣 Published rolling summary v{update['version']} for trace {trace_id}.")
+
+def publish_event(channel, data, trace_id=None):
+    """Publishes a summary wrapped in the standard event envelope."""
+    if not redis_client: return
+    event_envelope = {
+        "event_id": str(uuid.uuid4()), "timestamp": time.time(),
+        "agent_id": AGENT_ID, "channel": channel, "payload": check_in(redis_client, data),
+        "trace_id": trace_id,
+        "priority": current_priority(),
+        "models": routed_models()
+    }
+    publisher.publish(channel, encode(event_envelope))
+
+def process_event(message):
+    """Summarizes the snippets carried by a 'documents.retrieved' event."""
+    if message["type"] == "message":
+        data = decode(message["data"])
+        if message["channel"] == TRANSCRIPT_CHANNEL:
+            update_rolling_summary(data)
+            return
+        snippets = resolve(redis_client, data.get("payload", {})).get("retrieved_snippets")
+        
+        if snippets and isinstance(snippets, list):
+            print("📩 Received retrieved snippets. Starting summarization.")
+            context_to_summarize = "\n".join(snippets)
+            
+            summary_text = generate_summary(context_to_summarize)
+            
+            publish_event(OUTPUT_CHANNEL, {"summary": summary_text}, data.get("trace_id"))
+            print(f"📣 Published '{OUTPUT_CHANNEL}' event with summary.")
+        else:
+            print(f"⚠️ Received '{DOCUMENTS_CHANNEL}' event but no snippets found.")
+
+lanes = LaneDispatcher(AGENT_ID, process_event)
+publisher = Publisher(AGENT_ID)
+
 def summarizer_task():
     """A background task that listens for retrieved data and creates a summary."""
     if not redis_client:
@@ -68,30 +200,36 @@ def summarizer_task():
 
     pubsub = redis_client.pubsub()
     # This agent should listen for when the retriever has finished its job
-    pubsub.subscribe("retriever.completed")
-    print("👂 Summarizer listening for 'retriever.completed' event...")
+    pubsub.subscribe(*STAGE.subscriptions)
+    lanes.start(redis_client)
+    publisher.start(redis_client)
+    print(f"👂 Summarizer listening for '{DOCUMENTS_CHANNEL}' and '{TRANSCRIPT_CHANNEL}' events...")
 
     for message in pubsub.listen():
-        if message["type"] == "message":
-            data = json.loads(message["data"])
-            snippets = data.get("retrieved_snippets")
-            
-            if snippets and isinstance(snippets, list):
-                print("📩 Received retrieved snippets. Starting summarization.")
-                context_to_summarize = "\n".join(snippets)
-                
-                summary_text = generate_summary(context_to_summarize)
-                
-                # THIS IS THE CRITICAL PART: Create the correct payload
-                payload = {"summary": summary_text}
-                
-                redis_client.publish("summary.created", json.dumps(payload))
-                print("📣 Published 'summary.created' event with summary.")
-            else:
-                print("⚠️ Received 'retriever.completed' message but no snippets found.")
+        lanes.submit(message)
 
 @app.on_event("startup")
 async def startup_event():
     print("🚀 Summarizer Agent starting up...")
     thread = threading.Thread(target=summarizer_task, daemon=True)
-    thread.start()
\ No newline at end of file
+    thread.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    publisher.close()
+
+@app.get("/summaries/stats")
+def summary_stats():
+    return {"hierarchical": hierarchical.stats(), "rolling": rolling.stats()}
+
+@app.get("/routing")
+def routing_stats():
+    return router.stats()
+
+@app.get("/lanes")
+def lane_metrics():
+    return lanes.stats()
+
+@app.get("/publisher")
+def publisher_metrics():
+    return publisher.stats()
@@ -0,0 +1,140 @@
+"""
+Rolling per-trace summaries for the Summarizer Agent.
+
+During a live call, transcript text is buffered per trace. Once a block of
+`block_chars` has built up (or the call ends) it is folded into the trace's
+running summary with one LLM call whose prompt holds only the current
+summary and the new block, both size-bounded, so each update costs the same
+however long the call has been running.
+
+Every update returned bumps the trace's version and reports which summary
+sentences were added or removed since the previous one, so consumers can
+update incrementally instead of reprocessing the full text. Blocks folded
+before a failed fold are kept but reported with the next update.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from shared.expiry import evict_idle
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text: str) -> list:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def bound_summary(summary: str, max_chars: int) -> str:
+    """Trims a summary to max_chars, cutting at a sentence boundary where possible."""
+    if len(summary) <= max_chars:
+        return summary
+    cut = summary[:max_chars]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    return cut[:end + 1] if end > 0 else cut
+
+
+class _TraceSummary:
+    __slots__ = ("summary", "published", "version", "pending", "last_seen")
+
+    def __init__(self, now):
+        self.summary = ""
+        self.published = ""
+        self.version = 0
+        self.pending = []
+        self.last_seen = now
+
+
+class RollingSummaries:
+    """
+    Per-trace rolling summaries over `fold(summary, new_text)`, which returns
+    the updated summary or raises.
+    """
+
+    def __init__(self, fold, block_chars: int = 2000, max_summary_chars: int = 1500,
+                 ttl_seconds: float = 900.0, max_traces: int = 10000):
+        self.fold = fold
+        self.block_chars = block_chars
+        self.max_summary_chars = max_summary_chars
+        self.ttl_seconds = ttl_seconds
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = Lock()
+        self.folds = 0
+        self.failed_folds = 0
+
+    def add(self, trace_id: str, text: str, final: bool = False):
+        """
+        Buffers new text for a trace. Returns an update dict when at least one
+        block was folded into the summary, else None. `final` folds whatever
+        is left and drops the trace's state once every block has folded; if a
+        fold fails the unfolded text stays buffered, final or not, and the
+        next add for the trace retries it.
+        """
+        now = time.time()
+        with self._lock:
+            evict_idle(self._traces, now, self.ttl_seconds, self.max_traces)
+            state = self._traces.pop(trace_id, None) or _TraceSummary(now)
+            state.last_seen = now
+            if text:
+                state.pending.append(text)
+            self._traces[trace_id] = state
+            blocks = self._take_blocks(state, final)
+            if not blocks:
+                if final:
+                    del self._traces[trace_id]
+                return None
+            summary = state.summary
+
+        # Each block is one bounded fold; an oversized utterance just takes several.
+        for i, block in enumerate(blocks):
+            try:
+                summary = bound_summary(self.fold(summary, block).strip(), self.max_summary_chars)
+            except Exception:
+                with self._lock:
+                    self.failed_folds += 1
+                    # Unfolded text goes back in front, to be retried with the next utterance.
+                    state.pending[:0] = blocks[i:]
+                raise
+            with self._lock:
+                state.summary = summary
+                self.folds += 1
+        with self._lock:
+            previous, state.published = state.published, summary
+            state.version += 1
+            version = state.version
+            if final and self._traces.get(trace_id) is state:
+                del self._traces[trace_id]
+
+        old, new = split_sentences(previous), split_sentences(summary)
+        old_set, new_set = set(old), set(new)
+        return {
+            "summary": summary,
+            "version": version,
+            "delta": {
+                "added": [sentence for sentence in new if sentence not in old_set],
+                "removed": [sentence for sentence in old if sentence not in new_set],
+            },
+            "final": final,
+        }
+
+    def _take_blocks(self, state, final):
+        """Pops whole blocks off the trace's buffer (everything, if final)."""
+        buffered = "\n".join(state.pending)
+        blocks = []
+        while len(buffered) >= self.block_chars:
+            cut = buffered.rfind(" ", 0, self.block_chars) + 1 or self.block_chars
+            blocks.append(buffered[:cut])
+            buffered = buffered[cut:]
+        if final and buffered.strip():
+            blocks.append(buffered)
+            buffered = ""
+        state.pending = [buffered] if buffered else []
+        return blocks
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active_traces": len(self._traces), "folds": self.folds,
+                    "failed_folds": self.failed_folds}
@@ -0,0 +1,142 @@
+"""
+Admission control for bulk pipeline triggers.
+
+Batch jobs (e.g. nightly pre-call prep) must not flood every agent at once.
+All batch traffic goes through one shared controller that admits traces at a
+steady rate (token bucket) and caps how many are in flight. A trace leaves the
+in-flight set when a completion event for it arrives, or when it times out.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+
+class AdmissionController:
+    """A token bucket plus an in-flight cap, shared by every batch job. A rate of 0 means no rate limit."""
+
+    def __init__(self, rate_per_second: float = 20.0, max_in_flight: int = 50,
+                 in_flight_timeout: float = 120.0):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        self.rate_per_second = rate_per_second
+        self.max_in_flight = max_in_flight
+        self.in_flight_timeout = in_flight_timeout
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        # trace_id -> (job, admitted_at)
+        self._in_flight = OrderedDict()
+        self._changed = asyncio.Event()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            max(self.rate_per_second, 1.0),
+            self._tokens + (now - self._last_refill) * self.rate_per_second,
+        )
+        self._last_refill = now
+
+    def _expire(self):
+        """Frees slots held by traces that never reported completion."""
+        cutoff = time.monotonic() - self.in_flight_timeout
+        while self._in_flight:
+            trace_id, (job, admitted_at) = next(iter(self._in_flight.items()))
+            if admitted_at > cutoff:
+                break
+            self._in_flight.popitem(last=False)
+            job.timed_out += 1
+
+    async def admit(self, job, trace_id: str):
+        """Waits until the trace may enter the pipeline, then marks it in flight."""
+        while True:
+            self._expire()
+            rate_limited = self.rate_per_second > 0
+            if rate_limited:
+                self._refill()
+            if len(self._in_flight) < self.max_in_flight and (not rate_limited or self._tokens >= 1.0):
+                if rate_limited:
+                    self._tokens -= 1.0
+                self._in_flight[trace_id] = (job, time.monotonic())
+                return
+            if len(self._in_flight) >= self.max_in_flight:
+                # Wake up on a completion, or in time to expire the oldest slot.
+                self._changed.clear()
+                oldest = next(iter(self._in_flight.values()))[1]
+                wait = max(oldest + self.in_flight_timeout - time.monotonic(), 0.01)
+                try:
+                    await asyncio.wait_for(self._changed.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate_per_second)
+
+    def complete(self, trace_id: str):
+        """Marks a trace finished, freeing its in-flight slot."""
+        entry = self._in_flight.pop(trace_id, None)
+        if entry:
+            entry[0].completed += 1
+            self._changed.set()
+
+    def stats(self) -> dict:
+        self._expire()
+        return {
+            "rate_per_second": self.rate_per_second,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": len(self._in_flight),
+        }
+
+
+class BatchJob:
+    """Progress of one bulk trigger request."""
+
+    def __init__(self, entities: list):
+        self.job_id = str(uuid.uuid4())
+        self.entities = entities
+        self.trace_ids = {}
+        self.created_at = time.time()
+        self.admitted = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.cancelled = False
+        self.task = None
+
+    def cancel(self):
+        """Stops admitting the job's entities; traces already admitted run to completion."""
+        self.cancelled = True
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def status(self) -> str:
+        if self.cancelled:
+            return "cancelled"
+        if self.admitted < len(self.entities):
+            return "admitting"
+        if self.completed + self.timed_out < len(self.entities):
+            return "running"
+        return "done"
+
+    def to_dict(self) -> dict:
+        total = len(self.entities)
+        return {
+            "job_id": self.job_id,
+            "status": self.status(),
+            "total": total,
+            "queued": total - self.admitted,
+            "admitted": self.admitted,
+            "in_flight": self.admitted - self.completed - self.timed_out,
+            "completed": self.completed,
+            "timed_out": self.timed_out,
+        }
+
+
+async def run_batch_job(job: BatchJob, controller: AdmissionController, publish):
+    """Admits a job's entities one by one through the shared controller."""
+    for entity in job.entities:
+        if job.cancelled:
+            return
+        trace_id = str(uuid.uuid4())
+        await controller.admit(job, trace_id)
+        job.trace_ids[trace_id] = entity
+        publish(entity, trace_id)
+        job.admitted += 1
@@ -0,0 +1,113 @@
+"""
+Transcript ingestion for the UI Agent.
+
+ASR services push utterances for many concurrent calls. Every utterance is
+wrapped in an event envelope and put on a bounded queue; a single flusher task
+drains the queue in batches and publishes each batch to `transcript.new` with
+one pipelined Redis round trip. When Redis falls behind the queue fills up and
+`submit` blocks, which slows the HTTP body / WebSocket reads feeding it.
+"""
+
+import asyncio
+import time
+
+from shared.envelope import encode
+
+TRANSCRIPT_CHANNEL = "transcript.new"
+
+
+def parse_utterances(data) -> list:
+    """Normalizes one ingest message (a single utterance or a list) into dicts."""
+    items = data if isinstance(data, list) else [data]
+    utterances = []
+    for item in items:
+        if not isinstance(item, dict) or not item.get("trace_id"):
+            raise ValueError("Each utterance needs a 'trace_id'.")
+        text = item.get("text", "")
+        if not isinstance(text, str):
+            raise ValueError("'text' must be a string.")
+        utterances.append(item)
+    return utterances
+
+
+class TranscriptIngestor:
+    """Queues transcript chunks and publishes them in pipelined batches."""
+
+    def __init__(self, agent_id, redis_client, make_envelope, max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 0.005):
+        self.agent_id = agent_id
+        self.redis_client = redis_client
+        self.make_envelope = make_envelope
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self.published = 0
+        self.batches = 0
+        self.errors = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Publishes whatever is still queued, then stops the flusher."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+    async def submit(self, utterance: dict):
+        """Queues one utterance, waiting while the queue is full (backpressure)."""
+        payload = {
+            "text": utterance.get("text", ""),
+            "stream": True,
+            "final": bool(utterance.get("final", False)),
+        }
+        if "speaker" in utterance:
+            payload["speaker"] = utterance["speaker"]
+        envelope = self.make_envelope(TRANSCRIPT_CHANNEL, payload, utterance["trace_id"])
+        await self._queue.put(encode(envelope))
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            try:
+                await asyncio.to_thread(self._publish_batch, batch)
+                self.published += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"[{self.agent_id}] ERROR: Failed to publish batch of {len(batch)}: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def _publish_batch(self, batch):
+        pipe = self.redis_client.pipeline(transaction=False)
+        for message in batch:
+            pipe.publish(TRANSCRIPT_CHANNEL, message)
+        pipe.execute()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "published": self.published,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
@@ -1,18 +1,45 @@
 import os
+import sys
 import redis
 import json
 import asyncio
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 import time
 import uuid
 from fastapi.middleware.cors import CORSMiddleware
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ingest import TranscriptIngestor, parse_utterances
+from admission import AdmissionController, BatchJob, run_batch_job
+from state import TraceStateStore
+from collections import OrderedDict
+from threading import Thread
+from typing import List, Optional
+from shared.lanes import PRIORITY_BATCH, PRIORITY_LIVE
+from shared.claimcheck import KEY_PREFIX, check_in
+from shared.envelope import decode, encode
+from shared.publisher import Publisher
+from shared.pipeline import JOIN_CHANNEL_PREFIX
+from shared.precomputed import MEETING_OPENED_CHANNEL, read_precomputed
 
 # --- Configuration ---
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 AGENT_ID = "ui_agent_v1"
+# Transcript ingestion: queue bound (backpressure) and Redis pipeline batching
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 10000))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 500))
+INGEST_FLUSH_MS = float(os.getenv("INGEST_FLUSH_MS", 5))
+# Bulk triggers: shared admission rate / in-flight cap, and the events that end a trace
+BATCH_RATE_PER_SECOND = float(os.getenv("BATCH_RATE_PER_SECOND", 20))
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", 50))
+BATCH_IN_FLIGHT_TIMEOUT = float(os.getenv("BATCH_IN_FLIGHT_TIMEOUT", 120))
+BATCH_DONE_CHANNELS = os.getenv("BATCH_DONE_CHANNELS", "followup.plan_generated").split(",")
+MAX_TRACKED_JOBS = 100
+# Materialized per-trace state served by GET /traces/{trace_id}/state
+TRACE_STATE_TTL_SECONDS = float(os.getenv("TRACE_STATE_TTL_SECONDS", 900))
+TRACE_STATE_MAX_TRACES = int(os.getenv("TRACE_STATE_MAX_TRACES", 10000))
 
 # --- FastAPI App Initialization ---
 app = FastAPI(title="UI Agent Service (SSE)", version="2.0.0")
@@ -29,32 +56,101 @@ app.add_middleware(
 
 # --- Redis Connection & Event Publishing ---
 redis_client = None
+publisher = Publisher(AGENT_ID)
+ingestor = None
+admission = None
+batch_jobs = OrderedDict()
+batch_tasks = set() # The event loop only keeps weak references to tasks
+trace_state = TraceStateStore(TRACE_STATE_TTL_SECONDS, TRACE_STATE_MAX_TRACES)
 
-def publish_event(channel, data):
-    if not redis_client:
-        print(f"[{AGENT_ID}] ERROR: Cannot publish event, Redis is not connected.")
-        return
-    event_envelope = {
+def make_envelope(channel, data, trace_id=None, priority=PRIORITY_LIVE):
+    envelope = {
         "event_id": str(uuid.uuid4()),
         "timestamp": time.time(),
         "agent_id": AGENT_ID,
         "channel": channel,
-        "payload": data
+        "payload": check_in(redis_client, data),
+        "priority": priority
     }
-    redis_client.publish(channel, json.dumps(event_envelope))
+    if trace_id:
+        envelope["trace_id"] = trace_id
+    return envelope
+
+def publish_event(channel, data, trace_id=None, priority=PRIORITY_LIVE):
+    if not redis_client:
+        print(f"[{AGENT_ID}] ERROR: Cannot publish event, Redis is not connected.")
+        return
+    publisher.publish(channel, encode(make_envelope(channel, data, trace_id, priority)))
     print(f"[{AGENT_ID}] Published to '{channel}': {data}")
 
+async def listen_for_completions():
+    """Frees batch admission slots as traces reach their final stage."""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(*BATCH_DONE_CHANNELS)
+    while True:
+        message = pubsub.get_message()
+        if not message:
+            await asyncio.sleep(0.01)
+            continue
+        try:
+            trace_id = decode(message["data"]).trace_id
+            if trace_id:
+                admission.complete(trace_id)
+        except Exception as e:
+            print(f"[{AGENT_ID}] ERROR: Bad completion event: {e}")
+
+def fold_trace_state():
+    """Folds every traced envelope on every channel into the trace state store."""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.psubscribe("*")
+    print(f"[{AGENT_ID}] Folding all channels into per-trace state.")
+    for message in pubsub.listen():
+        # Joined inputs repeat events the store has already folded
+        if message["channel"].startswith(JOIN_CHANNEL_PREFIX):
+            continue
+        try:
+            envelope = decode(message["data"])
+        except ValueError:
+            continue # Not a JSON envelope
+        try:
+            envelope.setdefault("channel", message["channel"])
+            trace_state.fold(envelope)
+        except Exception as e:
+            print(f"[{AGENT_ID}] ERROR: Could not fold event on '{message['channel']}': {e}")
+
 @app.on_event("startup")
 async def startup_event():
-    global redis_client
+    global redis_client, ingestor, admission
     try:
         redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
         redis_client.ping()
         print(f"[{AGENT_ID}] Successfully connected to Redis.")
+        publisher.start(redis_client)
+        ingestor = TranscriptIngestor(
+            AGENT_ID, redis_client, make_envelope, max_queue=INGEST_QUEUE_SIZE,
+            batch_size=INGEST_BATCH_SIZE, flush_interval=INGEST_FLUSH_MS / 1000
+        )
+        ingestor.start()
+        admission = AdmissionController(BATCH_RATE_PER_SECOND, BATCH_MAX_IN_FLIGHT, BATCH_IN_FLIGHT_TIMEOUT)
+        asyncio.create_task(listen_for_completions())
+        Thread(target=fold_trace_state, daemon=True).start()
     except redis.exceptions.ConnectionError as e:
         print(f"[{AGENT_ID}] CRITICAL: Could not connect to Redis. {e}")
         redis_client = None
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if ingestor:
+        await ingestor.stop()
+    publisher.close()
+
+def browser_json(raw):
+    """An event as the plain JSON object browsers parse; the payload is passed through undecoded."""
+    try:
+        return decode(raw).to_json()
+    except ValueError:
+        return raw # Not an envelope; relay it as published
+
 # --- SSE Streaming Endpoint ---
 @app.get("/stream")
 async def stream_events(request: Request):
@@ -79,7 +175,7 @@ async def stream_events(request: Request):
             message = pubsub.get_message()
             if message:
                 print(f"[{AGENT_ID}] Relaying event: {message['data']}")
-                yield f"data: {message['data']}\n\n"
+                yield f"data: {browser_json(message['data'])}\n\n"
             
             await asyncio.sleep(0.01) # Non-blocking sleep
 
@@ -93,8 +189,163 @@ class TriggerPayload(BaseModel):
 @app.post("/trigger")
 async def trigger_workflow(payload: TriggerPayload):
     print(f"[{AGENT_ID}] Received trigger with text: '{payload.text}'")
-    publish_event("entity.found", {"entity": payload.text})
-    return {"status": "workflow triggered", "entity": payload.text}
+    trace_id = str(uuid.uuid4())
+    publish_event("entity.found", {"entity": payload.text}, trace_id)
+    return {"status": "workflow triggered", "entity": payload.text, "trace_id": trace_id}
+
+# --- Transcript Ingestion Endpoints ---
+# Utterances look like {"trace_id": "...", "text": "...", "final": false}.
+@app.post("/ingest")
+async def ingest_transcript(request: Request):
+    """Accepts newline-delimited JSON utterances, streamed as the body arrives."""
+    if not ingestor:
+        raise HTTPException(status_code=503, detail="Redis not connected")
+    accepted = 0
+    buffer = b""
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    for utterance in parse_utterances(json.loads(line)):
+                        await ingestor.submit(utterance)
+                        accepted += 1
+        if buffer.strip():
+            for utterance in parse_utterances(json.loads(buffer)):
+                await ingestor.submit(utterance)
+                accepted += 1
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Rejected after {accepted} utterances: {e}")
+    return {"status": "accepted", "accepted": accepted}
+
+@app.websocket("/ws/ingest")
+async def ingest_transcript_ws(websocket: WebSocket):
+    """Accepts one utterance or a list of utterances per WebSocket message."""
+    await websocket.accept()
+    if not ingestor:
+        await websocket.close(code=1011, reason="Redis not connected")
+        return
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                utterances = parse_utterances(json.loads(message))
+            except ValueError as e:
+                await websocket.send_json({"status": "rejected", "error": str(e)})
+                continue
+            for utterance in utterances:
+                await ingestor.submit(utterance)
+            await websocket.send_json({"status": "accepted", "accepted": len(utterances)})
+    except WebSocketDisconnect:
+        print(f"[{AGENT_ID}] Ingest client disconnected.")
+
+@app.get("/ingest/stats")
+def ingest_stats():
+    return ingestor.stats() if ingestor else {"error": "Redis not connected"}
+
+@app.get("/publisher/stats")
+def publisher_stats():
+    return publisher.stats()
+
+# --- Bulk Trigger Endpoints ---
+class BatchTriggerPayload(BaseModel):
+    entities: List[str]
+
+@app.post("/trigger/batch")
+async def trigger_batch(payload: BatchTriggerPayload):
+    """Queues many entities and admits them into the pipeline at a controlled pace."""
+    if not admission:
+        raise HTTPException(status_code=503, detail="Redis not connected")
+    # Make room by forgetting the oldest finished jobs; running ones stay cancellable
+    finished = [job_id for job_id, job in batch_jobs.items() if job.status() in ("done", "cancelled")]
+    for job_id in finished[:max(len(batch_jobs) - MAX_TRACKED_JOBS + 1, 0)]:
+        del batch_jobs[job_id]
+    if len(batch_jobs) >= MAX_TRACKED_JOBS:
+        raise HTTPException(status_code=429, detail=f"{MAX_TRACKED_JOBS} batch jobs are still running")
+    job = BatchJob(payload.entities)
+    batch_jobs[job.job_id] = job
+
+    def publish(entity, trace_id):
+        # Bulk work rides the batch lane so live calls are always served first
+        publish_event("entity.found", {"entity": entity}, trace_id, priority=PRIORITY_BATCH)
+
+    job.task = asyncio.create_task(run_batch_job(job, admission, publish))
+    batch_tasks.add(job.task)
+    job.task.add_done_callback(batch_tasks.discard)
+    print(f"[{AGENT_ID}] Batch job {job.job_id} queued with {len(payload.entities)} entities.")
+    return job.to_dict()
+
+@app.get("/trigger/batch/{job_id}")
+def get_batch_job(job_id: str, include_traces: Optional[bool] = False):
+    job = batch_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    admission_stats = admission.stats()
+    status = job.to_dict()
+    status["admission"] = admission_stats
+    if include_traces:
+        status["traces"] = job.trace_ids
+    return status
+
+@app.delete("/trigger/batch/{job_id}")
+async def cancel_batch_job(job_id: str):
+    job = batch_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    job.cancel()
+    return job.to_dict()
+
+# --- Precomputed Meeting Endpoints ---
+@app.get("/meetings/{meeting_id}")
+def get_precomputed_meeting(meeting_id: str):
+    """Results the scheduler precomputed for a meeting, per account."""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not connected")
+    precomputed = read_precomputed(redis_client, meeting_id)
+    if precomputed is None:
+        raise HTTPException(status_code=404, detail="Meeting not precomputed")
+    return precomputed
+
+@app.post("/meetings/{meeting_id}/open")
+def open_meeting(meeting_id: str):
+    """
+    Serves the precomputed results and starts the live trace for the call.
+    Stream the call's transcript to /ingest with the returned trace_id; the
+    precomputed accounts won't be re-run when they come up.
+    """
+    precomputed = get_precomputed_meeting(meeting_id)
+    trace_id = str(uuid.uuid4())
+    publish_event(MEETING_OPENED_CHANNEL, {"meeting_id": meeting_id, "entities": precomputed["entities"]}, trace_id)
+    return {"trace_id": trace_id, **precomputed}
+
+# --- Trace State Endpoints ---
+@app.get("/traces/stats")
+def trace_state_stats():
+    return trace_state.stats()
+
+@app.get("/traces/{trace_id}/state")
+def get_trace_state(trace_id: str):
+    """The trace's latest result per channel, read from the materialized view."""
+    snapshot = trace_state.snapshot(trace_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired trace")
+    return Response(content=snapshot, media_type="application/json")
+
+# --- Claim-Checked Payloads ---
+@app.get("/claims/{digest}")
+def get_claimed_payload(digest: str):
+    """
+    The body behind a claim-checked payload. Events relayed over /stream and
+    trace state carry large payloads as {"claim_check": {"key": "claim:<digest>"}};
+    clients fetch the body here only when they show it.
+    """
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not connected")
+    body = redis_client.get(KEY_PREFIX + digest)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired payload")
+    return Response(content=body, media_type="application/json")
 
 @app.get("/")
 def read_root():
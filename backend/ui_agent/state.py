@@ -0,0 +1,121 @@
+"""
+Per-trace materialized state for the UI Agent.
+
+Every envelope that carries a trace_id is folded into that trace's view as it
+goes past, keyed by channel: most channels keep their latest payload (the
+current talking points, sentiment, lead score, pricing...), a few accumulate
+(every entity found) or are reduced to counters (transcript text is already
+held by the ASR client). Reading a trace is then a single dict lookup instead
+of a replay of the event stream; the JSON snapshot is cached until the trace
+next changes.
+
+Traces idle for longer than the TTL are dropped, oldest first.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from shared.expiry import evict_idle
+
+MAX_ENTITIES = 100
+
+
+def _latest(previous, payload):
+    return payload
+
+
+def _entities(previous, payload):
+    entities = list(previous or [])
+    if payload not in entities and len(entities) < MAX_ENTITIES:
+        entities.append(payload)
+    return entities
+
+
+def _transcript(previous, payload):
+    counts = dict(previous or {"utterances": 0, "chars": 0})
+    counts["utterances"] += 1
+    counts["chars"] += len(payload.get("text") or "")
+    counts["final"] = bool(payload.get("final"))
+    return counts
+
+
+# How a channel's payloads fold into its slot; anything else keeps the latest.
+FOLDS = {
+    "entity.found": _entities,
+    "transcript.new": _transcript,
+}
+
+
+class _TraceView:
+    __slots__ = ("channels", "first_seen", "updated_at", "events", "last_seen", "snapshot")
+
+    def __init__(self, now):
+        self.channels = {}
+        self.first_seen = now
+        self.updated_at = now
+        self.events = 0
+        self.last_seen = now
+        self.snapshot = None
+
+
+class TraceStateStore:
+    """The latest state of every active trace, folded from its envelopes."""
+
+    def __init__(self, ttl_seconds: float = 900.0, max_traces: int = 10000, folds: dict = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_traces = max_traces
+        self.folds = FOLDS if folds is None else folds
+        self._traces = OrderedDict()
+        self._lock = Lock()
+        self.folded = 0
+
+    def fold(self, envelope: dict) -> bool:
+        """Folds one envelope into its trace's view. Returns False if it has no trace."""
+        trace_id, channel = envelope.get("trace_id"), envelope.get("channel")
+        if not trace_id or not channel:
+            return False
+        payload = envelope.get("payload")
+        if not isinstance(payload, dict):
+            payload = {"value": payload}
+        now = time.time()
+        fold = self.folds.get(channel, _latest)
+        with self._lock:
+            evict_idle(self._traces, now, self.ttl_seconds, self.max_traces)
+            view = self._traces.pop(trace_id, None) or _TraceView(now)
+            self._traces[trace_id] = view
+            slot = view.channels.get(channel)
+            view.channels[channel] = {
+                "payload": fold(slot["payload"] if slot else None, payload),
+                "event_id": envelope.get("event_id"),
+                "agent_id": envelope.get("agent_id"),
+                "timestamp": envelope.get("timestamp"),
+                "count": slot["count"] + 1 if slot else 1,
+            }
+            view.events += 1
+            view.updated_at = envelope.get("timestamp") or now
+            view.last_seen = now
+            view.snapshot = None
+            self.folded += 1
+        return True
+
+    def snapshot(self, trace_id: str):
+        """The trace's current state as a JSON string, or None if unknown or expired."""
+        with self._lock:
+            view = self._traces.get(trace_id)
+            if view is None or time.time() - view.last_seen >= self.ttl_seconds:
+                return None
+            if view.snapshot is None:
+                view.snapshot = json.dumps({
+                    "trace_id": trace_id,
+                    "first_seen": view.first_seen,
+                    "updated_at": view.updated_at,
+                    "events": view.events,
+                    "channels": view.channels,
+                })
+            return view.snapshot
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active_traces": len(self._traces), "events_folded": self.folded}
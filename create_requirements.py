@@ -13,7 +13,9 @@ BASE_REQS = [
     "fastapi",
     "uvicorn[standard]",
     "redis",
-    "python-dotenv"
+    "python-dotenv",
+    "orjson",
+    "zstandard"
 ]
 
 # Agents that need to call an LLM (like OpenRouter)
@@ -0,0 +1,144 @@
+"""
+Measures envelope payload compression: bytes on the bus and CPU per event,
+for plain zstd and for zstd with a dictionary trained on other events.
+
+Events come from a Logger Agent sample (EVENT_LOG_PATH, one JSON envelope per
+line) when one is given. Otherwise a sample is synthesized in the shapes the
+agents publish (mock enrichments, retrieved documents, summaries, notes,
+follow-up plans...), for accounts and people drawn from fixed lists.
+
+The dictionary is trained on one half of the events and measured on the
+other. For a synthesized sample the halves are about different accounts, so
+the dictionary cannot simply memorize the test payloads.
+
+Usage: python evaluation/benchmark_compression.py [events.jsonl]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+import shared.compression as compression  # noqa: E402
+from shared.compression import PayloadCodec, train_dictionary, zstandard  # noqa: E402
+from shared.envelope import decode, encode  # noqa: E402
+
+THRESHOLDS = [0, 128, 256]
+COMPANIES = ["Google", "Infosys", "Acme Corp", "Globex", "Initech", "Umbrella", "Stark Industries",
+             "Wayne Enterprises", "Hooli", "Pied Piper", "Soylent", "Tyrell", "Cyberdyne", "Wonka",
+             "Vandelay Industries", "Massive Dynamic", "Aperture Science", "Oscorp", "Nakatomi", "Gringotts"]
+PEOPLE = ["alex", "priya", "john", "maria", "wei", "fatima", "lucas", "emma", "raj", "sofia"]
+
+
+def synthesize(rng, company, person):
+    """One trace's worth of payloads, keyed by channel."""
+    employees = rng.randint(100, 100000)
+    snippets = [
+        f"Internal Memo Q{rng.randint(1, 4)}: Discussed potential partnership with {company}, highlighting synergy in cloud computing.",
+        f"Sales Battlecard: When pitching against {company}, focus on our superior customer support and flexible pricing.",
+        f"Market Analysis 2024: The report indicates a {rng.randint(5, 30)}% market share growth for our main competitor, driven by their new AI platform.",
+    ]
+    return {
+        "transcript.new": {"text": f"{person} from {company} wants to talk about {rng.choice(['pricing', 'the rollout', 'security', 'integrations'])}",
+                           "stream": True, "final": rng.random() < 0.2},
+        "entity.found": {"entity": company},
+        "domain.fetched": {"name": company, "description": f"Mock description for {company}, a leading innovator in the tech industry with over {employees} employees.",
+                           "source": "Mock API v1.3"},
+        "person.enriched": {"name": person.title(), "title": "Senior Director of Innovation", "company": company,
+                            "linkedin": f"https://linkedin.com/in/{person}", "source": "Mock People API v2.1"},
+        "documents.retrieved": {"retrieved_snippets": snippets, "source": "Internal VectorDB (Pinecone Mock)",
+                                "source_event_id": f"{rng.getrandbits(64):016x}"},
+        "summary.created": {"summary": f"{person.title()} from {company} is evaluating vendors for {employees // 100} seats. "
+                                       f"Key concerns: {', '.join(rng.sample(['pricing', 'support', 'security', 'migration', 'AI features'], 3))}."},
+        "suggestions.generated": {"suggestions": [f"Highlight our alignment with {company}'s culture of innovation.",
+                                                  f"Emphasize scalability for an enterprise of {company}'s size.",
+                                                  "Position our superior customer support as a key advantage."],
+                                  "source_event_id": f"{rng.getrandbits(64):016x}"},
+        "meeting.notes": {"meeting_notes": {"attendees": ["Sales Rep", person.title()], "key_topics": ["Product discussion", "Pricing"],
+                                            "decisions_made": ["Follow-up scheduled"], "next_meeting": "TBD"},
+                          "action_items": ["Send proposal", "Schedule demo"], "key_quotes": [f"{company} showed interest in our solution"],
+                          "source": "Mock meeting notes - API key not configured"},
+        "followup.plan_generated": {"followup_plan": {"immediate_actions": [f"Email {person.title()} the proposal"], "short_term": ["Schedule demo"],
+                                                      "long_term": []},
+                                    "timeline": {"next_24_hours": [f"Email {person.title()} the proposal"], "next_week": ["Schedule demo"], "next_month": []},
+                                    "reminders": ["Follow up on proposal", "Check in on demo"],
+                                    "source": "Mock follow-up plan - API key not configured"},
+    }
+
+
+def synthesized_events(seed=7, traces_per_company=10):
+    rng = random.Random(seed)
+    events = []
+    for company in COMPANIES:
+        for _ in range(traces_per_company):
+            trace_id = f"{rng.getrandbits(128):032x}"
+            for channel, payload in synthesize(rng, company, rng.choice(PEOPLE)).items():
+                events.append({"event_id": f"{rng.getrandbits(128):032x}", "timestamp": time.time(),
+                               "agent_id": channel.split(".")[0] + "_agent_v1", "channel": channel,
+                               "payload": payload, "trace_id": trace_id, "priority": "live"})
+    # Events are grouped by company, so the halves cover different accounts.
+    return events
+
+
+def logged_events(path):
+    with open(path, encoding="utf-8") as f:
+        events = [decode(line.strip()).to_dict() for line in f if line.strip()]
+    return [event for event in events if "payload" in event]
+
+
+def measure(events, codec, rounds=20):
+    """Wire bytes, payload bytes and compressed count over the events, and µs per encode / decode."""
+    previous, compression.codec = compression.codec, codec
+    try:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            wire = [encode(event, version=1) for event in events]
+        encode_us = (time.perf_counter() - started) / rounds / len(events) * 1e6
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for raw in wire:
+                decode(raw).payload
+        decode_us = (time.perf_counter() - started) / rounds / len(events) * 1e6
+    finally:
+        compression.codec = previous
+    parts = [raw.split("\n", 1) for raw in wire]
+    return {
+        "bytes": sum(len(raw.encode("utf-8")) for raw in wire),
+        "payload_bytes": sum(len(payload.encode("utf-8")) for _, payload in parts),
+        "compressed": sum(header.endswith('"payload_encoding":"zstd"}') for header, _ in parts),
+        "encode_us": encode_us,
+        "decode_us": decode_us,
+    }
+
+
+def report(label, threshold, result, baseline, count):
+    print(f"{label:<12}  {threshold:>9}  {result['compressed'] / count:>10.0%}  "
+          f"{result['payload_bytes'] / count:>13.0f}  {result['bytes'] / count:>11.0f}  "
+          f"{1 - result['bytes'] / baseline['bytes']:>6.0%}  "
+          f"{result['encode_us']:>6.1f}µs  {result['decode_us']:>6.1f}µs")
+
+
+def main():
+    if zstandard is None:
+        sys.exit("zstandard is not installed.")
+    events = logged_events(sys.argv[1]) if len(sys.argv) > 1 else synthesized_events()
+    train, test = events[:len(events) // 2], events[len(events) // 2:]
+    dictionary = zstandard.ZstdCompressionDict(train_dictionary(
+        [json.dumps(event["payload"], separators=(",", ":"), ensure_ascii=False) for event in train]))
+
+    baseline = measure(test, PayloadCodec(enabled=False))
+    print(f"Events: {len(train)} to train, {len(test)} measured; dictionary {len(dictionary.as_bytes())} bytes\n")
+    print(f"{'codec':<12}  {'min bytes':>9}  {'compressed':>10}  {'payload/event':>13}  {'bytes/event':>11}  "
+          f"{'saved':>6}  {'encode':>8}  {'decode':>8}")
+    report("none", "-", baseline, baseline, len(test))
+    for label, dictionaries in (("zstd", []), ("zstd + dict", [dictionary])):
+        for threshold in THRESHOLDS:
+            codec = PayloadCodec(dictionaries, min_bytes=threshold, enabled=True)
+            report(label, threshold, measure(test, codec), baseline, len(test))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Measures what routing an event costs a subscriber, per envelope format.
+
+Most deliveries on the bus only need the envelope's header: pattern
+subscribers see every event, and agents skip their own events or pick a lane
+before they read the payload. For a small payload (a transcript chunk) and a
+large one (a retrieval result under the claim-check threshold) it times:
+
+- legacy: json.loads of the whole version 0 envelope, as agents did before;
+- v1 header: `shared.envelope.decode` reading only the trace_id;
+- v1 full: decode, then reading the payload;
+- encode: serializing the envelope for publishing, legacy and v1.
+
+v1 is timed with orjson when it is installed and with the json module
+fallback, so the gain of each is visible.
+
+Usage: python evaluation/benchmark_envelope.py
+"""
+
+import json
+import os
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from shared import envelope as codec  # noqa: E402
+
+ROUNDS = 20000
+
+
+def make_envelope(payload):
+    return {
+        "event_id": str(uuid.uuid4()), "timestamp": time.time(),
+        "agent_id": "retriever_agent_v1", "channel": "documents.retrieved",
+        "payload": payload, "trace_id": str(uuid.uuid4()), "priority": "live",
+    }
+
+
+def payloads():
+    small = {"text": "We are evaluating three vendors for the Q3 rollout.", "stream": True, "final": False}
+    documents = [{"id": f"doc-{i}", "title": f"Case study {i}",
+                  "content": "Acme cut onboarding time by 40% after moving to the platform. " * 3,
+                  "score": 0.9 - i / 100} for i in range(10)]
+    large = {"source_event_id": str(uuid.uuid4()), "documents": documents}
+    return {"small": small, "large": large}
+
+
+def per_call_us(fn, raw):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(raw)
+    return (time.perf_counter() - started) / ROUNDS * 1e6
+
+
+def use_backend(name):
+    """Points the codec at orjson or the json module."""
+    if name == "orjson":
+        import orjson
+        codec._loads = orjson.loads
+        codec._dumps = lambda value: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    else:
+        codec._loads = json.loads
+        codec._dumps = lambda value: json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def main():
+    backends = ["json"] + (["orjson"] if codec.orjson is not None else [])
+    print(f"{'payload':>7}  {'bytes':>6}  {'operation':<22}  {'time':>8}")
+    for label, payload in payloads().items():
+        envelope = make_envelope(payload)
+        legacy = json.dumps(envelope)
+        for name, fn, raw in [
+            ("legacy decode", lambda raw: json.loads(raw).get("trace_id"), legacy),
+            ("legacy encode", lambda _: json.dumps(envelope), None),
+        ]:
+            print(f"{label:>7}  {len(legacy):>6}  {name:<22}  {per_call_us(fn, raw):>6.2f}µs")
+        for backend in backends:
+            use_backend(backend)
+            v1 = codec.encode(envelope, version=1)
+            for name, fn, raw in [
+                (f"v1 header ({backend})", lambda raw: codec.decode(raw).trace_id, v1),
+                (f"v1 full ({backend})", lambda raw: codec.decode(raw).payload, v1),
+                (f"v1 encode ({backend})", lambda _: codec.encode(envelope, version=1), None),
+            ]:
+                print(f"{label:>7}  {len(v1):>6}  {name:<22}  {per_call_us(fn, raw):>6.2f}µs")
+
+
+if __name__ == "__main__":
+    main()
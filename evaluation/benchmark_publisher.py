@@ -0,0 +1,103 @@
+"""
+Measures publishing throughput against a Redis server, one publish per round
+trip versus the batched, pipelined `shared.publisher.Publisher`.
+
+Each run publishes the same envelopes, spread over a few channels, from one
+thread, and counts a run as finished once a subscriber has received every
+message. The subscriber also checks that each channel's messages arrived in
+the order they were published.
+
+Usage: python evaluation/benchmark_publisher.py [events]
+(REDIS_HOST / REDIS_PORT select the server, default localhost:6379)
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+
+import redis
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from shared.envelope import encode  # noqa: E402
+from shared.publisher import Publisher  # noqa: E402
+
+CHANNELS = ["summary.partial", "sentiment.partial", "documents.retrieved", "benchmark.other"]
+
+
+def make_messages(count):
+    messages = []
+    for i in range(count):
+        channel = CHANNELS[i % len(CHANNELS)]
+        messages.append((channel, encode({
+            "event_id": str(uuid.uuid4()), "timestamp": time.time(),
+            "agent_id": "benchmark_agent_v1", "channel": channel,
+            "payload": {"seq": i, "text": "We are evaluating three vendors for the Q3 rollout."},
+            "trace_id": "benchmark", "priority": "live",
+        })))
+    return messages
+
+
+class Receiver:
+    """Subscribes to the benchmark channels and records arrival order per channel."""
+
+    def __init__(self, client, expected):
+        self.expected = expected
+        self.received = {channel: [] for channel in CHANNELS}
+        self.count = 0
+        self.done = threading.Event()
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(*CHANNELS)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        for message in self._pubsub.listen():
+            self.received[message["channel"]].append(message["data"])
+            self.count += 1
+            if self.count >= self.expected:
+                self.done.set()
+                self._pubsub.close()
+                return
+
+    def in_order(self, messages):
+        for channel in CHANNELS:
+            if self.received[channel] != [message for ch, message in messages if ch == channel]:
+                return False
+        return True
+
+
+def run(client, messages, publish, finish):
+    receiver = Receiver(client, len(messages))
+    time.sleep(0.2)  # let the subscription settle
+    started = time.perf_counter()
+    for channel, message in messages:
+        publish(channel, message)
+    finish()
+    receiver.done.wait(60)
+    elapsed = time.perf_counter() - started
+    return len(messages) / elapsed, receiver.count == len(messages) and receiver.in_order(messages)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    client = redis.Redis(host=os.getenv("REDIS_HOST", "localhost"), port=int(os.getenv("REDIS_PORT", 6379)),
+                         db=0, decode_responses=True)
+    client.ping()
+    messages = make_messages(count)
+
+    print(f"Events: {count} over {len(CHANNELS)} channels\n")
+    print(f"{'publisher':<28}  {'events/s':>10}  {'in order':>8}")
+    rate, ordered = run(client, messages, client.publish, lambda: None)
+    print(f"{'redis publish per event':<28}  {rate:>10.0f}  {str(ordered):>8}")
+    for batch_size in (10, 100, 500):
+        publisher = Publisher("benchmark_agent_v1", batch_size=batch_size)
+        publisher.start(client)
+        rate, ordered = run(client, messages, publisher.publish, publisher.close)
+        print(f"{f'Publisher batch {batch_size}':<28}  {rate:>10.0f}  {str(ordered):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Measures the semantic cache's hit and false-hit rates on variations of
+evaluation/dataset.json.
+
+For every dataset item the cache is filled with three prompts' inputs, one
+per template the agents cache:
+
+- "suggestions": the company description plus the internal documents,
+  scoped to the company, as the Suggestion Agent does;
+- "lead": the mention that led to the lead (the item's input text), scoped to
+  the company, as the Lead Scoring Agent does;
+- "actions": the call summary (here, the internal summary), unscoped: the
+  Action Item Agent only sees the summary.
+
+It is then queried with:
+
+- rephrasings that deserve the same answer (case, punctuation, whitespace,
+  "from" / "at", a few synonyms); each should hit its own item;
+- near-misses that must not be answered from the cache: the same text about
+  another item's company, or with changed figures.
+
+Hit rate is the share of rephrasings answered with their own item's
+response. False-hit rate is the share of all lookups answered with a response
+meant for something else: a near-miss answered at all, or a rephrasing
+answered with another item's response.
+
+Usage: python evaluation/benchmark_semantic_cache.py
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from shared.semantic_cache import SemanticCache  # noqa: E402
+
+THRESHOLDS = (0.7, 0.8, 0.85, 0.9, 0.95)
+SYNONYMS = {"Over": "More than", "global": "worldwide", "company": "firm", "suggest": "indicate"}
+
+
+def load_items():
+    with open(os.path.join(ROOT, "evaluation", "dataset.json"), encoding="utf-8") as f:
+        items = json.load(f)
+    for item in items:
+        item["company"] = item["context"]["domain_description"].split(" is ")[0]
+        item["prompts"] = {
+            "suggestions": (f"{item['context']['domain_description']}\n{item['context']['internal_summary']}",
+                            item["company"]),
+            "lead": (item["input_text"], item["company"]),
+            "actions": (item["context"]["internal_summary"], ""),
+        }
+    return items
+
+
+def rephrasings(text):
+    swapped = re.sub(r"\b(from|at)\b", lambda m: "at" if m.group(1) == "from" else "from", text)
+    synonyms = text
+    for word, replacement in SYNONYMS.items():
+        synonyms = re.sub(rf"\b{word}\b", replacement, synonyms)
+    return [
+        text.lower(),
+        text.upper(),
+        text.title(),
+        swapped,
+        " ".join(text.split()) + "  ",
+        re.sub(r"[,.]", "", text) + "!",
+        "  " + text.replace(" ", "\n", 1),
+        synonyms,
+    ]
+
+
+def near_misses(item, items, template):
+    text, scope = item["prompts"][template]
+    misses = []
+    for other in items:
+        if other is not item:
+            # Same wording, another account; scoped templates follow the account.
+            swapped = re.sub(re.escape(item["company"]), other["company"], text, flags=re.I)
+            if swapped != text:
+                misses.append((swapped, other["company"] if scope else ""))
+    changed = re.sub(r"\d+", lambda m: str(int(m.group(0)) * 3), text)
+    if changed != text:
+        misses.append((changed, scope))
+    return misses
+
+
+def measure(items, template, threshold):
+    cache = SemanticCache("benchmark", threshold=threshold, enabled=True)
+    for item in items:
+        text, scope = item["prompts"][template]
+        cache.put(template, text, item["id"], scope)
+
+    positives = hits = negatives = false_hits = 0
+    started = time.perf_counter()
+    for item in items:
+        text, scope = item["prompts"][template]
+        for variant in rephrasings(text):
+            answer = cache.get(template, variant, scope)
+            positives += 1
+            hits += answer == item["id"]
+            false_hits += answer is not None and answer != item["id"]
+        for miss, miss_scope in near_misses(item, items, template):
+            negatives += 1
+            false_hits += cache.get(template, miss, miss_scope) is not None
+    lookup_us = (time.perf_counter() - started) / (positives + negatives) * 1e6
+    return positives, hits / positives, negatives, false_hits / (positives + negatives), lookup_us
+
+
+def main():
+    items = load_items()
+    print(f"Items: {len(items)}\n")
+    print(f"{'template':>11}  {'threshold':>9}  {'rephrasings':>11}  {'hit rate':>8}  {'near-misses':>11}  "
+          f"{'false-hit rate':>14}  {'lookup':>8}")
+    for template in items[0]["prompts"]:
+        for threshold in THRESHOLDS:
+            positives, hit_rate, negatives, false_rate, lookup_us = measure(items, template, threshold)
+            print(f"{template:>11}  {threshold:>9.2f}  {positives:>11}  {hit_rate:>8.1%}  {negatives:>11}  "
+                  f"{false_rate:>14.1%}  {lookup_us:>6.0f}µs")
+
+
+if __name__ == "__main__":
+    main()
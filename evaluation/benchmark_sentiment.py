@@ -0,0 +1,109 @@
+"""
+Benchmarks the Sentiment Agent's local classifier against the LLM.
+
+Every text in evaluation/dataset.json (context, talking points, action items)
+plus a set of labelled probe sentences is classified locally. For each
+confidence threshold the script reports how many LLM calls the cascade avoids
+and how often the local answer agrees with the reference on the texts it
+answers itself.
+
+The reference is the LLM (`perform_sentiment_analysis`) when
+OPENROUTER_API_KEY is set, otherwise the probe labels (dataset texts are then
+skipped, since they have no label).
+
+Usage: python evaluation/benchmark_sentiment.py
+"""
+
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend", "sentiment_agent"))
+
+from classifier import train_default  # noqa: E402
+
+THRESHOLDS = (0.6, 0.7, 0.8, 0.9, 0.95)
+
+# Phrased differently from the seed corpus, so this isn't measured on training data.
+PROBES = [
+    ("The VP was thrilled with the pilot numbers and wants a quote.", "POSITIVE"),
+    ("They were impressed and asked us to send the contract.", "POSITIVE"),
+    ("Everyone on the call seemed happy with the new features.", "POSITIVE"),
+    ("Good news: procurement approved the budget.", "POSITIVE"),
+    ("They are confident we can deliver and want to expand.", "POSITIVE"),
+    ("The champion is very enthusiastic about the rollout.", "POSITIVE"),
+    ("They are frustrated by the outages last month.", "NEGATIVE"),
+    ("The customer said the product is too expensive for them.", "NEGATIVE"),
+    ("They are not satisfied with our support response times.", "NEGATIVE"),
+    ("Legal rejected the terms and the deal stalled.", "NEGATIVE"),
+    ("The demo went badly and they were disappointed.", "NEGATIVE"),
+    ("They doubt the integration will work and are considering other vendors.", "NEGATIVE"),
+    ("The meeting is on Thursday at 3pm.", "NEUTRAL"),
+    ("They have about 200 employees in two offices.", "NEUTRAL"),
+    ("We sent over the API documentation.", "NEUTRAL"),
+    ("Their current vendor contract ends in June.", "NEUTRAL"),
+    ("The IT director will join the next call.", "NEUTRAL"),
+    ("They asked about single sign-on support.", "NEUTRAL"),
+    ("Some interest in the analytics module, but concerns about the price.", "NEUTRAL"),
+    ("The call was fine overall, nothing decided yet.", "NEUTRAL"),
+]
+
+
+def dataset_texts():
+    with open(os.path.join(ROOT, "evaluation", "dataset.json"), encoding="utf-8") as f:
+        items = json.load(f)
+    texts = []
+    for item in items:
+        texts.extend(item["context"].values())
+        texts.extend(item["expected_talking_points"])
+        texts.extend(item["expected_action_items"])
+    return texts
+
+
+def main():
+    classifier = train_default()
+    llm = None
+    if os.getenv("OPENROUTER_API_KEY"):
+        from main import perform_sentiment_analysis as llm  # noqa: E402
+
+    samples = [(text, label) for text, label in PROBES]
+    if llm:
+        samples += [(text, None) for text in dataset_texts()]
+
+    rows, reference, llm_seconds = [], [], 0.0
+    start = time.perf_counter()
+    for text, _ in samples:
+        rows.append(classifier.predict(text))
+    local_seconds = time.perf_counter() - start
+
+    for text, label in samples:
+        if llm:
+            t = time.perf_counter()
+            reference.append(llm(text))
+            llm_seconds += time.perf_counter() - t
+        else:
+            reference.append(label)
+
+    print(f"Samples: {len(samples)}  reference: {'LLM' if llm else 'probe labels'}  "
+          f"temperature: {classifier.temperature:.2f}")
+    print(f"Local classifier: {local_seconds / len(samples) * 1e6:.1f} µs per text")
+    if llm:
+        print(f"LLM: {llm_seconds / len(samples) * 1e3:.0f} ms per text")
+    overall = sum(r[0] == ref for r, ref in zip(rows, reference)) / len(samples)
+    print(f"Agreement with every text answered locally: {overall:.1%}\n")
+
+    print(f"{'threshold':>9}  {'calls avoided':>13}  {'local agreement':>15}  {'cascade agreement':>17}")
+    for threshold in THRESHOLDS:
+        local = [(r[0], ref) for r, ref in zip(rows, reference) if r[1] >= threshold]
+        avoided = len(local) / len(samples)
+        agree = sum(a == b for a, b in local)
+        local_agreement = agree / len(local) if local else float("nan")
+        # Escalated texts take the reference answer, so only local misses count against the cascade.
+        cascade = (agree + len(samples) - len(local)) / len(samples)
+        print(f"{threshold:>9.2f}  {avoided:>13.1%}  {local_agreement:>15.1%}  {cascade:>17.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,14 @@ const AGENT_WORKFLOW = [
   'followup_agent_v1',
 ];
 
+// Large payloads arrive as claim checks; their body is fetched only when shown.
+const loadPayload = async (payload) => {
+  if (!payload || !payload.claim_check) return payload || {};
+  const digest = payload.claim_check.key.split(':')[1];
+  const response = await fetch(`http://localhost:8001/claims/${digest}`);
+  return response.ok ? response.json() : payload;
+};
+
 function App() {
   const [inputValue, setInputValue] = useState('alex from google');
   const [events, setEvents] = useState([]);
@@ -48,7 +56,7 @@ function App() {
         setCompletedSteps(prev => new Set(prev).add(eventData.agent_id));
 
         if (eventData.channel === 'suggestions.ranked') {
-          setSuggestions(eventData.payload.suggestions || []);
+          loadPayload(eventData.payload).then(payload => setSuggestions(payload.suggestions || []));
         }
         if (eventData.channel === 'followup.plan_generated') {
           setIsProcessing(false); // Workflow complete
@@ -10,6 +10,9 @@ import os
 import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from shared.pipeline import PipelineError, load_pipeline
+
 # Agent configurations with their ports
 AGENTS = [
     {"name": "ui_agent", "port": 8001, "path": "backend/ui_agent"},
@@ -28,8 +31,25 @@ AGENTS = [
     {"name": "action_item_agent", "port": 8014, "path": "backend/action_item_agent"},
     {"name": "followup_agent", "port": 8015, "path": "backend/followup_agent"},
     {"name": "logger_agent", "port": 8016, "path": "backend/logger_agent"},
+    {"name": "entity_agent", "port": 8017, "path": "backend/entity_agent"},
+    {"name": "orchestrator_agent", "port": 8018, "path": "backend/orchestrator_agent"},
+    {"name": "scheduler_agent", "port": 8019, "path": "backend/scheduler_agent"},
 ]
 
+def startup_waves(pipeline):
+    """
+    Groups agents into waves that start together. Agents outside the pipeline
+    spec (orchestrator, logger, compliance) come first, then the pipeline's
+    waves from last to first, so every agent is subscribed before anything
+    upstream of it can publish, and the UI agent last.
+    """
+    by_name = {agent["name"]: agent for agent in AGENTS}
+    staged = [[by_name[pipeline.stages[name].agent] for name in wave if pipeline.stages[name].agent in by_name]
+              for wave in reversed(pipeline.waves)]
+    placed = {agent["name"] for wave in staged for agent in wave} | {"ui_agent"}
+    infrastructure = [agent for agent in AGENTS if agent["name"] not in placed]
+    return [infrastructure] + staged + [[by_name["ui_agent"]]]
+
 def check_redis():
     """Check if Redis is running."""
     try:
@@ -91,13 +111,21 @@ def main():
     if not check_redis():
         sys.exit(1)
     
-    # Start agents
+    # Validate the pipeline spec before starting anything
+    try:
+        pipeline = load_pipeline()
+    except PipelineError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    # Start agents, one wave at a time
     processes = []
-    for agent in AGENTS:
-        process = start_agent(agent)
-        if process:
-            processes.append((agent["name"], process))
-        time.sleep(1)  # Small delay between starts
+    for wave in startup_waves(pipeline):
+        for agent in wave:
+            process = start_agent(agent)
+            if process:
+                processes.append((agent["name"], process))
+        time.sleep(1)  # Small delay between waves
     
     print("\n✅ All agents started!")
     print("🌐 UI Agent available at: http://localhost:8001")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Trains the zstd dictionary used to compress envelope payloads.
+
+Input is the Logger Agent's event sample (run it with EVENT_LOG_PATH set):
+one JSON envelope per line. Every payload is serialized as it is on the wire
+and the dictionary is trained on those samples. Retrain when payload shapes
+change; see backend/shared/compression.py for rolling out a new dictionary.
+
+Usage: python train_compression_dictionary.py events.jsonl [more.jsonl ...]
+           [--size 16384] [--output backend/envelope.zstd-dict]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from shared.compression import DICTIONARY_PATHS, train_dictionary
+
+
+def read_payloads(paths):
+    """Each logged envelope's payload, serialized as publishers serialize it."""
+    payloads = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    envelope = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(envelope, dict) and "payload" in envelope:
+                    payloads.append(json.dumps(envelope["payload"], separators=(",", ":"), ensure_ascii=False))
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the envelope payload compression dictionary.")
+    parser.add_argument("events", nargs="+", help="JSON-lines event logs from the Logger Agent")
+    parser.add_argument("--size", type=int, default=16384, help="dictionary size in bytes")
+    parser.add_argument("--output", default=DICTIONARY_PATHS[0])
+    args = parser.parse_args()
+
+    payloads = read_payloads(args.events)
+    print(f"📥 Read {len(payloads)} payloads ({sum(map(len, payloads))} bytes).")
+    try:
+        dictionary = train_dictionary(payloads, args.size)
+    except ValueError as e:
+        print(f"❌ {e} Log more events and retry.")
+        sys.exit(1)
+    with open(args.output, "wb") as f:
+        f.write(dictionary)
+    print(f"✅ Wrote a {len(dictionary)}-byte dictionary to {args.output}")
+
+
+if __name__ == "__main__":
+    main()